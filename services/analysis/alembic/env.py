@@ -8,7 +8,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from src.database import Base
-from src.models import ImportBatch, AssetQualityScore, BurstSequence, TriageAction
+from src.models import ImportBatch, AssetQualityScore, BurstSequence, TriageAction, QualityResultCache
 from src.config import settings
 
 config = context.config
@@ -0,0 +1,26 @@
+"""batch_progress_tracking
+
+Revision ID: 20261017090000
+Revises: 20251229025750
+Create Date: 2026-10-17 09:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261017090000'
+down_revision = '20251229025750'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('import_batches', sa.Column('started_at', sa.TIMESTAMP(), nullable=True))
+    op.add_column('import_batches', sa.Column('seconds_per_asset', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('import_batches') as batch_op:
+        batch_op.drop_column('seconds_per_asset')
+        batch_op.drop_column('started_at')
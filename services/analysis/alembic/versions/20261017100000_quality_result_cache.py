@@ -0,0 +1,40 @@
+"""quality_result_cache
+
+Revision ID: 20261017100000
+Revises: 20261017090000
+Create Date: 2026-10-17 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sys
+import os
+
+# Add parent directory to path for importing GUID type
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from src.models import GUID
+
+# revision identifiers, used by Alembic.
+revision = '20261017100000'
+down_revision = '20261017090000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('quality_result_cache',
+    sa.Column('id', GUID, nullable=False),
+    sa.Column('checksum', sa.String(length=255), nullable=False),
+    sa.Column('analyzer_version', sa.String(length=64), nullable=False),
+    sa.Column('blur_score', sa.Float(), nullable=True),
+    sa.Column('exposure_score', sa.Float(), nullable=True),
+    sa.Column('overall_quality', sa.Float(), nullable=True),
+    sa.Column('is_corrupted', sa.Boolean(), nullable=True, server_default=sa.text('false')),
+    sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('checksum', 'analyzer_version', name='uq_cache_checksum_version')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('quality_result_cache')
@@ -0,0 +1,27 @@
+"""resumable_batches
+
+Revision ID: 20261017110000
+Revises: 20261017100000
+Create Date: 2026-10-17 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261017110000'
+down_revision = '20261017100000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('import_batches', sa.Column('heartbeat_at', sa.TIMESTAMP(), nullable=True))
+    op.add_column('asset_quality_scores', sa.Column('captured_at', sa.TIMESTAMP(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('asset_quality_scores') as batch_op:
+        batch_op.drop_column('captured_at')
+    with op.batch_alter_table('import_batches') as batch_op:
+        batch_op.drop_column('heartbeat_at')
@@ -0,0 +1,36 @@
+"""quality_features
+
+Revision ID: 20261017120000
+Revises: 20261017110000
+Create Date: 2026-10-17 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261017120000'
+down_revision = '20261017110000'
+branch_labels = None
+depends_on = None
+
+TABLES = ('asset_quality_scores', 'quality_result_cache')
+FEATURE_COLUMNS = (
+    ('laplacian_variance', sa.Float()),
+    ('working_long_edge', sa.Integer()),
+    ('mean_brightness', sa.Float()),
+    ('brightness_std', sa.Float()),
+)
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        for name, column_type in FEATURE_COLUMNS:
+            op.add_column(table, sa.Column(name, column_type, nullable=True))
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            for name, _ in reversed(FEATURE_COLUMNS):
+                batch_op.drop_column(name)
@@ -0,0 +1,26 @@
+"""score_analyzer_version
+
+Revision ID: 20261017130000
+Revises: 20261017120000
+Create Date: 2026-10-17 13:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261017130000'
+down_revision = '20261017120000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('asset_quality_scores', sa.Column('analyzer_version', sa.String(64), nullable=True))
+    op.create_index(op.f('ix_asset_quality_scores_analyzer_version'), 'asset_quality_scores', ['analyzer_version'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_asset_quality_scores_analyzer_version'), table_name='asset_quality_scores')
+    with op.batch_alter_table('asset_quality_scores') as batch_op:
+        batch_op.drop_column('analyzer_version')
@@ -0,0 +1,46 @@
+"""burst_timeline
+
+Revision ID: 20261017140000
+Revises: 20261017130000
+Create Date: 2026-10-17 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sys
+import os
+
+# Add parent directory to path for importing GUID type
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from src.models import GUID
+
+# revision identifiers, used by Alembic.
+revision = '20261017140000'
+down_revision = '20261017130000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('burst_timeline_entries',
+    sa.Column('id', GUID, nullable=False),
+    sa.Column('immich_user_id', sa.String(length=255), nullable=False),
+    sa.Column('immich_asset_id', sa.String(length=255), nullable=False),
+    sa.Column('import_batch_id', GUID, nullable=True),
+    sa.Column('captured_at', sa.TIMESTAMP(), nullable=False),
+    sa.Column('burst_sequence_id', GUID, nullable=True),
+    sa.ForeignKeyConstraint(['import_batch_id'], ['import_batches.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['burst_sequence_id'], ['burst_sequences.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('immich_user_id', 'immich_asset_id', name='uq_timeline_asset_per_user')
+    )
+    op.create_index(op.f('ix_burst_timeline_entries_import_batch_id'), 'burst_timeline_entries', ['import_batch_id'], unique=False)
+    op.create_index(op.f('ix_burst_timeline_entries_burst_sequence_id'), 'burst_timeline_entries', ['burst_sequence_id'], unique=False)
+    op.create_index('ix_burst_timeline_entries_user_captured_at', 'burst_timeline_entries', ['immich_user_id', 'captured_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_burst_timeline_entries_user_captured_at', table_name='burst_timeline_entries')
+    op.drop_index(op.f('ix_burst_timeline_entries_burst_sequence_id'), table_name='burst_timeline_entries')
+    op.drop_index(op.f('ix_burst_timeline_entries_import_batch_id'), table_name='burst_timeline_entries')
+    op.drop_table('burst_timeline_entries')
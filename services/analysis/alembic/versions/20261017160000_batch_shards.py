@@ -0,0 +1,47 @@
+"""batch_shards
+
+Revision ID: 20261017160000
+Revises: 20261017150000
+Create Date: 2026-10-17 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sys
+import os
+
+# Add parent directory to path for importing GUID and StringArray types
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from src.models import GUID, StringArray
+
+# revision identifiers, used by Alembic.
+revision = '20261017160000'
+down_revision = '20261017150000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('batch_shards',
+    sa.Column('id', GUID, nullable=False),
+    sa.Column('import_batch_id', GUID, nullable=True),
+    sa.Column('shard_index', sa.Integer(), nullable=False),
+    sa.Column('asset_ids', StringArray, nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('analyzed_assets', sa.Integer(), nullable=True),
+    sa.Column('skipped_assets', sa.Integer(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('heartbeat_at', sa.TIMESTAMP(), nullable=True),
+    sa.CheckConstraint("status IN ('pending', 'processing', 'complete', 'failed')", name='check_shard_status'),
+    sa.ForeignKeyConstraint(['import_batch_id'], ['import_batches.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('import_batch_id', 'shard_index', name='uq_shard_per_batch')
+    )
+    op.create_index(op.f('ix_batch_shards_import_batch_id'), 'batch_shards', ['import_batch_id'], unique=False)
+    op.create_index(op.f('ix_batch_shards_status'), 'batch_shards', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_batch_shards_status'), table_name='batch_shards')
+    op.drop_index(op.f('ix_batch_shards_import_batch_id'), table_name='batch_shards')
+    op.drop_table('batch_shards')
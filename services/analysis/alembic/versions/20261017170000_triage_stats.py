@@ -0,0 +1,43 @@
+"""triage_stats
+
+Revision ID: 20261017170000
+Revises: 20261017160000
+Create Date: 2026-10-17 17:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sys
+import os
+
+# Add parent directory to path for importing GUID type
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+from src.models import GUID
+
+# revision identifiers, used by Alembic.
+revision = '20261017170000'
+down_revision = '20261017160000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('asset_quality_scores', sa.Column('file_size_bytes', sa.BigInteger(), nullable=True))
+    op.create_table('batch_triage_stats',
+    sa.Column('id', GUID, nullable=False),
+    sa.Column('import_batch_id', GUID, nullable=True),
+    sa.Column('category_type', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('estimated_savings_bytes', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['import_batch_id'], ['import_batches.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('import_batch_id', 'category_type', name='uq_triage_category_per_batch')
+    )
+    op.create_index(op.f('ix_batch_triage_stats_import_batch_id'), 'batch_triage_stats', ['import_batch_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_batch_triage_stats_import_batch_id'), table_name='batch_triage_stats')
+    op.drop_table('batch_triage_stats')
+    with op.batch_alter_table('asset_quality_scores') as batch_op:
+        batch_op.drop_column('file_size_bytes')
@@ -0,0 +1,35 @@
+"""reanalysis_jobs
+
+Revision ID: 20261017180000
+Revises: 20261017170000
+Create Date: 2026-10-17 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20261017180000'
+down_revision = '20261017170000'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('reanalysis_jobs',
+    sa.Column('id', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('analyzer_version', sa.String(length=64), nullable=True),
+    sa.Column('stale_assets', sa.Integer(), nullable=True),
+    sa.Column('reanalyzed_assets', sa.Integer(), nullable=True),
+    sa.Column('failed_assets', sa.Integer(), nullable=True),
+    sa.Column('error_message', sa.Text(), nullable=True),
+    sa.Column('heartbeat_at', sa.TIMESTAMP(), nullable=True),
+    sa.Column('seconds_per_asset', sa.Float(), nullable=True),
+    sa.CheckConstraint("status IN ('idle', 'running', 'complete', 'failed')", name='check_reanalysis_status'),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reanalysis_jobs')
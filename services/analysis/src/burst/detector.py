@@ -1,56 +1,107 @@
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, NamedTuple, Optional
+
+import numpy as np
+
+from ..quality.perceptual_hash import hamming_distances
+
+
+class BurstRanges(NamedTuple):
+    """
+    Bursts as index ranges over capture-time order.
+
+    Burst k consists of the input positions order[starts[k]:stops[k]], in
+    capture-time order.
+    """
+    order: np.ndarray
+    starts: np.ndarray
+    stops: np.ndarray
+
+    def indices(self) -> List[np.ndarray]:
+        """Input positions of each burst's photos, in capture-time order."""
+        return [self.order[start:stop] for start, stop in zip(self.starts, self.stops)]
 
 
 class BurstDetector:
     """Detects burst sequences in photo collections."""
 
-    def __init__(self, interval_seconds: float = 2.0, min_burst_size: int = 2):
+    def __init__(
+        self,
+        interval_seconds: float = 2.0,
+        min_burst_size: int = 2,
+        max_hash_distance: Optional[int] = None
+    ):
         """
         Args:
             interval_seconds: Maximum time gap between photos in a burst
             min_burst_size: Minimum number of photos to form a burst
+            max_hash_distance: Maximum Hamming distance between consecutive
+                          photos' perceptual hashes within a burst (None =
+                          time only)
         """
         self.interval_seconds = interval_seconds
         self.min_burst_size = min_burst_size
+        self.max_hash_distance = max_hash_distance
 
-    def detect_bursts(self, photos: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    def detect_burst_ranges(self, timestamps: np.ndarray, hashes: Optional[np.ndarray] = None) -> BurstRanges:
         """
-        Detect burst sequences in photos.
+        Detect burst sequences in an array of capture times.
+
+        Sorts once with a stable argsort and finds burst boundaries where
+        consecutive gaps exceed interval_seconds, so a million-photo
+        timeline is processed in a few vectorized passes without building
+        any per-photo Python objects. With max_hash_distance and hashes,
+        a burst is also split between consecutive photos that look
+        different, e.g. two people's phones shooting in the same second.
 
         Args:
-            photos: List of photo dicts with 'id' and 'timestamp' keys
+            timestamps: 1D array of capture times in seconds (e.g. epoch
+                        seconds); any common origin works
+            hashes: int64 perceptual hashes parallel to timestamps. Mask
+                    unknown hashes with a numpy masked array; photos without
+                    a hash are never split off by similarity.
 
         Returns:
-            List of burst sequences, each sequence is a list of photos
+            Burst index ranges into timestamps
         """
-        if not photos:
-            return []
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        order = np.argsort(timestamps, kind="stable")
+        is_break = np.diff(timestamps[order]) > self.interval_seconds
+        if self.max_hash_distance is not None and hashes is not None:
+            known = ~np.ma.getmaskarray(hashes)[order]
+            values = np.ma.getdata(hashes).astype(np.int64)[order]
+            distances = hamming_distances(values[1:], values[:-1])
+            is_break |= known[1:] & known[:-1] & (distances > self.max_hash_distance)
+        # Positions in sorted order where a new run starts
+        breaks = np.flatnonzero(is_break) + 1
+        starts = np.concatenate(([0], breaks))
+        stops = np.concatenate((breaks, [len(timestamps)]))
 
-        # Sort by timestamp
-        sorted_photos = sorted(photos, key=lambda p: p['timestamp'])
+        is_burst = stops - starts >= max(self.min_burst_size, 1)
+        return BurstRanges(order, starts[is_burst], stops[is_burst])
 
-        bursts = []
-        current_burst = [sorted_photos[0]]
+    def detect_bursts(self, photos: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Detect burst sequences in photos.
 
-        for i in range(1, len(sorted_photos)):
-            current_photo = sorted_photos[i]
-            previous_photo = sorted_photos[i-1]
+        Thin wrapper around detect_burst_ranges() for photo dicts.
 
-            # Calculate time difference
-            time_diff = (current_photo['timestamp'] - previous_photo['timestamp']).total_seconds()
+        Args:
+            photos: List of photo dicts with 'id' and 'timestamp' keys, and
+                    optionally 'perceptual_hash'
 
-            if time_diff <= self.interval_seconds:
-                # Part of current burst
-                current_burst.append(current_photo)
-            else:
-                # End of burst, start new one
-                if len(current_burst) >= self.min_burst_size:
-                    bursts.append(current_burst)
-                current_burst = [current_photo]
+        Returns:
+            List of burst sequences, each sequence is a list of photos
+        """
+        if not photos:
+            return []
 
-        # Check final burst
-        if len(current_burst) >= self.min_burst_size:
-            bursts.append(current_burst)
+        # Offsets from a common origin, so naive and aware datetimes both work
+        origin = photos[0]['timestamp']
+        timestamps = np.array([(photo['timestamp'] - origin).total_seconds() for photo in photos])
+        hashes = [photo.get('perceptual_hash') for photo in photos]
+        hashes = np.ma.masked_array(
+            [value or 0 for value in hashes], mask=[value is None for value in hashes], dtype=np.int64
+        )
 
-        return bursts
+        ranges = self.detect_burst_ranges(timestamps, hashes)
+        return [[photos[index] for index in burst] for burst in ranges.indices()]
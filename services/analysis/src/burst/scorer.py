@@ -1,5 +1,9 @@
 from typing import List, Dict, Any, Optional
 
+import numpy as np
+
+from .detector import BurstRanges
+
 
 class BurstScorer:
     """Scores burst sequences and recommends best shot."""
@@ -23,3 +27,22 @@ class BurstScorer:
         best_photo = max(burst, key=lambda p: p.get('quality_score', 0))
 
         return best_photo['id']
+
+    def recommend_best_positions(self, quality_scores: np.ndarray, ranges: BurstRanges) -> np.ndarray:
+        """
+        Recommend the best photo of each burst found by detect_burst_ranges().
+
+        Array counterpart of recommend_best_shot(); ties go to the earliest
+        shot, as there.
+
+        Args:
+            quality_scores: 1D array of quality scores, parallel to the
+                            timestamps the ranges were detected on
+            ranges: Detected bursts
+
+        Returns:
+            Input position of the recommended photo, one per burst
+        """
+        return np.array(
+            [burst[np.argmax(quality_scores[burst])] for burst in ranges.indices()], dtype=np.int64
+        )
@@ -0,0 +1,291 @@
+"""Library-wide burst index, updated incrementally as batches are analyzed."""
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import and_, exists, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import crud
+from .burst.detector import BurstDetector
+from .burst.scorer import BurstScorer
+from .models import AssetQualityScore, BurstSequence, BurstTimelineEntry, ImportBatch
+
+# Time windows per range query (two parameters each)
+WINDOW_CHUNK_SIZE = 250
+
+
+def _runs(times: np.ndarray, gap: np.timedelta64) -> Tuple[np.ndarray, np.ndarray]:
+    """First and last time of each run of sorted times whose consecutive gaps are at most gap."""
+    breaks = np.flatnonzero(np.diff(times) > gap) + 1
+    return times[np.concatenate(([0], breaks))], times[np.concatenate((breaks - 1, [len(times) - 1]))]
+
+
+def _entry_query(db: Session, user_id: str):
+    """A user's timeline entries with the quality score and hash from the batch that last scored each."""
+    return db.query(
+        BurstTimelineEntry.id,
+        BurstTimelineEntry.immich_asset_id,
+        BurstTimelineEntry.import_batch_id,
+        BurstTimelineEntry.captured_at,
+        BurstTimelineEntry.burst_sequence_id,
+        AssetQualityScore.overall_quality,
+        AssetQualityScore.perceptual_hash
+    ).outerjoin(AssetQualityScore, and_(
+        AssetQualityScore.immich_asset_id == BurstTimelineEntry.immich_asset_id,
+        AssetQualityScore.import_batch_id == BurstTimelineEntry.import_batch_id
+    )).filter(BurstTimelineEntry.immich_user_id == user_id)
+
+
+def _entries_in_windows(db: Session, user_id: str, windows: List[Tuple[datetime, datetime]]) -> list:
+    """Timeline entries captured within any of the (start, end) windows, inclusive."""
+    rows = []
+    for start in range(0, len(windows), WINDOW_CHUNK_SIZE):
+        rows += _entry_query(db, user_id).filter(or_(*(
+            BurstTimelineEntry.captured_at.between(low, high)
+            for low, high in windows[start:start + WINDOW_CHUNK_SIZE]
+        ))).all()
+    return rows
+
+
+def _entries_in_bursts(db: Session, user_id: str, burst_ids: List[UUID]) -> list:
+    """All members of the given bursts."""
+    rows = []
+    for start in range(0, len(burst_ids), crud.LOOKUP_CHUNK_SIZE):
+        rows += _entry_query(db, user_id).filter(
+            BurstTimelineEntry.burst_sequence_id.in_(burst_ids[start:start + crud.LOOKUP_CHUNK_SIZE])
+        ).all()
+    return rows
+
+
+def _load_region(db: Session, user_id: str, seeds: np.ndarray, reach: np.timedelta64) -> Dict[UUID, Any]:
+    """
+    Load the timeline entries whose bursts can change when entries at seeds change.
+
+    Starts from everything within reach of a seed and grows until no
+    entry outside the region is within reach of its edges. A burst is
+    loaded whole as soon as one member is, so growing past it takes one
+    step; only runs too short to be bursts are crossed entry by entry.
+
+    Args:
+        db: Database session
+        user_id: Owner of the timeline
+        seeds: Sorted datetime64[us] capture times that changed
+        reach: Burst interval
+
+    Returns:
+        Entry rows by entry ID
+    """
+    entries = {}
+    loaded_bursts: Set[UUID] = set()
+    firsts, lasts = _runs(seeds, 2 * reach)
+    windows = list(zip((firsts - reach).tolist(), (lasts + reach).tolist()))
+    while True:
+        found = {row.id: row for row in _entries_in_windows(db, user_id, windows) if row.id not in entries}
+        burst_ids = {row.burst_sequence_id for row in found.values() if row.burst_sequence_id is not None}
+        burst_ids -= loaded_bursts
+        loaded_bursts |= burst_ids
+        found.update(
+            (row.id, row) for row in _entries_in_bursts(db, user_id, list(burst_ids)) if row.id not in entries
+        )
+        if not found:
+            return entries
+        entries.update(found)
+
+        times = np.sort(np.concatenate((
+            seeds, np.array([row.captured_at for row in entries.values()], dtype="datetime64[us]")
+        )))
+        firsts, lasts = _runs(times, reach)
+        windows = list(zip((firsts - reach).tolist(), firsts.tolist())) + list(zip(lasts.tolist(), (lasts + reach).tolist()))
+
+
+def update_burst_index(
+    db: Session,
+    batch_id: UUID,
+    detector: BurstDetector,
+    scorer: BurstScorer,
+    asset_ids: Optional[List[str]] = None
+) -> Set[UUID]:
+    """
+    Fold a batch's scored capture times into its owner's burst index.
+
+    Every analyzed capture time is kept per user, along with the burst it
+    belongs to, so photos at the edges of a batch stay open to bursts
+    continuing in later uploads. Only the time windows around the batch's
+    captures are reloaded and re-detected: bursts found there extend or
+    merge the existing BurstSequence rows they overlap (new ones belong to
+    this batch), and rows left without members are deleted. The cost
+    grows with the batch and the bursts it touches, not with the library.
+
+    Re-running it for the same batch, e.g. after re-analysis, drops
+    entries of assets the batch no longer has scores for and refreshes
+    recommendations from the current scores.
+
+    A large batch can be folded in one shard at a time by passing each
+    shard's assets: bursts crossing into an already indexed shard are
+    merged with its bursts like bursts continuing an earlier batch.
+
+    Args:
+        db: Database session
+        batch_id: Import batch whose quality scores were written
+        detector: Burst rules
+        scorer: Best-shot recommendation
+        asset_ids: Only fold in these assets of the batch (None = all)
+
+    Returns:
+        The batch and every other batch owning captures whose bursts were
+        re-detected
+    """
+    user_id = db.query(ImportBatch.immich_user_id).filter(ImportBatch.id == batch_id).scalar()
+    crud.lock_burst_index(db, user_id)
+
+    scored_query = db.query(AssetQualityScore.immich_asset_id, AssetQualityScore.captured_at).filter(
+        AssetQualityScore.import_batch_id == batch_id,
+        AssetQualityScore.captured_at.isnot(None)
+    )
+    previous_query = db.query(
+        BurstTimelineEntry.id, BurstTimelineEntry.immich_asset_id,
+        BurstTimelineEntry.captured_at, BurstTimelineEntry.burst_sequence_id
+    ).filter(BurstTimelineEntry.import_batch_id == batch_id)
+    if asset_ids is None:
+        scored = scored_query.all()
+        previous = previous_query.all()
+    else:
+        scored, previous = [], []
+        for start in range(0, len(asset_ids), crud.LOOKUP_CHUNK_SIZE):
+            chunk = asset_ids[start:start + crud.LOOKUP_CHUNK_SIZE]
+            scored += scored_query.filter(AssetQualityScore.immich_asset_id.in_(chunk)).all()
+            previous += previous_query.filter(BurstTimelineEntry.immich_asset_id.in_(chunk)).all()
+
+    # Entries of assets no longer scored in the batch; their bursts may shrink or vanish
+    current = {asset_id for asset_id, _ in scored}
+    removed = [row for row in previous if row.immich_asset_id not in current]
+    orphaned = {row.burst_sequence_id for row in removed if row.burst_sequence_id is not None}
+    removed_ids = [row.id for row in removed]
+    for start in range(0, len(removed_ids), crud.LOOKUP_CHUNK_SIZE):
+        db.query(BurstTimelineEntry).filter(
+            BurstTimelineEntry.id.in_(removed_ids[start:start + crud.LOOKUP_CHUNK_SIZE])
+        ).delete(synchronize_session=False)
+    crud.upsert_burst_timeline_entries(db, [
+        {'immich_user_id': user_id, 'immich_asset_id': asset_id, 'import_batch_id': batch_id, 'captured_at': captured_at}
+        for asset_id, captured_at in scored
+    ])
+    # Bursts detected for the batch before it was indexed
+    db.query(BurstSequence).filter(
+        BurstSequence.import_batch_id == batch_id,
+        ~exists().where(BurstTimelineEntry.burst_sequence_id == BurstSequence.id)
+    ).delete(synchronize_session=False)
+
+    seeds = np.sort(np.array(
+        [captured_at for _, captured_at in scored] + [row.captured_at for row in previous], dtype="datetime64[us]"
+    ))
+    entries = []
+    if len(seeds):
+        reach = np.timedelta64(round(detector.interval_seconds * 1e6), "us")
+        # Asset ID breaks capture-time ties, so results don't depend on load order
+        entries = sorted(
+            _load_region(db, user_id, seeds, reach).values(), key=lambda row: (row.captured_at, row.immich_asset_id)
+        )
+    times = np.array([row.captured_at for row in entries], dtype="datetime64[us]")
+    quality_scores = np.array([row.overall_quality or 0.0 for row in entries], dtype=np.float64)
+    hashes = np.ma.masked_array(
+        [row.perceptual_hash or 0 for row in entries],
+        mask=[row.perceptual_hash is None for row in entries],
+        dtype=np.int64
+    )
+
+    ranges = detector.detect_burst_ranges(times.astype(np.int64) / 1e6, hashes)
+    recommended = scorer.recommend_best_positions(quality_scores, ranges)
+
+    kept: Set[UUID] = set()
+    new_bursts, changed_bursts = [], []
+    burst_of = [None] * len(entries)
+    for members, best in zip(ranges.indices(), recommended):
+        values = {
+            'immich_asset_ids': [entries[index].immich_asset_id for index in members],
+            'recommended_asset_id': entries[best].immich_asset_id
+        }
+        # Continue the existing burst holding most of the members; the rest merge into it
+        overlapping = Counter(
+            entries[index].burst_sequence_id for index in members
+            if entries[index].burst_sequence_id is not None and entries[index].burst_sequence_id not in kept
+        )
+        if overlapping:
+            burst_id = overlapping.most_common(1)[0][0]
+            changed_bursts.append({'id': burst_id, **values})
+        else:
+            burst_id = uuid.uuid4()
+            new_bursts.append({'id': burst_id, 'import_batch_id': batch_id, **values})
+        kept.add(burst_id)
+        for index in members:
+            burst_of[index] = burst_id
+
+    entry_updates = [
+        {'id': row.id, 'burst_sequence_id': burst_id}
+        for row, burst_id in zip(entries, burst_of) if row.burst_sequence_id != burst_id
+    ]
+    stale = orphaned | {row.burst_sequence_id for row in entries if row.burst_sequence_id is not None}
+    _write_bursts(db, new_bursts, changed_bursts, entry_updates, stale - kept)
+    return {batch_id} | {row.import_batch_id for row in entries}
+
+
+def _write_bursts(
+    db: Session,
+    new_bursts: List[Dict[str, Any]],
+    changed_bursts: List[Dict[str, Any]],
+    entry_updates: List[Dict[str, Any]],
+    dropped: Iterable[UUID]
+) -> None:
+    """Apply re-detected bursts with bulk statements, creating bursts before entries point at them."""
+    if new_bursts:
+        db.execute(insert(BurstSequence), new_bursts)
+    if changed_bursts:
+        db.execute(update(BurstSequence), changed_bursts)
+    if entry_updates:
+        db.execute(update(BurstTimelineEntry), entry_updates)
+    dropped = list(dropped)
+    for start in range(0, len(dropped), crud.LOOKUP_CHUNK_SIZE):
+        db.query(BurstSequence).filter(
+            BurstSequence.id.in_(dropped[start:start + crud.LOOKUP_CHUNK_SIZE])
+        ).delete(synchronize_session=False)
+
+
+def refresh_recommendations(db: Session) -> int:
+    """
+    Re-pick every burst's best shot from the current quality scores.
+
+    Burst membership only depends on capture times and perceptual hashes,
+    so re-scoring can only move recommendations. One correlated UPDATE
+    recomputes them all in the database, by the same rule as
+    BurstScorer.recommend_best_positions(): highest overall_quality
+    (missing scores count as 0), ties going to the earliest shot.
+
+    Args:
+        db: Database session
+
+    Returns:
+        Number of bursts updated
+    """
+    best_shot = (
+        select(BurstTimelineEntry.immich_asset_id)
+        .outerjoin(AssetQualityScore, and_(
+            AssetQualityScore.immich_asset_id == BurstTimelineEntry.immich_asset_id,
+            AssetQualityScore.import_batch_id == BurstTimelineEntry.import_batch_id
+        ))
+        .where(BurstTimelineEntry.burst_sequence_id == BurstSequence.id)
+        .order_by(
+            func.coalesce(AssetQualityScore.overall_quality, 0.0).desc(),
+            BurstTimelineEntry.captured_at,
+            BurstTimelineEntry.immich_asset_id
+        )
+        .limit(1)
+        .correlate(BurstSequence)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(BurstSequence).values(recommended_asset_id=best_shot).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
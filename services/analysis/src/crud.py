@@ -0,0 +1,463 @@
+"""Persistence helpers for analysis service."""
+from datetime import datetime
+from sqlalchemy import func, insert, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from . import models
+
+# Keep IN (...) lists well under database parameter limits
+LOOKUP_CHUNK_SIZE = 500
+# Raw features stored with quality results, in score_features_sql() argument order
+QUALITY_FEATURES = ('laplacian_variance', 'working_long_edge', 'mean_brightness', 'brightness_std')
+# Key of the single re-analysis job row
+REANALYSIS_JOB_ID = "reanalysis"
+
+
+def _insert(db: Session, model):
+    """Dialect-specific INSERT supporting ON CONFLICT clauses."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def get_cached_results(
+    db: Session, checksums: Iterable[str], analyzer_version: str
+) -> Dict[str, Dict[str, Optional[float]]]:
+    """Look up cached quality results for content checksums."""
+    unique_checksums = list(dict.fromkeys(checksums))
+    results = {}
+    for start in range(0, len(unique_checksums), LOOKUP_CHUNK_SIZE):
+        rows = db.query(models.QualityResultCache).filter(
+            models.QualityResultCache.analyzer_version == analyzer_version,
+            models.QualityResultCache.checksum.in_(unique_checksums[start:start + LOOKUP_CHUNK_SIZE])
+        ).all()
+        for row in rows:
+            results[row.checksum] = {
+                'blur_score': row.blur_score,
+                'exposure_score': row.exposure_score,
+                'overall_quality': row.overall_quality,
+                'is_corrupted': row.is_corrupted,
+                **{feature: getattr(row, feature) for feature in QUALITY_FEATURES},
+                'perceptual_hash': row.perceptual_hash
+            }
+    return results
+
+
+def store_cached_results(
+    db: Session, analyzer_version: str, results: Dict[str, Dict[str, Optional[float]]]
+) -> None:
+    """Cache quality results by checksum in one bulk INSERT; existing entries win."""
+    rows = [
+        {
+            'checksum': checksum,
+            'analyzer_version': analyzer_version,
+            'blur_score': result.get('blur_score'),
+            'exposure_score': result.get('exposure_score'),
+            'overall_quality': result.get('overall_quality'),
+            'is_corrupted': result.get('is_corrupted', False),
+            **{feature: result.get(feature) for feature in QUALITY_FEATURES},
+            'perceptual_hash': result.get('perceptual_hash')
+        }
+        for checksum, result in results.items()
+    ]
+    if rows:
+        statement = _insert(db, models.QualityResultCache).on_conflict_do_nothing(
+            index_elements=["checksum", "analyzer_version"]
+        )
+        db.execute(statement, rows)
+
+
+def upsert_quality_scores(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Write quality score rows with a bulk INSERT ... ON CONFLICT DO UPDATE.
+
+    Bypasses the ORM unit of work, which dominates write time on large
+    batches; the driver receives all rows in one executemany (batched into
+    multi-row VALUES on PostgreSQL). Re-writing an asset already scored in
+    the batch overwrites its row, so retried chunks are idempotent.
+
+    Args:
+        db: Database session
+        rows: Column values for AssetQualityScore, one dict per asset. All
+              rows must have the same keys.
+    """
+    if not rows:
+        return
+    statement = _insert(db, models.AssetQualityScore)
+    statement = statement.on_conflict_do_update(
+        index_elements=["immich_asset_id", "import_batch_id"],
+        set_={
+            column: statement.excluded[column]
+            for column in rows[0]
+            if column not in ("immich_asset_id", "import_batch_id")
+        }
+    )
+    db.execute(statement, rows)
+
+
+def rescore_quality_results(
+    db: Session,
+    model,
+    score_features_sql: Callable[..., Dict[str, Any]]
+) -> int:
+    """
+    Recompute derived scores from stored raw features.
+
+    All rows are re-scored by the database in one set-based UPDATE, so no
+    features or scores travel between the service and the database. Rows
+    without features (corrupted images, results stored before features
+    were kept) are left alone.
+
+    Args:
+        db: Database session
+        model: AssetQualityScore or QualityResultCache
+        score_features_sql: Maps feature columns to blur_score,
+                        exposure_score and overall_quality expressions, e.g.
+                        QualityScorer.score_features_sql
+
+    Returns:
+        Number of rows re-scored
+    """
+    feature_columns = [getattr(model, feature) for feature in QUALITY_FEATURES]
+    result = db.execute(
+        update(model)
+        .where(*(column.isnot(None) for column in feature_columns))
+        .values(**score_features_sql(*feature_columns))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def _stale_quality_scores(db: Session, analyzer_version: str):
+    """Quality scores produced by another analyzer version, or before versions were recorded."""
+    return db.query(models.AssetQualityScore).filter(or_(
+        models.AssetQualityScore.analyzer_version.is_(None),
+        models.AssetQualityScore.analyzer_version != analyzer_version
+    ))
+
+
+def count_stale_quality_scores(db: Session, analyzer_version: str) -> int:
+    """Count quality scores not produced by analyzer_version."""
+    return _stale_quality_scores(db, analyzer_version).count()
+
+
+def get_stale_quality_scores(
+    db: Session, analyzer_version: str, after_id: Optional[UUID] = None, limit: int = LOOKUP_CHUNK_SIZE
+) -> List[models.AssetQualityScore]:
+    """
+    Page through quality scores not produced by analyzer_version in primary-key order.
+
+    Paging by key rather than re-querying the first rows means scores that
+    fail to re-analyze are passed over instead of being returned forever.
+
+    Args:
+        db: Database session
+        analyzer_version: Current analyzer version
+        after_id: Last primary key of the previous page (None = first page)
+        limit: Page size
+
+    Returns:
+        Stale quality score rows
+    """
+    query = _stale_quality_scores(db, analyzer_version)
+    if after_id is not None:
+        query = query.filter(models.AssetQualityScore.id > after_id)
+    return query.order_by(models.AssetQualityScore.id).limit(limit).all()
+
+
+def upsert_burst_timeline_entries(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Record capture times in the burst index with one bulk INSERT ... ON CONFLICT DO UPDATE.
+
+    An asset already indexed for the user is moved to the new time and
+    batch but keeps its burst until bursts are re-detected.
+
+    Args:
+        db: Database session
+        rows: Column values for BurstTimelineEntry (immich_user_id,
+              immich_asset_id, import_batch_id, captured_at)
+    """
+    if not rows:
+        return
+    statement = _insert(db, models.BurstTimelineEntry)
+    statement = statement.on_conflict_do_update(
+        index_elements=["immich_user_id", "immich_asset_id"],
+        set_={
+            'import_batch_id': statement.excluded.import_batch_id,
+            'captured_at': statement.excluded.captured_at
+        }
+    )
+    db.execute(statement, rows)
+
+
+def lock_burst_index(db: Session, user_id: str) -> None:
+    """
+    Serialize burst index updates for a user until the transaction ends.
+
+    Batches of the same user finishing at once would otherwise re-detect
+    overlapping time windows from the same snapshot. SQLite serializes
+    writers on its own.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:user_id))"), {'user_id': user_id})
+
+
+def claim_interrupted_batches(db: Session, stale_before: datetime) -> List[UUID]:
+    """
+    Claim started batches whose heartbeat went stale.
+
+    Each claim refreshes the heartbeat with a conditional UPDATE, so when
+    several service instances race for the same batch only one wins.
+    """
+    candidates = db.query(models.ImportBatch.id).filter(
+        models.ImportBatch.status == "processing",
+        models.ImportBatch.started_at.isnot(None),
+        models.ImportBatch.heartbeat_at < stale_before
+    ).all()
+
+    claimed = []
+    for (batch_id,) in candidates:
+        updated = db.query(models.ImportBatch).filter(
+            models.ImportBatch.id == batch_id,
+            models.ImportBatch.status == "processing",
+            models.ImportBatch.heartbeat_at < stale_before
+        ).update({models.ImportBatch.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+        if updated:
+            claimed.append(batch_id)
+    db.commit()
+    return claimed
+
+
+def refresh_heartbeat(db: Session, batch_id: UUID, shard_id: Optional[UUID] = None) -> None:
+    """Stamp a running batch's heartbeat, and that of the shard being analyzed."""
+    now = datetime.utcnow()
+    db.query(models.ImportBatch).filter(models.ImportBatch.id == batch_id).update(
+        {models.ImportBatch.heartbeat_at: now}, synchronize_session=False
+    )
+    if shard_id is not None:
+        db.query(models.BatchShard).filter(models.BatchShard.id == shard_id).update(
+            {models.BatchShard.heartbeat_at: now}, synchronize_session=False
+        )
+
+
+def fail_batch(db: Session, batch_id: UUID, error_message: str) -> None:
+    """Mark a batch failed with the error that stopped it."""
+    db.query(models.ImportBatch).filter(models.ImportBatch.id == batch_id).update(
+        {models.ImportBatch.status: "failed", models.ImportBatch.error_message: error_message},
+        synchronize_session=False
+    )
+
+
+def create_batch_shards(db: Session, batch_id: UUID, shards: List[List[str]]) -> None:
+    """Insert a batch's shards as pending, numbered in the given order."""
+    db.execute(insert(models.BatchShard), [
+        {'import_batch_id': batch_id, 'shard_index': index, 'asset_ids': asset_ids, 'status': "pending"}
+        for index, asset_ids in enumerate(shards)
+    ])
+
+
+def claim_batch_shard(db: Session, stale_before: datetime, batch_id: Optional[UUID] = None) -> Optional[UUID]:
+    """
+    Claim the next shard of a processing batch to analyze.
+
+    Pending shards are claimed in order, as are shards whose heartbeat went
+    stale because the instance analyzing them died. Like
+    claim_interrupted_batches(), the claim is a conditional UPDATE, so when
+    several service instances race for the same shard only one wins.
+
+    Args:
+        db: Database session
+        stale_before: Heartbeats older than this are stale
+        batch_id: Only claim this batch's shards (None = any batch)
+
+    Returns:
+        The claimed shard's ID, or None if nothing is left to claim
+    """
+    claimable = [
+        models.BatchShard.import_batch_id.in_(
+            db.query(models.ImportBatch.id).filter(models.ImportBatch.status == "processing")
+        ),
+        or_(
+            models.BatchShard.status == "pending",
+            (models.BatchShard.status == "processing") & (models.BatchShard.heartbeat_at < stale_before)
+        )
+    ]
+    query = db.query(models.BatchShard.id).filter(*claimable)
+    if batch_id is not None:
+        query = query.filter(models.BatchShard.import_batch_id == batch_id)
+
+    for (shard_id,) in query.order_by(models.BatchShard.shard_index).all():
+        updated = db.query(models.BatchShard).filter(models.BatchShard.id == shard_id, *claimable).update(
+            {models.BatchShard.status: "processing", models.BatchShard.heartbeat_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        if updated:
+            db.commit()
+            return shard_id
+    db.commit()
+    return None
+
+
+def get_reanalysis_job(db: Session) -> Optional[models.ReanalysisJob]:
+    """Get the re-analysis job, or None if it has never been started."""
+    return db.get(models.ReanalysisJob, REANALYSIS_JOB_ID)
+
+
+def claim_reanalysis_job(db: Session, analyzer_version: str, stale_before: datetime) -> bool:
+    """
+    Claim the re-analysis job for this service instance.
+
+    The job can be claimed unless it is running with a fresh heartbeat;
+    a job whose instance died is taken over. Like claim_batch_shard(), the
+    claim is a conditional UPDATE, so when several instances are asked to
+    start the job at once only one wins.
+
+    Args:
+        db: Database session
+        analyzer_version: Analyzer the job upgrades scores to
+        stale_before: Heartbeats older than this are stale
+
+    Returns:
+        Whether this instance now runs the job
+    """
+    db.execute(_insert(db, models.ReanalysisJob).on_conflict_do_nothing(index_elements=["id"]), [
+        {'id': REANALYSIS_JOB_ID, 'status': "idle"}
+    ])
+    updated = db.query(models.ReanalysisJob).filter(
+        models.ReanalysisJob.id == REANALYSIS_JOB_ID,
+        or_(
+            models.ReanalysisJob.status != "running",
+            models.ReanalysisJob.heartbeat_at < stale_before
+        )
+    ).update({
+        models.ReanalysisJob.status: "running",
+        models.ReanalysisJob.analyzer_version: analyzer_version,
+        models.ReanalysisJob.stale_assets: 0,
+        models.ReanalysisJob.reanalyzed_assets: 0,
+        models.ReanalysisJob.failed_assets: 0,
+        models.ReanalysisJob.error_message: None,
+        models.ReanalysisJob.seconds_per_asset: None,
+        models.ReanalysisJob.heartbeat_at: datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+def update_reanalysis_job(db: Session, values: Dict[str, Any]) -> None:
+    """Set columns of the re-analysis job and refresh its heartbeat."""
+    db.query(models.ReanalysisJob).filter(models.ReanalysisJob.id == REANALYSIS_JOB_ID).update(
+        {**values, 'heartbeat_at': datetime.utcnow()}, synchronize_session=False
+    )
+
+
+def retry_failed_shards(db: Session, batch_id: UUID) -> None:
+    """Return a batch's failed shards to the pending queue."""
+    db.query(models.BatchShard).filter(
+        models.BatchShard.import_batch_id == batch_id,
+        models.BatchShard.status == "failed"
+    ).update({models.BatchShard.status: "pending"}, synchronize_session=False)
+
+
+def sync_sharded_batch_progress(db: Session, batch_id: UUID) -> None:
+    """
+    Set a sharded batch's progress counters to the sums over its shards.
+
+    The sums are computed by the UPDATE itself, so instances finishing
+    shards concurrently don't overwrite each other's progress.
+    """
+    db.flush()
+    totals = {
+        column: select(func.coalesce(func.sum(getattr(models.BatchShard, column.key)), 0)).where(
+            models.BatchShard.import_batch_id == batch_id
+        ).scalar_subquery()
+        for column in (models.ImportBatch.analyzed_assets, models.ImportBatch.skipped_assets)
+    }
+    db.query(models.ImportBatch).filter(models.ImportBatch.id == batch_id).update(totals, synchronize_session=False)
+
+
+def get_scored_asset_ids(db: Session, batch_id: UUID, asset_ids: List[str]) -> Set[str]:
+    """Those of asset_ids that already have a quality score in the batch."""
+    scored = set()
+    for start in range(0, len(asset_ids), LOOKUP_CHUNK_SIZE):
+        scored.update(asset_id for (asset_id,) in db.query(models.AssetQualityScore.immich_asset_id).filter(
+            models.AssetQualityScore.import_batch_id == batch_id,
+            models.AssetQualityScore.immich_asset_id.in_(asset_ids[start:start + LOOKUP_CHUNK_SIZE])
+        ))
+    return scored
+
+
+def complete_sharded_batch(db: Session, batch_id: UUID) -> bool:
+    """
+    Complete a processing batch once all of its shards are complete.
+
+    Returns:
+        True if this call completed the batch
+    """
+    db.flush()
+    incomplete = db.query(models.BatchShard.id).filter(
+        models.BatchShard.import_batch_id == batch_id,
+        models.BatchShard.status != "complete"
+    ).first()
+    if incomplete is not None:
+        return False
+    sync_sharded_batch_progress(db, batch_id)
+    updated = db.query(models.ImportBatch).filter(
+        models.ImportBatch.id == batch_id,
+        models.ImportBatch.status == "processing"
+    ).update({models.ImportBatch.status: "complete"}, synchronize_session=False)
+    db.commit()
+    return bool(updated)
+
+
+def _triage_rows(batch_id: UUID, stats: Dict[str, Tuple[int, int]]) -> List[Dict[str, Any]]:
+    return [
+        {'import_batch_id': batch_id, 'category_type': category, 'count': count, 'estimated_savings_bytes': savings}
+        for category, (count, savings) in stats.items()
+    ]
+
+
+def add_triage_stats(db: Session, batch_id: UUID, stats: Dict[str, Tuple[int, int]]) -> None:
+    """
+    Add to a batch's triage totals with one INSERT ... ON CONFLICT DO UPDATE.
+
+    The database adds each delta to the stored totals, so concurrent
+    writers (e.g. instances analyzing shards of the same batch) don't
+    overwrite each other.
+
+    Args:
+        db: Database session
+        batch_id: Import batch
+        stats: (count, savings bytes) to add, by category
+    """
+    if not stats:
+        return
+    statement = _insert(db, models.BatchTriageStats)
+    table = models.BatchTriageStats.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=["import_batch_id", "category_type"],
+        set_={
+            'count': table.c.count + statement.excluded.count,
+            'estimated_savings_bytes': table.c.estimated_savings_bytes + statement.excluded.estimated_savings_bytes
+        }
+    )
+    db.execute(statement, _triage_rows(batch_id, stats))
+
+
+def replace_triage_stats(db: Session, batch_id: UUID, stats: Dict[str, Tuple[int, int]]) -> None:
+    """Overwrite a batch's triage totals; categories not in stats are dropped."""
+    db.query(models.BatchTriageStats).filter(
+        models.BatchTriageStats.import_batch_id == batch_id
+    ).delete(synchronize_session=False)
+    if stats:
+        db.execute(insert(models.BatchTriageStats), _triage_rows(batch_id, stats))
+
+
+def replace_all_triage_stats(db: Session, stats_by_batch: Dict[UUID, Dict[str, Tuple[int, int]]]) -> None:
+    """Overwrite the triage totals of all batches; batches not in stats_by_batch are left with none."""
+    db.query(models.BatchTriageStats).delete(synchronize_session=False)
+    rows = [row for batch_id, stats in stats_by_batch.items() for row in _triage_rows(batch_id, stats)]
+    if rows:
+        db.execute(insert(models.BatchTriageStats), rows)
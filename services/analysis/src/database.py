@@ -14,3 +14,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_session_factory():
+    """Session factory for work that outlives a request, such as background jobs."""
+    return SessionLocal
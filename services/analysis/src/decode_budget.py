@@ -0,0 +1,142 @@
+import asyncio
+import io
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional, Tuple, Union
+
+from PIL import Image
+
+# PIL holds decoded RGB(A) pixels in 4 bytes each
+DECODED_BYTES_PER_PIXEL = 4
+# At the working size: resized frame (4 bytes while RGB(A), 1 when decoded
+# straight to grayscale), its uint8 grayscale copy and the int16 Laplacian
+WORKING_BYTES_PER_PIXEL = 4 + 1 + 2
+# Coarsest DCT scale PIL's JPEG draft mode decodes at
+MAX_DCT_SCALE = 8
+
+
+def estimate_decode_bytes(
+    width: int,
+    height: int,
+    working_size: Optional[int] = None,
+    reduced_jpeg: bool = False
+) -> int:
+    """
+    Estimate the peak memory of scoring an image from its dimensions.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        working_size: Long edge images are normalized to (None = native)
+        reduced_jpeg: The image is a JPEG decoded straight to grayscale at
+                      reduced DCT scale
+
+    Returns:
+        Estimated bytes held while decoding and scoring the image
+    """
+    long_edge = max(width, height)
+    pixels = width * height
+    if not working_size or long_edge <= working_size:
+        return pixels * (DECODED_BYTES_PER_PIXEL + WORKING_BYTES_PER_PIXEL)
+
+    if reduced_jpeg:
+        scale = 1
+        while scale < MAX_DCT_SCALE and long_edge / (scale * 2) >= working_size:
+            scale *= 2
+        decoded = math.ceil(width / scale) * math.ceil(height / scale)
+    else:
+        decoded = pixels * DECODED_BYTES_PER_PIXEL
+    working = pixels * (working_size / long_edge) ** 2
+    return int(decoded + working * WORKING_BYTES_PER_PIXEL)
+
+
+def read_image_header(image_data: Union[bytes, bytearray, str]) -> Optional[Tuple[int, int, bool]]:
+    """
+    Read an image's dimensions from its header without decoding pixels.
+
+    Args:
+        image_data: Image bytes or file path
+
+    Returns:
+        (width, height, is_jpeg), or None if the header is unreadable
+
+    Raises:
+        FileNotFoundError: If image_data is a path that does not exist
+    """
+    source = image_data if isinstance(image_data, str) else io.BytesIO(image_data)
+    try:
+        with Image.open(source) as img:
+            return img.width, img.height, img.format == "JPEG"
+    except FileNotFoundError:
+        raise
+    except Exception:
+        return None
+
+
+class DecodeBudget:
+    """
+    Admission control bounding the memory of images decoded concurrently.
+
+    Each image reserves its estimated decode size before it is fetched or
+    decoded and releases it once scored. When the pool is used up,
+    reservations wait in FIFO order, so a large image is not starved by a
+    stream of small ones. An image larger than the whole pool is admitted
+    once nothing else is reserved, so it runs alone rather than never.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: Pool size in estimated bytes (0 = unlimited)
+        """
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    def _fits(self, nbytes: int) -> bool:
+        return not self.max_bytes or self.in_use == 0 or self.in_use + nbytes <= self.max_bytes
+
+    def _wake(self) -> None:
+        """Grant queued reservations, in order, while they fit."""
+        while self._waiters:
+            nbytes, future = self._waiters[0]
+            if future.done():
+                # Cancelled while waiting
+                self._waiters.popleft()
+                continue
+            if not self._fits(nbytes):
+                break
+            self._waiters.popleft()
+            self.in_use += nbytes
+            future.set_result(None)
+
+    async def acquire(self, nbytes: int) -> None:
+        """Reserve nbytes, waiting until the pool has room."""
+        if not self._waiters and self._fits(nbytes):
+            self.in_use += nbytes
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((nbytes, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as the waiter was cancelled
+                self.in_use -= nbytes
+            self._wake()
+            raise
+
+    def release(self, nbytes: int) -> None:
+        """Return a reservation to the pool and admit waiters that now fit."""
+        self.in_use -= nbytes
+        self._wake()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        """Hold a reservation of nbytes for the duration of the block."""
+        await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
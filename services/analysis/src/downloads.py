@@ -0,0 +1,92 @@
+import os
+import tempfile
+from typing import Optional, Union
+
+import httpx
+
+
+class DownloadTooLargeError(Exception):
+    """Raised when a download exceeds the configured size ceiling."""
+
+    def __init__(self, size: int, max_bytes: int):
+        super().__init__(f"Download of {size} bytes exceeds limit of {max_bytes} bytes")
+        self.size = size
+        self.max_bytes = max_bytes
+
+
+async def read_response(
+    response: httpx.Response,
+    max_bytes: int = 0,
+    spill_threshold: int = 0,
+    spill_dir: Optional[str] = None
+) -> Union[bytearray, str]:
+    """
+    Read a streamed response body with bounded memory.
+
+    Bodies up to spill_threshold are read into a buffer pre-sized from
+    Content-Length, so they are never copied while growing. Larger bodies
+    are written to a temp file as they arrive and never held in memory.
+
+    Args:
+        response: Response opened with client.stream()
+        max_bytes: Size ceiling (0 = unlimited). Checked against
+                   Content-Length before reading and against the bytes
+                   actually received.
+        spill_threshold: Largest body kept in memory (0 = never spill)
+        spill_dir: Directory for spilled temp files (None = system default)
+
+    Returns:
+        The body, or the path of the temp file holding it. The caller owns
+        the temp file and must remove it with discard().
+
+    Raises:
+        DownloadTooLargeError: If the body exceeds max_bytes
+    """
+    declared = int(response.headers.get("content-length") or 0)
+    if max_bytes and declared > max_bytes:
+        raise DownloadTooLargeError(declared, max_bytes)
+
+    buffer = bytearray(declared if not spill_threshold or declared <= spill_threshold else 0)
+    received = 0
+    spill_file = None
+    spill_path = None
+    try:
+        async for chunk in response.aiter_bytes():
+            if max_bytes and received + len(chunk) > max_bytes:
+                raise DownloadTooLargeError(received + len(chunk), max_bytes)
+
+            if spill_file is None and spill_threshold and received + len(chunk) > spill_threshold:
+                fd, spill_path = tempfile.mkstemp(suffix=".download", dir=spill_dir)
+                spill_file = os.fdopen(fd, "wb")
+                spill_file.write(memoryview(buffer)[:received])
+                buffer = None
+
+            if spill_file is not None:
+                spill_file.write(chunk)
+            else:
+                # Fills the pre-sized buffer in place; grows it only if the
+                # server sends more than it declared
+                buffer[received:received + len(chunk)] = chunk
+            received += len(chunk)
+    except BaseException:
+        if spill_file is not None:
+            spill_file.close()
+            os.unlink(spill_path)
+        raise
+
+    if spill_file is not None:
+        spill_file.close()
+        return spill_path
+
+    # The server may have sent less than it declared
+    del buffer[received:]
+    return buffer
+
+
+def discard(image_data: Union[bytes, bytearray, str]) -> None:
+    """Remove the temp file behind a spilled download; in-memory data needs no cleanup."""
+    if isinstance(image_data, str):
+        try:
+            os.unlink(image_data)
+        except FileNotFoundError:
+            pass
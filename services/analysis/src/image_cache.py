@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+ENTRY_SUFFIX = ".img"
+TEMP_SUFFIX = ".tmp"
+# Temp files older than this were left behind by a crashed writer
+STALE_TEMP_SECONDS = 3600
+
+
+class ImageCache:
+    """
+    Bounded on-disk LRU cache of downloaded image renditions.
+
+    Entries are keyed by asset ID, content checksum and rendition, so an
+    asset whose file changes in Immich is never served stale. Writes go to
+    a temp file that is renamed into place, so concurrent readers (other
+    batches, workers or service replicas sharing the directory) only ever
+    see complete files. Reads refresh an entry's mtime, and eviction
+    removes the least recently used entries once the byte budget is
+    exceeded.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, low_water: float = 0.9):
+        """
+        Args:
+            directory: Cache directory, created if missing
+            max_bytes: Byte budget for all entries
+            low_water: Eviction frees space down to this fraction of
+                       max_bytes, so it runs once per batch of writes
+                       rather than on every write
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, asset_id: str, checksum: str, rendition: str) -> str:
+        key = f"{asset_id}\0{checksum}\0{rendition}".encode()
+        return os.path.join(self.directory, hashlib.sha256(key).hexdigest() + ENTRY_SUFFIX)
+
+    def get(self, asset_id: str, checksum: str, rendition: str) -> Optional[str]:
+        """
+        Look up a cached rendition.
+
+        Returns:
+            Path of the cached file, or None on a miss. The file belongs to
+            the cache: read it, never delete it.
+        """
+        path = self._path(asset_id, checksum, rendition)
+        try:
+            # Mark as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, asset_id: str, checksum: str, rendition: str, image_data: Union[bytes, bytearray, str]) -> None:
+        """
+        Store a rendition, evicting old entries if over budget.
+
+        Blocking file IO; call it from a worker thread.
+
+        Args:
+            asset_id: Immich asset ID
+            checksum: Immich content checksum
+            rendition: Rendition the data was fetched as
+            image_data: Image bytes, or the path of a file holding them
+        """
+        fd, temp_path = tempfile.mkstemp(suffix=TEMP_SUFFIX, dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if isinstance(image_data, str):
+                    with open(image_data, "rb") as source:
+                        shutil.copyfileobj(source, f)
+                else:
+                    f.write(image_data)
+                size = f.tell()
+            os.replace(temp_path, self._path(asset_id, checksum, rendition))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    total += entry.stat().st_size
+                except FileNotFoundError:
+                    pass
+        return total
+
+    def _evict(self) -> None:
+        """Remove least recently used entries down to the low-water mark. Caller holds the lock."""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Removed by another process meanwhile
+                continue
+            if entry.name.endswith(ENTRY_SUFFIX):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            elif entry.name.endswith(TEMP_SUFFIX) and now - stat.st_mtime > STALE_TEMP_SECONDS:
+                self._remove(entry.path)
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.low_water
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            self._remove(path)
+            total -= size
+            evicted += 1
+        self._size = total
+        logger.info(f"Evicted {evicted} images from cache, {total} bytes remain")
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
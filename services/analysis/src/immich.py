@@ -0,0 +1,504 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar, Union
+
+import httpx
+from fastapi import HTTPException, status
+
+from . import downloads
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Responses that mean Immich is restarting or overloaded rather than that
+# the request itself is wrong
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Connect fails fast everywhere; read timeouts fit each endpoint's payload
+# (for downloads it applies between chunks, not to the whole body)
+ENDPOINT_TIMEOUTS = {
+    "metadata": httpx.Timeout(10.0, connect=5.0),
+    "search": httpx.Timeout(30.0, connect=5.0),
+    "download": httpx.Timeout(60.0, connect=5.0),
+}
+
+
+class ImmichUnavailableError(Exception):
+    """Raised when Immich stays unreachable for longer than the batch may pause."""
+
+
+class CircuitBreaker:
+    """
+    Pauses all Immich requests after repeated transient failures.
+
+    Once failure_threshold consecutive requests fail, the circuit opens and
+    callers wait instead of hammering a server that is down. After
+    reset_seconds one caller is let through as a probe; its success closes
+    the circuit and wakes everyone, its failure re-opens it. Callers give
+    up once the outage has lasted max_pause_seconds, however many probes
+    failed in between.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_seconds: float = 15.0,
+        max_pause_seconds: float = 600.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            failure_threshold: Consecutive transient failures that open the circuit
+            reset_seconds: How long the circuit stays open before a probe
+            max_pause_seconds: Longest a caller waits before giving up
+            clock: Monotonic time source in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_pause_seconds = max_pause_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._outage_started: Optional[float] = None
+        self._closed = asyncio.Event()
+        self._closed.set()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    async def wait(self) -> None:
+        """
+        Return once a request may be sent.
+
+        Raises:
+            ImmichUnavailableError: If the outage has lasted longer than max_pause_seconds
+        """
+        while self._opened_at is not None:
+            now = self._clock()
+            if now - self._outage_started >= self.max_pause_seconds:
+                raise ImmichUnavailableError(f"Immich unavailable for over {self.max_pause_seconds:.0f}s")
+            remaining = self._opened_at + self.reset_seconds - now
+            if remaining <= 0:
+                # Half-open: re-arm the timer so only this caller probes
+                self._opened_at = now
+                return
+            try:
+                await asyncio.wait_for(
+                    self._closed.wait(), timeout=min(remaining, self._outage_started + self.max_pause_seconds - now)
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def record_success(self) -> None:
+        """Close the circuit."""
+        if self._opened_at is not None:
+            logger.info("Immich is reachable again, resuming requests")
+        self._failures = 0
+        self._opened_at = None
+        self._outage_started = None
+        self._closed.set()
+
+    def record_failure(self) -> None:
+        """Count a transient failure, opening the circuit at the threshold."""
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning(f"Immich failed {self._failures} times in a row, pausing requests")
+                self._outage_started = self._clock()
+            self._opened_at = self._clock()
+            self._closed.clear()
+
+
+# Shared by all batches: an Immich outage affects every request equally
+breaker = CircuitBreaker(
+    failure_threshold=settings.IMMICH_BREAKER_THRESHOLD,
+    reset_seconds=settings.IMMICH_BREAKER_RESET_SECONDS,
+    max_pause_seconds=settings.IMMICH_MAX_PAUSE_SECONDS
+)
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether retrying the same request may succeed."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so paused callers do not retry in lockstep."""
+    return random.uniform(0, min(settings.IMMICH_RETRY_MAX_DELAY, settings.IMMICH_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+async def with_retries(operation: Callable[[], Awaitable[T]]) -> T:
+    """
+    Run an idempotent Immich request, retrying transient failures.
+
+    Every attempt first waits on the circuit breaker. Failures while the
+    circuit is open don't count against IMMICH_RETRY_ATTEMPTS: the request
+    keeps waiting for Immich to come back, up to IMMICH_MAX_PAUSE_SECONDS,
+    so an outage pauses the batch instead of failing its assets.
+
+    Args:
+        operation: Makes one attempt; raises httpx errors on failure
+
+    Returns:
+        The operation's result
+
+    Raises:
+        ImmichUnavailableError: If the outage lasts too long, or transient
+                                failures use up the retries
+        Exception: The error, if it is not transient
+    """
+    attempts = max(1, settings.IMMICH_RETRY_ATTEMPTS)
+    attempt = 0
+    while True:
+        await breaker.wait()
+        try:
+            result = await operation()
+        except Exception as e:
+            if not is_transient(e):
+                if isinstance(e, httpx.HTTPStatusError):
+                    # The server answered, so it is up
+                    breaker.record_success()
+                raise
+            breaker.record_failure()
+            if breaker.is_open:
+                logger.debug(f"Waiting for Immich after transient error: {e}")
+                continue
+            attempt += 1
+            if attempt == attempts:
+                raise ImmichUnavailableError(f"Immich request failed {attempts} times: {e}") from e
+            logger.debug(f"Retrying Immich request after transient error: {e}")
+            await asyncio.sleep(backoff_delay(attempt - 1))
+        else:
+            breaker.record_success()
+            return result
+
+
+def get_immich_headers() -> Dict[str, str]:
+    """Get headers for Immich API requests with authentication."""
+    headers = {"Accept": "application/json"}
+    if settings.IMMICH_API_KEY:
+        headers["x-api-key"] = settings.IMMICH_API_KEY
+    return headers
+
+
+def create_immich_client() -> httpx.AsyncClient:
+    """
+    Create a pooled keep-alive client for Immich API requests.
+
+    Each in-flight asset issues a metadata and an image request at the same
+    time, so the pool is sized to twice the configured concurrency.
+
+    Returns:
+        Async HTTP client bound to the Immich API
+    """
+    pool_size = settings.IMMICH_MAX_CONCURRENCY * 2
+    return httpx.AsyncClient(
+        base_url=settings.IMMICH_API_URL,
+        headers=get_immich_headers(),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    )
+
+
+async def fetch_asset_metadata(client: httpx.AsyncClient, asset_id: str) -> Dict[str, Any]:
+    """
+    Fetch asset metadata from Immich API.
+
+    Args:
+        client: Shared Immich HTTP client
+        asset_id: Immich asset ID
+
+    Returns:
+        Asset metadata dictionary
+
+    Raises:
+        HTTPException: If metadata cannot be fetched
+        ImmichUnavailableError: If Immich stays down longer than the batch may pause
+    """
+    async def get_metadata():
+        response = await client.get(f"/api/asset/{asset_id}", timeout=ENDPOINT_TIMEOUTS["metadata"])
+        response.raise_for_status()
+        return response.json()
+
+    try:
+        return await with_retries(get_metadata)
+    except ImmichUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch metadata for asset {asset_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch asset metadata from Immich: {str(e)}"
+        )
+
+
+async def fetch_metadata_page(client: httpx.AsyncClient, asset_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch metadata for many assets with one bulk Immich metadata search.
+
+    Args:
+        client: Shared Immich HTTP client
+        asset_ids: Immich asset IDs (at most IMMICH_METADATA_PAGE_SIZE)
+
+    Returns:
+        Metadata (with exifInfo) by asset ID. Assets Immich did not return
+        are omitted.
+
+    Raises:
+        HTTPException: If the search fails, or the server ignores the ID
+                       filter (older Immich versions)
+        ImmichUnavailableError: If Immich stays down longer than the batch may pause
+    """
+    requested = set(asset_ids)
+    results = {}
+    page = 1
+
+    async def search(page):
+        response = await client.post(
+            "/api/search/metadata",
+            json={"ids": asset_ids, "withExif": True, "size": len(asset_ids), "page": page},
+            timeout=ENDPOINT_TIMEOUTS["search"]
+        )
+        response.raise_for_status()
+        return response.json()["assets"]
+
+    try:
+        while page and len(results) < len(requested):
+            assets = await with_retries(lambda: search(page))
+            for item in assets["items"]:
+                if item["id"] not in requested:
+                    # Paging through the whole library would be slower than per-asset lookups
+                    raise ValueError("server does not support filtering metadata search by ID")
+                results[item["id"]] = item
+            page = assets.get("nextPage")
+    except ImmichUnavailableError:
+        raise
+    except Exception as e:
+        logger.warning(f"Bulk metadata search for {len(asset_ids)} assets failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search asset metadata in Immich: {str(e)}"
+        )
+    return results
+
+
+def resolve_local_original(metadata: Dict[str, Any]) -> Optional[str]:
+    """
+    Map an asset's originalPath onto the locally mounted media directory.
+
+    Immich reports paths as it sees them (under IMMICH_MEDIA_ROOT); when the
+    same files are mounted here at LOCAL_MEDIA_ROOT, originals can be read
+    from disk instead of downloaded.
+
+    Args:
+        metadata: Immich asset metadata
+
+    Returns:
+        Local path of the original, or None if local access is disabled,
+        the path is relative (to Immich's working directory, which is not
+        known here) or lies outside the shared mount, the file is missing,
+        or it exceeds IMMICH_MAX_DOWNLOAD_BYTES (so oversize handling applies)
+    """
+    original_path = metadata.get('originalPath')
+    if not settings.LOCAL_MEDIA_ROOT or not original_path:
+        return None
+    if not os.path.isabs(original_path) or not os.path.isabs(settings.IMMICH_MEDIA_ROOT):
+        return None
+
+    immich_root = os.path.normpath(settings.IMMICH_MEDIA_ROOT)
+    original_path = os.path.normpath(original_path)
+    if os.path.commonpath([immich_root, original_path]) != immich_root:
+        return None
+
+    local_path = os.path.join(settings.LOCAL_MEDIA_ROOT, os.path.relpath(original_path, immich_root))
+    try:
+        size = os.stat(local_path).st_size
+    except OSError:
+        return None
+    if settings.IMMICH_MAX_DOWNLOAD_BYTES and size > settings.IMMICH_MAX_DOWNLOAD_BYTES:
+        return None
+    return local_path
+
+
+# Immich endpoint and query parameters for each image rendition. Previews
+# are ~1440px JPEGs and thumbnails ~250px WEBPs generated at upload time.
+RENDITION_ENDPOINTS = {
+    "original": ("/api/asset/file/{asset_id}", {}),
+    "preview": ("/api/asset/thumbnail/{asset_id}", {"format": "JPEG"}),
+    "thumbnail": ("/api/asset/thumbnail/{asset_id}", {"format": "WEBP"}),
+}
+
+
+async def fetch_image_from_immich(
+    client: httpx.AsyncClient,
+    asset_id: str,
+    rendition: Optional[str] = None
+) -> Union[bytearray, str]:
+    """
+    Fetch image bytes from Immich API.
+
+    The body is streamed: small files land in a buffer pre-sized from
+    Content-Length, files over DOWNLOAD_SPILL_BYTES are written to a temp
+    file, and anything over IMMICH_MAX_DOWNLOAD_BYTES is refused. Oversized
+    originals are replaced by the preview rendition when
+    IMMICH_OVERSIZE_ACTION is "preview". Peak memory per download is thus
+    bounded by DOWNLOAD_SPILL_BYTES whatever users import. Interrupted
+    downloads are retried from the start.
+
+    Args:
+        client: Shared Immich HTTP client
+        asset_id: Immich asset ID
+        rendition: original, preview or thumbnail. Defaults to
+                   IMMICH_ASSET_RENDITION.
+
+    Returns:
+        Image bytes, or the path of a temp file holding them. Release the
+        result with downloads.discard() once it has been scored.
+
+    Raises:
+        HTTPException: If image cannot be fetched, or is too large and
+                       cannot be routed to a smaller rendition
+        ImmichUnavailableError: If Immich stays down longer than the batch may pause
+    """
+    rendition = rendition or settings.IMMICH_ASSET_RENDITION
+    path, params = RENDITION_ENDPOINTS[rendition]
+
+    async def download():
+        async with client.stream(
+            "GET",
+            path.format(asset_id=asset_id),
+            params=params,
+            headers={"Accept": "application/octet-stream"},
+            timeout=ENDPOINT_TIMEOUTS["download"]
+        ) as response:
+            response.raise_for_status()
+            return await downloads.read_response(
+                response,
+                max_bytes=settings.IMMICH_MAX_DOWNLOAD_BYTES,
+                spill_threshold=settings.DOWNLOAD_SPILL_BYTES,
+                spill_dir=settings.DOWNLOAD_SPILL_DIR or None
+            )
+
+    try:
+        return await with_retries(download)
+    except downloads.DownloadTooLargeError as e:
+        if rendition == "original" and settings.IMMICH_OVERSIZE_ACTION == "preview":
+            logger.info(f"Asset {asset_id} is too large ({e}), scoring its preview instead")
+            return await fetch_image_from_immich(client, asset_id, rendition="preview")
+        logger.warning(f"Skipping image for asset {asset_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image from Immich is too large: {str(e)}"
+        )
+    except ImmichUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch image for asset {asset_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch image from Immich: {str(e)}"
+        )
+
+
+async def fetch_original_head(client: httpx.AsyncClient, asset_id: str, size: int) -> bytes:
+    """
+    Fetch the leading bytes of an asset's original file.
+
+    Sends an HTTP Range request; if the server ignores it and sends the
+    whole file, reading stops after size bytes anyway.
+
+    Args:
+        client: Shared Immich HTTP client
+        asset_id: Immich asset ID
+        size: Number of leading bytes wanted
+
+    Returns:
+        Up to size leading bytes of the original
+
+    Raises:
+        HTTPException: If the file cannot be fetched
+        ImmichUnavailableError: If Immich stays down longer than the batch may pause
+    """
+    path, params = RENDITION_ENDPOINTS["original"]
+
+    async def get_head():
+        head = bytearray()
+        async with client.stream(
+            "GET",
+            path.format(asset_id=asset_id),
+            params=params,
+            headers={"Accept": "application/octet-stream", "Range": f"bytes=0-{size - 1}"},
+            timeout=ENDPOINT_TIMEOUTS["metadata"]
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                head += chunk
+                if len(head) >= size:
+                    break
+        return bytes(head[:size])
+
+    try:
+        return await with_retries(get_head)
+    except ImmichUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch start of original for asset {asset_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch asset from Immich: {str(e)}"
+        )
+
+
+async def fetch_original_tail(client: httpx.AsyncClient, asset_id: str, size: int) -> bytes:
+    """
+    Fetch the trailing bytes of an asset's original file.
+
+    Sends an HTTP suffix Range request; if the server ignores it and sends
+    the whole file, only the last size bytes are kept while reading.
+
+    Args:
+        client: Shared Immich HTTP client
+        asset_id: Immich asset ID
+        size: Number of trailing bytes wanted
+
+    Returns:
+        Up to size trailing bytes of the original
+
+    Raises:
+        HTTPException: If the file cannot be fetched
+        ImmichUnavailableError: If Immich stays down longer than the batch may pause
+    """
+    path, params = RENDITION_ENDPOINTS["original"]
+
+    async def get_tail():
+        tail = bytearray()
+        async with client.stream(
+            "GET",
+            path.format(asset_id=asset_id),
+            params=params,
+            headers={"Accept": "application/octet-stream", "Range": f"bytes=-{size}"},
+            timeout=ENDPOINT_TIMEOUTS["metadata"]
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                tail += chunk
+                del tail[:-size]
+        return bytes(tail)
+
+    try:
+        return await with_retries(get_tail)
+    except ImmichUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to fetch end of original for asset {asset_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to fetch asset from Immich: {str(e)}"
+        )
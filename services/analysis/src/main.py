@@ -1,26 +1,73 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import or_, text
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional, Set, Union
 from uuid import UUID
+import asyncio
 import httpx
-from .database import get_db, engine, Base
+from dateutil import parser as date_parser
+from . import crud, downloads
+from .immich import (
+    ImmichUnavailableError, create_immich_client, fetch_asset_metadata,
+    fetch_image_from_immich, fetch_metadata_page, fetch_original_head, fetch_original_tail,
+    resolve_local_original
+)
+from .database import get_db, get_session_factory, engine, Base
 from .config import settings
-from .models import ImportBatch, AssetQualityScore, BurstSequence
-from .schemas import ImportBatchCreate, ImportBatchResponse, AnalysisStatus, QualityScoreResponse, BurstSequenceResponse
-from .quality.scorer import QualityScorer
+from .models import (
+    ImportBatch, AssetQualityScore, BatchShard, BatchTriageStats, BurstSequence, BurstTimelineEntry, QualityResultCache,
+    ReanalysisJob
+)
+from .schemas import (
+    ImportBatchCreate, ImportBatchResponse, AnalysisStatus, QualityScoreResponse, RescoreResponse, ReanalysisStatus,
+    BurstSequenceResponse, TriageCategory, TriageDashboard
+)
+from .quality.corruption_detector import CorruptionDetector
+from .quality.engine import ScoringEngine
+from .quality.structure import STRUCTURE_CORRUPT, check_tail
+from .quality.exif_thumbnail import extract_exif_thumbnail
+from .quality.scorer import ANALYZER_VERSION, QualityScorer
 from .burst.detector import BurstDetector
 from .burst.scorer import BurstScorer
+from .burst_index import refresh_recommendations, update_burst_index
+from .triage import BADGE_COLORS, TRIAGE_CATEGORIES, quality_stats, refresh_all_triage_stats, refresh_triage_stats
+from .progress import AssetCounts, ThroughputTracker, estimate_eta_seconds
+from .image_cache import ImageCache
+from .decode_budget import DecodeBudget, estimate_decode_bytes, read_image_header
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 logging.basicConfig(level=settings.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
 VERSION = "0.1.0"
 
+# Shared across batches; worker processes start on first use
+scoring_engine = ScoringEngine(
+    max_workers=settings.SCORING_WORKERS or None,
+    opencv_threads=settings.OPENCV_THREADS,
+    working_size=settings.ANALYSIS_WORKING_SIZE or None,
+    reduced_decode=settings.ANALYSIS_REDUCED_DECODE,
+    blur_threshold=settings.QUALITY_BLUR_THRESHOLD,
+    blur_weight=settings.QUALITY_BLUR_WEIGHT,
+    batch_size=settings.CASCADE_BATCH_SIZE,
+    batch_wait=settings.CASCADE_BATCH_WAIT_SECONDS
+)
+
+# Optional local copy of downloaded images, shared across batches
+image_cache = (
+    ImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES)
+    if settings.IMAGE_CACHE_DIR else None
+)
+
+# Bounds the memory of images being decoded, across all batches
+decode_budget = DecodeBudget(settings.DECODE_BUDGET_BYTES)
+
+# Checks originals whose score the cascade pre-screen settled
+corruption_detector = CorruptionDetector()
+
 
 # Note: Using lifespan event handler instead of module-level create_all()
 # to prevent database connection attempts during test imports
@@ -28,8 +75,13 @@ VERSION = "0.1.0"
 async def lifespan(app: FastAPI):
     # Startup: Create tables
     Base.metadata.create_all(bind=engine)
+    watchdog = asyncio.create_task(watch_interrupted_batches(get_session_factory()))
+    shard_watcher = asyncio.create_task(watch_pending_shards(get_session_factory()))
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: stop the watchers and scoring worker processes
+    watchdog.cancel()
+    shard_watcher.cancel()
+    scoring_engine.shutdown()
 
 
 app = FastAPI(
@@ -108,172 +160,1132 @@ def create_import_batch(
     )
 
 
-def get_immich_headers() -> Dict[str, str]:
-    """Get headers for Immich API requests with authentication."""
-    headers = {"Accept": "application/json"}
-    if settings.IMMICH_API_KEY:
-        headers["x-api-key"] = settings.IMMICH_API_KEY
-    return headers
+def parse_capture_time(metadata: Dict[str, Any]) -> datetime:
+    """
+    Extract the capture timestamp used for burst detection.
+
+    Immich stores timestamps in fileCreatedAt or exifInfo.dateTimeOriginal.
 
+    Args:
+        metadata: Immich asset metadata
 
-def fetch_asset_metadata(asset_id: str) -> Dict[str, Any]:
+    Returns:
+        Naive UTC capture timestamp, or the current time if none is available
+    """
+    timestamp_str = metadata.get('fileCreatedAt') or metadata.get('exifInfo', {}).get('dateTimeOriginal')
+    if timestamp_str:
+        timestamp = date_parser.parse(timestamp_str)
+        # Store naive UTC so timestamps from different sources compare and persist consistently
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        return timestamp
+    # Fallback to current time if no timestamp available
+    return datetime.utcnow()
+
+
+def current_analyzer_version() -> str:
     """
-    Fetch asset metadata from Immich API.
+    Identify the scoring algorithm together with the settings that change its output.
+
+    Cached results are only reused when this matches exactly.
+
+    Returns:
+        Analyzer version string
+    """
+    decode = "reduced" if settings.ANALYSIS_REDUCED_DECODE else "full"
+    version = f"{ANALYZER_VERSION}/{settings.IMMICH_ASSET_RENDITION}/{settings.ANALYSIS_WORKING_SIZE}/{decode}"
+    if settings.ANALYSIS_CASCADE:
+        version += (
+            f"/cascade-low-{settings.CASCADE_PRESCREEN}-{settings.CASCADE_THRESHOLD:g}-{settings.CASCADE_BAND:g}"
+            "-preview"
+        )
+    return version
+
+
+async def fetch_batch_metadata(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    asset_ids: List[str]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch metadata for all assets of a batch concurrently.
+
+    Metadata is prefetched in pages of IMMICH_METADATA_PAGE_SIZE assets via
+    Immich's bulk metadata search, so a batch of thousands of assets costs
+    a few dozen requests. Assets a page did not return (or every asset of
+    a page that failed) fall back to one lookup per asset.
 
     Args:
-        asset_id: Immich asset ID
+        client: Shared Immich HTTP client
+        semaphore: Batch-wide concurrency limit
+        asset_ids: Immich asset IDs
+
+    Returns:
+        Metadata by asset ID. Assets whose metadata could not be fetched are omitted.
+    """
+    metadata_by_id = {}
+
+    page_size = settings.IMMICH_METADATA_PAGE_SIZE
+    if page_size > 0:
+        async def fetch_page(page_ids):
+            async with semaphore:
+                try:
+                    return await fetch_metadata_page(client, page_ids)
+                except HTTPException:
+                    return {}
+
+        pages = await asyncio.gather(*(
+            fetch_page(asset_ids[start:start + page_size])
+            for start in range(0, len(asset_ids), page_size)
+        ))
+        for page in pages:
+            metadata_by_id.update(page)
+
+    async def fetch_one(asset_id):
+        async with semaphore:
+            try:
+                return asset_id, await fetch_asset_metadata(client, asset_id)
+            except HTTPException:
+                return asset_id, None
+
+    missing = [asset_id for asset_id in asset_ids if asset_id not in metadata_by_id]
+    if missing and page_size > 0:
+        logger.info(f"Fetching metadata for {len(missing)} assets individually")
+    results = await asyncio.gather(*(fetch_one(asset_id) for asset_id in missing))
+    metadata_by_id.update({asset_id: metadata for asset_id, metadata in results if metadata is not None})
+    return metadata_by_id
+
+
+def estimate_asset_decode_bytes(metadata: Dict[str, Any], rendition: Optional[str] = None) -> Optional[int]:
+    """
+    Estimate the decode memory of an asset's original from its metadata.
+
+    Args:
+        metadata: Immich asset metadata with exifInfo
+        rendition: Rendition to be scored. Defaults to IMMICH_ASSET_RENDITION.
 
     Returns:
-        Asset metadata dictionary
+        Estimated bytes, or None if the metadata has no dimensions or a
+        smaller rendition is scored
+    """
+    exif_info = metadata.get('exifInfo') or {}
+    width = exif_info.get('exifImageWidth')
+    height = exif_info.get('exifImageHeight')
+    if (rendition or settings.IMMICH_ASSET_RENDITION) != "original" or not width or not height:
+        return None
+    return estimate_decode_bytes(
+        width, height,
+        working_size=settings.ANALYSIS_WORKING_SIZE or None,
+        reduced_jpeg=settings.ANALYSIS_REDUCED_DECODE and metadata.get('originalMimeType') == "image/jpeg"
+    )
+
+
+def estimate_image_decode_bytes(image_data: Union[bytes, bytearray, str]) -> int:
+    """
+    Estimate the decode memory of fetched image data from its header.
+
+    Unreadable headers estimate 0: the decode fails fast on them.
 
     Raises:
-        HTTPException: If metadata cannot be fetched
+        FileNotFoundError: If image_data is a path that does not exist
     """
+    header = read_image_header(image_data)
+    if header is None:
+        return 0
+    width, height, is_jpeg = header
+    return estimate_decode_bytes(
+        width, height,
+        working_size=settings.ANALYSIS_WORKING_SIZE or None,
+        reduced_jpeg=settings.ANALYSIS_REDUCED_DECODE and is_jpeg
+    )
+
+
+async def cache_image(asset_id: str, checksum: str, rendition: str, image_data: Union[bytearray, str]) -> None:
+    """Store a downloaded image in the on-disk cache; a failed write only costs a future download."""
     try:
-        url = f"{settings.IMMICH_API_URL}/api/asset/{asset_id}"
-        response = httpx.get(url, headers=get_immich_headers(), timeout=10.0)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Failed to fetch metadata for asset {asset_id}: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch asset metadata from Immich: {str(e)}"
-        )
+        await asyncio.to_thread(image_cache.put, asset_id, checksum, rendition, image_data)
+    except OSError as e:
+        logger.warning(f"Failed to cache image for asset {asset_id}: {e}")
 
 
-def fetch_image_from_immich(asset_id: str) -> bytes:
+async def prescreen_asset(
+    client: httpx.AsyncClient,
+    engine: ScoringEngine,
+    asset_id: str,
+    local_path: Optional[str] = None
+) -> Optional[Dict[str, Optional[float]]]:
     """
-    Fetch image bytes from Immich API.
+    Score a tiny rendition of an asset as the cascade's first tier.
+
+    With CASCADE_PRESCREEN "exif", the thumbnail embedded in the original's
+    EXIF metadata is used, read from the first CASCADE_HEAD_BYTES of the
+    file (from local disk, or with an HTTP Range request). Otherwise, or if
+    the original has no EXIF thumbnail, Immich's thumbnail is used.
+    Concurrent pre-screens are scored together in batches of up to
+    CASCADE_BATCH_SIZE.
 
     Args:
+        client: Shared Immich HTTP client
+        engine: Scoring engine
         asset_id: Immich asset ID
+        local_path: Local path of the original, if available
 
     Returns:
-        Image bytes
-
-    Raises:
-        HTTPException: If image cannot be fetched
+        Pre-screen result, or None if no tiny rendition could be fetched
     """
     try:
-        url = f"{settings.IMMICH_API_URL}/api/asset/file/{asset_id}"
-        headers = get_immich_headers()
-        headers["Accept"] = "application/octet-stream"
-        response = httpx.get(url, headers=headers, timeout=30.0)
-        response.raise_for_status()
-        return response.content
-    except Exception as e:
-        logger.error(f"Failed to fetch image for asset {asset_id}: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to fetch image from Immich: {str(e)}"
-        )
+        thumbnail = None
+        if settings.CASCADE_PRESCREEN == "exif":
+            if local_path is not None:
+                with open(local_path, "rb") as f:
+                    head = f.read(settings.CASCADE_HEAD_BYTES)
+            else:
+                head = await fetch_original_head(client, asset_id, settings.CASCADE_HEAD_BYTES)
+            thumbnail = extract_exif_thumbnail(head)
+        if thumbnail is None:
+            thumbnail = await fetch_image_from_immich(client, asset_id, rendition="thumbnail")
+    except (HTTPException, OSError) as e:
+        logger.debug(f"Pre-screen unavailable for asset {asset_id}: {e}")
+        return None
+    return await engine.score_batched(thumbnail)
 
 
-@app.post("/batches/{batch_id}/analyze", response_model=AnalysisStatus)
-def analyze_batch(
-    batch_id: UUID,
-    db: Session = Depends(get_db)
-):
-    """Trigger analysis on a batch of imported assets"""
-    # Retrieve batch from database
-    batch = db.query(ImportBatch).filter(ImportBatch.id == batch_id).first()
-    if not batch:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Import batch {batch_id} not found"
-        )
+async def check_original_structure(
+    client: httpx.AsyncClient,
+    asset_id: str,
+    checksum: Optional[str],
+    local_path: Optional[str],
+    mime_type: Optional[str]
+) -> str:
+    """
+    Check an asset's original for truncation without downloading it.
 
-    # Initialize quality scorer and burst detector
-    quality_scorer = QualityScorer()
-    burst_detector = BurstDetector(interval_seconds=2.0)
-    burst_scorer = BurstScorer()
+    A local or cached copy of the original is checked in full through a
+    memory map. Otherwise only its last CASCADE_TAIL_BYTES are fetched,
+    with an HTTP Range request, and searched for the format's end marker;
+    formats without one (HEIC and other ISO-BMFF files) are left unchecked.
 
-    # Analyze each asset
-    analyzed_count = 0
-    asset_metadata_list = []
+    Args:
+        client: Shared Immich HTTP client
+        asset_id: Immich asset ID
+        checksum: Asset checksum, keying the image cache
+        local_path: Local path of the original, if available
+        mime_type: MIME type of the original
 
-    for asset_id in batch.asset_ids:
-        try:
-            # Fetch asset metadata from Immich (includes timestamp, EXIF data, etc.)
-            metadata = fetch_asset_metadata(asset_id)
-
-            # Fetch image from Immich
-            image_bytes = fetch_image_from_immich(asset_id)
-
-            # Analyze quality
-            quality_result = quality_scorer.analyze_image_bytes(image_bytes)
-
-            # Create quality score record
-            quality_score = AssetQualityScore(
-                immich_asset_id=asset_id,
-                import_batch_id=batch_id,
-                blur_score=quality_result.get('blur_score'),
-                exposure_score=quality_result.get('exposure_score'),
-                overall_quality=quality_result.get('overall_quality'),
-                is_corrupted=quality_result.get('is_corrupted', False)
+    Returns:
+        STRUCTURE_VALID, STRUCTURE_CORRUPT or STRUCTURE_UNKNOWN
+    """
+    if local_path is None and image_cache is not None and checksum:
+        local_path = image_cache.get(asset_id, checksum, "original")
+    if local_path is not None:
+        return await asyncio.to_thread(corruption_detector.check_structure, local_path)
+
+    tail = await fetch_original_tail(client, asset_id, settings.CASCADE_TAIL_BYTES)
+    return check_tail(tail, mime_type)
+
+
+async def analyze_asset(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    engine: ScoringEngine,
+    asset_id: str,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Dict[str, Optional[float]]:
+    """
+    Fetch and score a single asset's image.
+
+    The semaphore bounds how many assets are in flight, which also bounds
+    how many downloaded images are held in memory at once. In cascade mode
+    (ANALYSIS_CASCADE) a tiny rendition is scored first: clearly bad photos
+    keep that result and all others are scored from Immich's preview,
+    which the validated working size makes equivalent to the original.
+    Neither downloads the original; it is only checked for truncation,
+    from its last bytes, and fully analyzed if that check fails. Originals
+    on a locally mounted media directory (LOCAL_MEDIA_ROOT) are
+    memory-mapped from disk without contacting Immich. When the image
+    cache is enabled, images are read from local disk if the asset's
+    checksum matches a cached download, and cached after downloading.
+    Decoding reserves the image's estimated memory from the global decode
+    budget (DECODE_BUDGET_BYTES): before the fetch when the metadata has
+    its dimensions, so a full budget holds back downloads, otherwise from
+    the fetched image's header.
+
+    Args:
+        client: Shared Immich HTTP client
+        semaphore: Batch-wide concurrency limit
+        engine: Scoring engine used for the downloaded image
+        asset_id: Immich asset ID
+        metadata: Immich asset metadata. Its originalPath enables local
+                  reads, its checksum the image cache and its
+                  originalMimeType the cascade's truncation check.
+
+    Returns:
+        Dict with blur_score, exposure_score, overall_quality, is_corrupted
+    """
+    metadata = metadata or {}
+    checksum = metadata.get('checksum')
+    async with semaphore:
+        rendition = settings.IMMICH_ASSET_RENDITION
+        original_path = resolve_local_original(metadata)
+
+        if settings.ANALYSIS_CASCADE:
+            prescreen, structure = await asyncio.gather(
+                prescreen_asset(client, engine, asset_id, original_path),
+                check_original_structure(client, asset_id, checksum, original_path, metadata.get('originalMimeType'))
             )
-            db.add(quality_score)
-
-            # Parse timestamp from metadata for burst detection
-            # Immich stores timestamps in fileCreatedAt or exifInfo.dateTimeOriginal
-            timestamp_str = metadata.get('fileCreatedAt') or metadata.get('exifInfo', {}).get('dateTimeOriginal')
-            if timestamp_str:
-                from dateutil import parser
-                timestamp = parser.parse(timestamp_str)
+            if structure == STRUCTURE_CORRUPT:
+                # Damage to the original doesn't show in its smaller renditions
+                rendition = "original"
+            elif prescreen is not None and not QualityScorer.needs_full_analysis(
+                prescreen, settings.CASCADE_THRESHOLD, settings.CASCADE_BAND
+            ):
+                return prescreen
             else:
-                # Fallback to current time if no timestamp available
-                timestamp = datetime.utcnow()
+                rendition = "preview"
 
-            # Store metadata for burst detection
-            asset_metadata_list.append({
-                'id': asset_id,
-                'timestamp': timestamp,
-                'quality_score': quality_result.get('overall_quality', 0.0)
-            })
+        local_path = original_path if rendition == "original" else None
+        estimate = estimate_asset_decode_bytes(metadata, rendition)
+        async with decode_budget.reserve(estimate or 0):
+            return await score_asset_image(
+                client, engine, asset_id, checksum, rendition, local_path, estimate is None
+            )
 
-            analyzed_count += 1
 
-        except Exception as e:
-            logger.error(f"Failed to analyze asset {asset_id}: {e}")
-            # Continue with next asset (this one will be skipped)
-            batch.skipped_assets += 1
+async def score_asset_image(
+    client: httpx.AsyncClient,
+    engine: ScoringEngine,
+    asset_id: str,
+    checksum: Optional[str],
+    rendition: str,
+    local_path: Optional[str],
+    reserve_from_header: bool
+) -> Dict[str, Optional[float]]:
+    """Score a rendition of an asset from local disk, the image cache or Immich, in that order."""
+    async def score(image_data):
+        if not reserve_from_header:
+            return await engine.score(image_data)
+        estimate = await asyncio.to_thread(estimate_image_decode_bytes, image_data)
+        async with decode_budget.reserve(estimate):
+            return await engine.score(image_data)
 
-    # Update batch progress
-    batch.analyzed_assets = analyzed_count
+    use_cache = image_cache is not None and bool(checksum)
+    if local_path is not None:
+        try:
+            return await score(local_path)
+        except FileNotFoundError:
+            # Removed since it was resolved; fall back to HTTP
+            pass
 
-    # Detect burst sequences
-    bursts = burst_detector.detect_bursts(asset_metadata_list)
+    if use_cache:
+        cached_path = image_cache.get(asset_id, checksum, rendition)
+        if cached_path is not None:
+            try:
+                return await score(cached_path)
+            except FileNotFoundError:
+                # Evicted between lookup and scoring; download it again
+                pass
 
-    for burst in bursts:
-        # Recommend best shot
-        best_asset_id = burst_scorer.recommend_best_shot(burst)
+    image_data = await fetch_image_from_immich(client, asset_id, rendition=rendition)
+    try:
+        # Scoring is CPU-bound and runs in the engine's worker processes,
+        # so other downloads keep making progress
+        if use_cache:
+            result, _ = await asyncio.gather(
+                score(image_data), cache_image(asset_id, checksum, rendition, image_data)
+            )
+            return result
+        return await score(image_data)
+    finally:
+        downloads.discard(image_data)
 
-        # Create burst sequence record
-        burst_sequence = BurstSequence(
-            import_batch_id=batch_id,
-            immich_asset_ids=[photo['id'] for photo in burst],
-            recommended_asset_id=best_asset_id
-        )
-        db.add(burst_sequence)
 
-    # Update batch status
-    batch.status = "complete"
-    db.commit()
+def build_analysis_status(batch: ImportBatch) -> AnalysisStatus:
+    """
+    Build the progress report for a batch.
 
+    Args:
+        batch: Import batch
+
+    Returns:
+        Analysis status with progress percentage and ETA
+    """
     # Calculate progress percentage
     progress_percent = (batch.analyzed_assets / batch.total_assets * 100) if batch.total_assets > 0 else 0
 
+    eta_seconds = None
+    if batch.status == "processing":
+        remaining = batch.total_assets - batch.analyzed_assets - batch.skipped_assets
+        eta_seconds = estimate_eta_seconds(remaining, batch.seconds_per_asset)
+
     return AnalysisStatus(
         status=batch.status,
         progress_percent=progress_percent,
-        eta_seconds=None,
+        eta_seconds=eta_seconds,
         total_assets=batch.total_assets,
         analyzed_assets=batch.analyzed_assets,
         skipped_assets=batch.skipped_assets
     )
 
 
+async def run_in_session(session_factory: Callable[[], Session], work: Callable[[Session], Any]) -> Any:
+    """
+    Run blocking database work in a worker thread, in a session of its own.
+
+    SQLAlchemy's synchronous API blocks the calling thread: run on the
+    event loop, a large upsert or burst re-detection would stall status
+    requests and every download in flight. Sessions are not thread-safe,
+    so each call opens its own, committed once work returns and rolled
+    back if it raises.
+
+    Args:
+        session_factory: Factory for database sessions
+        work: Called with the session. Must not return ORM instances,
+              which are detached once the session closes.
+
+    Returns:
+        What work returned
+    """
+    def run():
+        db = session_factory()
+        try:
+            result = work(db)
+            db.commit()
+            return result
+        finally:
+            db.close()
+
+    return await asyncio.to_thread(run)
+
+
+async def keep_batch_alive(
+    session_factory: Callable[[], Session],
+    batch_id: UUID,
+    shard_id: Optional[UUID] = None
+) -> None:
+    """
+    Refresh a running batch's heartbeat until cancelled.
+
+    Each refresh is a short transaction of its own, separate from the
+    job's writes, so a long checkpoint never delays it and a stale
+    heartbeat reliably means the process running the batch has died.
+
+    Args:
+        session_factory: Factory for database sessions
+        batch_id: Batch being analyzed
+        shard_id: Shard of the batch being analyzed, whose heartbeat is
+                  refreshed too
+    """
+    while True:
+        await asyncio.sleep(settings.ANALYSIS_HEARTBEAT_SECONDS)
+        await run_in_session(session_factory, lambda db: crud.refresh_heartbeat(db, batch_id, shard_id))
+
+
+def detect_batch_bursts(db: Session, batch_id: UUID, asset_ids: Optional[List[str]] = None) -> None:
+    """
+    Update the owner's burst index with a batch's persisted quality scores.
+
+    Works from the database rather than in-memory results so a resumed
+    batch sees the assets scored before the interruption. Bursts may span
+    batches: a burst continuing an earlier upload extends that upload's
+    BurstSequence instead of starting a new one. With
+    BURST_MAX_HASH_DISTANCE, bursts are also split between consecutive
+    photos whose perceptual hashes differ. The triage totals of every batch
+    whose bursts were re-detected are recomputed.
+
+    Args:
+        db: Database session
+        batch_id: Import batch
+        asset_ids: Only index these assets of the batch, e.g. one shard's
+                   (None = all of them)
+    """
+    burst_detector = BurstDetector(
+        interval_seconds=2.0,
+        max_hash_distance=settings.BURST_MAX_HASH_DISTANCE or None
+    )
+    affected_batches = update_burst_index(db, batch_id, burst_detector, BurstScorer(), asset_ids)
+    for affected_batch_id in affected_batches:
+        refresh_triage_stats(db, affected_batch_id, settings.TRIAGE_LOW_QUALITY_THRESHOLD)
+
+
+async def score_assets(
+    session_factory: Callable[[], Session],
+    batch_id: UUID,
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    asset_ids: List[str],
+    metadata_by_id: Dict[str, Dict[str, Any]],
+    progress: AssetCounts,
+    checkpoint: Callable[[Session, int], None]
+) -> None:
+    """
+    Score assets of a batch and persist their results.
+
+    Assets whose checksum was already scored by the current analyzer
+    version (in any batch) are copied from the result cache without
+    downloading the image. Results are buffered and written with multi-row
+    upserts, so retrying a chunk is idempotent. Every
+    ANALYSIS_PROGRESS_INTERVAL completed assets the buffer is written, and
+    checkpoint() records the progress in the same transaction, so an
+    interrupted run loses at most one chunk. The rest is written on return,
+    or when an Immich outage stops the run. Database work runs in worker
+    threads (see run_in_session()), so scoring continues while a chunk is
+    written.
+
+    Args:
+        session_factory: Factory for database sessions
+        batch_id: Import batch the assets belong to
+        client: Shared Immich HTTP client
+        semaphore: Concurrency limit
+        asset_ids: Assets to score
+        metadata_by_id: Prefetched metadata (may cover other assets too).
+                        Assets without metadata are skipped.
+        progress: Counts of the batch or shard, updated as assets complete
+        checkpoint: Records progress with the session writing a chunk,
+                    given the number of assets completed so far
+
+    Raises:
+        ImmichUnavailableError: If Immich became unavailable
+    """
+    analyzer_version = current_analyzer_version()
+    completed = 0
+    score_rows = []
+    new_cache_entries = {}
+
+    def record_result(asset_id, metadata, quality_result):
+        score_rows.append({
+            'immich_asset_id': asset_id,
+            'import_batch_id': batch_id,
+            'blur_score': quality_result.get('blur_score'),
+            'exposure_score': quality_result.get('exposure_score'),
+            'overall_quality': quality_result.get('overall_quality'),
+            'is_corrupted': quality_result.get('is_corrupted', False),
+            **{feature: quality_result.get(feature) for feature in crud.QUALITY_FEATURES},
+            'perceptual_hash': quality_result.get('perceptual_hash'),
+            'analyzer_version': analyzer_version,
+            'captured_at': parse_capture_time(metadata),
+            'file_size_bytes': (metadata.get('exifInfo') or {}).get('fileSizeInByte')
+        })
+        progress.analyzed_assets += 1
+
+    async def write_results():
+        rows, cache_entries = list(score_rows), dict(new_cache_entries)
+        score_rows.clear()
+        new_cache_entries.clear()
+        chunk_completed = completed
+
+        def write(db):
+            crud.upsert_quality_scores(db, rows)
+            crud.add_triage_stats(db, batch_id, quality_stats(rows, settings.TRIAGE_LOW_QUALITY_THRESHOLD))
+            crud.store_cached_results(db, analyzer_version, cache_entries)
+            checkpoint(db, chunk_completed)
+
+        await run_in_session(session_factory, write)
+
+    async def mark_completed():
+        nonlocal completed
+        completed += 1
+        # Checkpoint results and progress periodically
+        if completed % settings.ANALYSIS_PROGRESS_INTERVAL == 0:
+            await write_results()
+
+    async def analyze_or_skip(asset_id):
+        try:
+            metadata = metadata_by_id[asset_id]
+            return asset_id, await analyze_asset(client, semaphore, scoring_engine, asset_id, metadata)
+        except ImmichUnavailableError:
+            # An outage is not the asset's fault; stop the batch instead of skipping it
+            raise
+        except Exception as e:
+            return asset_id, e
+
+    try:
+        for asset_id in asset_ids:
+            if asset_id not in metadata_by_id:
+                logger.error(f"Skipping asset {asset_id}: metadata unavailable")
+                progress.skipped_assets += 1
+                await mark_completed()
+        metadata_by_id = {asset_id: metadata_by_id[asset_id] for asset_id in asset_ids if asset_id in metadata_by_id}
+
+        # Reuse results for content already scored in any batch
+        checksums = [m['checksum'] for m in metadata_by_id.values() if m.get('checksum')]
+        cached_results = await run_in_session(
+            session_factory, lambda db: crud.get_cached_results(db, checksums, analyzer_version)
+        )
+
+        pending = []
+        for asset_id, metadata in metadata_by_id.items():
+            cached = cached_results.get(metadata.get('checksum'))
+            if cached is not None:
+                record_result(asset_id, metadata, cached)
+                await mark_completed()
+            else:
+                pending.append(asset_id)
+
+        # Fetch and analyze all assets concurrently over one pooled client
+        tasks = [asyncio.ensure_future(analyze_or_skip(asset_id)) for asset_id in pending]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                asset_id, result = await next_result
+
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to analyze asset {asset_id}: {result}")
+                    # Continue with next asset (this one will be skipped)
+                    progress.skipped_assets += 1
+                else:
+                    metadata = metadata_by_id[asset_id]
+                    record_result(asset_id, metadata, result)
+                    if metadata.get('checksum'):
+                        new_cache_entries[metadata['checksum']] = result
+
+                await mark_completed()
+        finally:
+            for task in tasks:
+                task.cancel()
+    except ImmichUnavailableError:
+        # Keep everything scored so far so the batch can be resumed
+        await write_results()
+        raise
+
+    await write_results()
+
+
+def plan_shards(asset_ids: List[str], metadata_by_id: Dict[str, Dict[str, Any]], shard_size: int) -> List[List[str]]:
+    """
+    Split a batch into shards of consecutive capture times.
+
+    Time-ordered shards keep each burst within one shard except at the
+    boundaries, where the burst index stitches neighbouring shards' bursts
+    together. Assets without metadata go last; they are skipped anyway.
+
+    Args:
+        asset_ids: Assets of the batch
+        metadata_by_id: Prefetched metadata
+        shard_size: Maximum assets per shard
+
+    Returns:
+        Asset IDs of each shard, in capture-time order
+    """
+    captured = {asset_id: parse_capture_time(metadata_by_id[asset_id]) for asset_id in asset_ids if asset_id in metadata_by_id}
+    ordered = sorted(captured, key=captured.get) + [asset_id for asset_id in asset_ids if asset_id not in captured]
+    return [ordered[start:start + shard_size] for start in range(0, len(ordered), shard_size)]
+
+
+async def run_batch_analysis(
+    batch_id: UUID,
+    session_factory: Callable[[], Session],
+    resume: bool = False
+) -> None:
+    """
+    Analyze a batch in the background.
+
+    Metadata for the whole batch is fetched first, both for the result
+    cache lookups of score_assets() and for capture times. Batches larger
+    than ANALYSIS_SHARD_SIZE are then split into time-ordered shards that
+    this and every other service instance claim and analyze in parallel
+    (see run_batch_shard()); the batch completes when its last shard does.
+    Smaller batches are analyzed here, committing scores and progress
+    counters every ANALYSIS_PROGRESS_INTERVAL completed assets so the
+    status endpoint can report live progress.
+
+    Args:
+        batch_id: Import batch to analyze
+        session_factory: Factory for database sessions
+        resume: Continue an interrupted batch, skipping assets that already
+                have a persisted score. Previously skipped assets are retried,
+                as are the failed shards of a sharded batch.
+    """
+    heartbeat = None
+    try:
+        def load_batch(db):
+            batch = db.query(ImportBatch).filter(ImportBatch.id == batch_id).first()
+            sharded = db.query(BatchShard.id).filter(BatchShard.import_batch_id == batch_id).first() is not None
+            if sharded:
+                crud.retry_failed_shards(db, batch_id)
+            return list(batch.asset_ids), AssetCounts(batch.analyzed_assets, batch.skipped_assets), sharded
+
+        asset_ids, counts, sharded = await run_in_session(session_factory, load_batch)
+        heartbeat = asyncio.create_task(keep_batch_alive(session_factory, batch_id))
+
+        if sharded:
+            logger.info(f"Resuming sharded batch {batch_id}")
+            await run_claimed_shards(session_factory, batch_id)
+            # The last shard may have completed before the interruption
+            await run_in_session(session_factory, lambda db: crud.complete_sharded_batch(db, batch_id))
+            return
+
+        tracker = ThroughputTracker()
+
+        if resume:
+            def restart_progress(db):
+                done = {
+                    asset_id for (asset_id,) in db.query(AssetQualityScore.immich_asset_id).filter(
+                        AssetQualityScore.import_batch_id == batch_id
+                    )
+                }
+                db.query(ImportBatch).filter(ImportBatch.id == batch_id).update(
+                    {ImportBatch.analyzed_assets: len(done), ImportBatch.skipped_assets: 0}, synchronize_session=False
+                )
+                return done
+
+            done = await run_in_session(session_factory, restart_progress)
+            asset_ids = [asset_id for asset_id in asset_ids if asset_id not in done]
+            counts = AssetCounts(analyzed_assets=len(done))
+            logger.info(f"Resuming batch {batch_id}: {len(done)} assets already analyzed")
+
+        def checkpoint(db, completed):
+            db.query(ImportBatch).filter(ImportBatch.id == batch_id).update({
+                ImportBatch.analyzed_assets: counts.analyzed_assets,
+                ImportBatch.skipped_assets: counts.skipped_assets,
+                ImportBatch.seconds_per_asset: tracker.record(completed),
+                ImportBatch.heartbeat_at: datetime.utcnow()
+            }, synchronize_session=False)
+
+        semaphore = asyncio.Semaphore(settings.IMMICH_MAX_CONCURRENCY)
+        async with create_immich_client() as client:
+            metadata_by_id = await fetch_batch_metadata(client, semaphore, asset_ids)
+
+            shard_size = settings.ANALYSIS_SHARD_SIZE
+            sharded = not resume and shard_size > 0 and len(asset_ids) > shard_size
+            if sharded:
+                shards = plan_shards(asset_ids, metadata_by_id, shard_size)
+                await run_in_session(session_factory, lambda db: crud.create_batch_shards(db, batch_id, shards))
+                logger.info(f"Split batch {batch_id} into {len(shards)} shards")
+            else:
+                await score_assets(
+                    session_factory, batch_id, client, semaphore, asset_ids, metadata_by_id, counts, checkpoint
+                )
+
+        if sharded:
+            await run_claimed_shards(session_factory, batch_id, metadata_by_id)
+            return
+
+        def complete(db):
+            detect_batch_bursts(db, batch_id)
+            db.query(ImportBatch).filter(ImportBatch.id == batch_id).update(
+                {ImportBatch.status: "complete"}, synchronize_session=False
+            )
+
+        await run_in_session(session_factory, complete)
+    except ImmichUnavailableError as e:
+        logger.error(f"Stopping analysis of batch {batch_id}: {e}")
+        await run_in_session(session_factory, lambda db: crud.fail_batch(
+            db, batch_id, f"{e}; resume with POST /batches/{batch_id}/analyze?resume=true"
+        ))
+    except Exception as e:
+        logger.exception(f"Analysis of batch {batch_id} failed: {e}")
+        await run_in_session(session_factory, lambda db: crud.fail_batch(db, batch_id, str(e)))
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+
+
+async def run_batch_shard(
+    shard_id: UUID,
+    session_factory: Callable[[], Session],
+    metadata_by_id: Optional[Dict[str, Dict[str, Any]]] = None
+) -> None:
+    """
+    Analyze one claimed shard of a large batch.
+
+    Assets of the shard scored by an earlier attempt are kept. When the
+    shard is done its captures are folded into the burst index, which
+    merges bursts crossing into the neighbouring shards, so the batch ends
+    up with the same scores and bursts as a serial run. The batch's
+    progress counters are the sums over its shards. A failed shard fails
+    the batch; resuming the batch retries it.
+
+    Args:
+        shard_id: Shard claimed by this instance
+        session_factory: Factory for database sessions
+        metadata_by_id: Metadata prefetched while planning the shards
+                        (None = fetch the shard's)
+    """
+    heartbeat = None
+    batch_id = shard_index = None
+    try:
+        def start_shard(db):
+            shard = db.query(BatchShard).filter(BatchShard.id == shard_id).first()
+            done = crud.get_scored_asset_ids(db, shard.import_batch_id, shard.asset_ids)
+            shard.analyzed_assets = len(done)
+            shard.skipped_assets = 0
+            shard.error_message = None
+            return shard.import_batch_id, shard.shard_index, list(shard.asset_ids), done
+
+        batch_id, shard_index, shard_asset_ids, done = await run_in_session(session_factory, start_shard)
+        heartbeat = asyncio.create_task(keep_batch_alive(session_factory, batch_id, shard_id))
+        asset_ids = [asset_id for asset_id in shard_asset_ids if asset_id not in done]
+        counts = AssetCounts(analyzed_assets=len(done))
+
+        def checkpoint(db, completed):
+            db.query(BatchShard).filter(BatchShard.id == shard_id).update({
+                BatchShard.analyzed_assets: counts.analyzed_assets,
+                BatchShard.skipped_assets: counts.skipped_assets
+            }, synchronize_session=False)
+            crud.refresh_heartbeat(db, batch_id, shard_id)
+            crud.sync_sharded_batch_progress(db, batch_id)
+
+        semaphore = asyncio.Semaphore(settings.IMMICH_MAX_CONCURRENCY)
+        async with create_immich_client() as client:
+            if metadata_by_id is None:
+                metadata_by_id = await fetch_batch_metadata(client, semaphore, asset_ids)
+            await score_assets(session_factory, batch_id, client, semaphore, asset_ids, metadata_by_id, counts, checkpoint)
+
+        def complete(db):
+            detect_batch_bursts(db, batch_id, shard_asset_ids)
+            db.query(BatchShard).filter(BatchShard.id == shard_id).update(
+                {BatchShard.status: "complete"}, synchronize_session=False
+            )
+            crud.sync_sharded_batch_progress(db, batch_id)
+
+        await run_in_session(session_factory, complete)
+        logger.info(f"Analyzed shard {shard_index} of batch {batch_id}")
+
+        # Whoever completes the last shard completes the batch
+        await run_in_session(session_factory, lambda db: crud.complete_sharded_batch(db, batch_id))
+    except ImmichUnavailableError as e:
+        logger.error(f"Stopping analysis of shard {shard_index} of batch {batch_id}: {e}")
+
+        def stop(db):
+            crud.sync_sharded_batch_progress(db, batch_id)
+            shard = db.query(BatchShard).filter(BatchShard.id == shard_id).first()
+            shard.status = shard.batch.status = "failed"
+            shard.error_message = str(e)
+            shard.batch.error_message = f"{e}; resume with POST /batches/{batch_id}/analyze?resume=true"
+
+        await run_in_session(session_factory, stop)
+    except Exception as e:
+        logger.exception(f"Analysis of shard {shard_id} failed: {e}")
+
+        def fail(db):
+            shard = db.query(BatchShard).filter(BatchShard.id == shard_id).first()
+            shard.status = shard.batch.status = "failed"
+            shard.error_message = shard.batch.error_message = str(e)
+
+        await run_in_session(session_factory, fail)
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+
+
+async def run_claimed_shards(
+    session_factory: Callable[[], Session],
+    batch_id: Optional[UUID] = None,
+    metadata_by_id: Optional[Dict[str, Dict[str, Any]]] = None
+) -> None:
+    """
+    Claim and analyze shards one at a time until none is left to claim.
+
+    Args:
+        session_factory: Factory for database sessions
+        batch_id: Only claim this batch's shards (None = any batch)
+        metadata_by_id: Prefetched metadata of that batch
+    """
+    while True:
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.ANALYSIS_STALE_AFTER_SECONDS)
+        shard_id = await run_in_session(session_factory, lambda db: crud.claim_batch_shard(db, stale_before, batch_id))
+        if shard_id is None:
+            return
+        await run_batch_shard(shard_id, session_factory, metadata_by_id)
+
+
+# Strong references to jobs started outside a request, so they are not
+# garbage collected while running
+background_jobs: Set[asyncio.Task] = set()
+
+
+def start_background_job(coroutine) -> asyncio.Task:
+    """Run a coroutine as a fire-and-forget task on the current event loop."""
+    task = asyncio.create_task(coroutine)
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+    return task
+
+
+async def watch_interrupted_batches(session_factory: Callable[[], Session]) -> None:
+    """
+    Periodically resume batches whose job stopped heartbeating.
+
+    Covers crashes, OOM kills and redeploys: once a processing batch's
+    heartbeat is older than ANALYSIS_STALE_AFTER_SECONDS, the first
+    service instance to claim it resumes it from its last checkpoint.
+
+    Args:
+        session_factory: Factory for database sessions
+    """
+    while True:
+        await asyncio.sleep(settings.ANALYSIS_STALE_AFTER_SECONDS)
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.ANALYSIS_STALE_AFTER_SECONDS)
+        try:
+            claimed = await run_in_session(session_factory, lambda db: crud.claim_interrupted_batches(db, stale_before))
+        except Exception as e:
+            logger.error(f"Failed to check for interrupted batches: {e}")
+            claimed = []
+
+        for batch_id in claimed:
+            logger.info(f"Resuming interrupted batch {batch_id}")
+            start_background_job(run_batch_analysis(batch_id, session_factory, resume=True))
+
+
+async def watch_pending_shards(session_factory: Callable[[], Session]) -> None:
+    """
+    Periodically help analyze the pending shards of large batches.
+
+    Every service instance runs this, so a sharded batch is analyzed by
+    all of them in parallel, one shard per instance at a time besides the
+    instance that started it. Shards whose instance died are picked up too.
+
+    Args:
+        session_factory: Factory for database sessions
+    """
+    while True:
+        await asyncio.sleep(settings.ANALYSIS_SHARD_POLL_SECONDS)
+        try:
+            await run_claimed_shards(session_factory)
+        except Exception as e:
+            logger.error(f"Failed to check for pending shards: {e}")
+
+
+async def keep_reanalysis_alive(session_factory: Callable[[], Session]) -> None:
+    """
+    Refresh the re-analysis job's heartbeat until cancelled.
+
+    Throttled chunks can take longer than the stale timeout, so like
+    keep_batch_alive() the heartbeat is refreshed independently of progress.
+
+    Args:
+        session_factory: Factory for database sessions
+    """
+    while True:
+        await asyncio.sleep(settings.ANALYSIS_HEARTBEAT_SECONDS)
+        await run_in_session(session_factory, lambda db: crud.update_reanalysis_job(db, {}))
+
+
+def build_reanalysis_status(job: Optional[ReanalysisJob]) -> ReanalysisStatus:
+    """
+    Build the progress report for the re-analysis job.
+
+    Args:
+        job: Re-analysis job, or None if it has never been started
+
+    Returns:
+        Re-analysis status with progress percentage and ETA
+    """
+    if job is None:
+        return ReanalysisStatus(status="idle")
+
+    completed = job.reanalyzed_assets + job.failed_assets
+    if job.status == "complete":
+        progress_percent = 100.0
+    else:
+        progress_percent = completed / job.stale_assets * 100 if job.stale_assets else 0.0
+
+    eta_seconds = None
+    if job.status == "running":
+        eta_seconds = estimate_eta_seconds(job.stale_assets - completed, job.seconds_per_asset)
+
+    return ReanalysisStatus(
+        status=job.status,
+        analyzer_version=job.analyzer_version,
+        stale_assets=job.stale_assets,
+        reanalyzed_assets=job.reanalyzed_assets,
+        failed_assets=job.failed_assets,
+        progress_percent=progress_percent,
+        eta_seconds=eta_seconds,
+        error_message=job.error_message
+    )
+
+
+async def run_reanalysis(session_factory: Callable[[], Session]) -> None:
+    """
+    Re-analyze quality scores produced by an older analyzer version.
+
+    Stale scores are processed in primary-key order, ANALYSIS_PROGRESS_INTERVAL
+    at a time, with asset starts spaced to REANALYSIS_ASSETS_PER_SECOND so
+    an algorithm upgrade rolls out in the background without competing
+    with new imports. Each chunk is committed as it completes, so an
+    interrupted job simply picks up the remaining stale scores when
+    restarted. Scores of assets that can no longer be analyzed keep their
+    old version and are counted as failed. Bursts around each chunk's
+    assets are re-detected in the same transaction as its scores, as their
+    recommendations depend on them, so an interrupted job leaves no batch
+    with stale recommendations. Progress is stored on the ReanalysisJob row,
+    which the caller must have claimed, in the same transaction as each
+    chunk.
+
+    Args:
+        session_factory: Factory for database sessions
+    """
+    analyzer_version = current_analyzer_version()
+    heartbeat = asyncio.create_task(keep_reanalysis_alive(session_factory))
+    try:
+        def count_stale(db):
+            stale = crud.count_stale_quality_scores(db, analyzer_version)
+            crud.update_reanalysis_job(db, {'stale_assets': stale})
+            return stale
+
+        stale = await run_in_session(session_factory, count_stale)
+        reanalyzed = failed = 0
+        logger.info(f"Re-analyzing {stale} quality scores with analyzer {analyzer_version}")
+
+        tracker = ThroughputTracker()
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / settings.REANALYSIS_ASSETS_PER_SECOND if settings.REANALYSIS_ASSETS_PER_SECOND > 0 else 0.0
+        next_start = loop.time()
+
+        async def reanalyze(client, semaphore, asset_id, metadata):
+            nonlocal next_start
+            delay = next_start - loop.time()
+            next_start = max(next_start, loop.time()) + interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return await analyze_asset(client, semaphore, scoring_engine, asset_id, metadata)
+
+        semaphore = asyncio.Semaphore(settings.REANALYSIS_CONCURRENCY)
+        async with create_immich_client() as client:
+            last_id = None
+            while True:
+                def next_chunk(db):
+                    return [
+                        (row.id, row.immich_asset_id, row.import_batch_id)
+                        for row in crud.get_stale_quality_scores(
+                            db, analyzer_version, after_id=last_id, limit=settings.ANALYSIS_PROGRESS_INTERVAL
+                        )
+                    ]
+
+                rows = await run_in_session(session_factory, next_chunk)
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                asset_ids = list(dict.fromkeys(asset_id for _, asset_id, _ in rows))
+                metadata_by_id = await fetch_batch_metadata(client, semaphore, asset_ids)
+                # Duplicates of content already re-analyzed come from the cache
+                checksums = [m['checksum'] for m in metadata_by_id.values() if m.get('checksum')]
+                cached_results = await run_in_session(
+                    session_factory, lambda db: crud.get_cached_results(db, checksums, analyzer_version)
+                )
+                results = {
+                    asset_id: cached_results[metadata['checksum']]
+                    for asset_id, metadata in metadata_by_id.items()
+                    if metadata.get('checksum') in cached_results
+                }
+
+                # One analysis per distinct content within the chunk
+                pending = {}
+                for asset_id, metadata in metadata_by_id.items():
+                    if asset_id not in results:
+                        pending.setdefault(metadata.get('checksum') or asset_id, asset_id)
+                outcomes = dict(zip(pending, await asyncio.gather(*(
+                    reanalyze(client, semaphore, asset_id, metadata_by_id[asset_id]) for asset_id in pending.values()
+                ), return_exceptions=True)))
+                new_cache_entries = {}
+                for content, outcome in outcomes.items():
+                    if isinstance(outcome, ImmichUnavailableError):
+                        raise outcome
+                    if isinstance(outcome, Exception):
+                        logger.error(f"Failed to re-analyze asset {pending[content]}: {outcome}")
+                    elif metadata_by_id[pending[content]].get('checksum'):
+                        new_cache_entries[content] = outcome
+                for asset_id, metadata in metadata_by_id.items():
+                    outcome = outcomes.get(metadata.get('checksum') or asset_id)
+                    if asset_id not in results and outcome is not None and not isinstance(outcome, Exception):
+                        results[asset_id] = outcome
+
+                score_rows = [
+                    {
+                        'immich_asset_id': asset_id,
+                        'import_batch_id': batch_id,
+                        'blur_score': results[asset_id].get('blur_score'),
+                        'exposure_score': results[asset_id].get('exposure_score'),
+                        'overall_quality': results[asset_id].get('overall_quality'),
+                        'is_corrupted': results[asset_id].get('is_corrupted', False),
+                        **{feature: results[asset_id].get(feature) for feature in crud.QUALITY_FEATURES},
+                        'perceptual_hash': results[asset_id].get('perceptual_hash'),
+                        'analyzer_version': analyzer_version
+                    }
+                    for _, asset_id, batch_id in rows if asset_id in results
+                ]
+                rescored_by_batch = {}
+                for row in score_rows:
+                    rescored_by_batch.setdefault(row['import_batch_id'], []).append(row['immich_asset_id'])
+
+                reanalyzed += len(score_rows)
+                failed += len(rows) - len(score_rows)
+                chunk_progress = {
+                    'reanalyzed_assets': reanalyzed,
+                    'failed_assets': failed,
+                    'seconds_per_asset': tracker.record(reanalyzed + failed)
+                }
+
+                def write_chunk(db):
+                    crud.upsert_quality_scores(db, score_rows)
+                    crud.store_cached_results(db, analyzer_version, new_cache_entries)
+                    for batch_id, batch_asset_ids in rescored_by_batch.items():
+                        detect_batch_bursts(db, batch_id, batch_asset_ids)
+                    crud.update_reanalysis_job(db, chunk_progress)
+
+                await run_in_session(session_factory, write_chunk)
+
+        await run_in_session(session_factory, lambda db: crud.update_reanalysis_job(db, {'status': "complete"}))
+        logger.info(f"Re-analysis complete: {reanalyzed} re-analyzed, {failed} failed")
+    except Exception as e:
+        logger.exception(f"Re-analysis failed: {e}")
+        await run_in_session(
+            session_factory, lambda db: crud.update_reanalysis_job(db, {'status': "failed", 'error_message': str(e)})
+        )
+    finally:
+        heartbeat.cancel()
+
+
+@app.post("/batches/{batch_id}/analyze", response_model=AnalysisStatus, status_code=status.HTTP_202_ACCEPTED)
+def analyze_batch(
+    batch_id: UUID,
+    background_tasks: BackgroundTasks,
+    resume: bool = False,
+    db: Session = Depends(get_db),
+    session_factory: Callable[[], Session] = Depends(get_session_factory)
+):
+    """
+    Start background analysis on a batch of imported assets.
+
+    With resume=true, assets already scored are kept and only the rest are
+    analyzed, e.g. after a batch failed because Immich was unavailable.
+    """
+    # Retrieve batch from database
+    batch = db.query(ImportBatch).filter(ImportBatch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Import batch {batch_id} not found"
+        )
+
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.ANALYSIS_STALE_AFTER_SECONDS)
+    if batch.status == "processing" and batch.heartbeat_at is not None and batch.heartbeat_at >= stale_before:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Import batch {batch_id} is already being analyzed"
+        )
+
+    batch.status = "processing"
+    batch.started_at = datetime.utcnow()
+    batch.heartbeat_at = batch.started_at
+    batch.seconds_per_asset = None
+    batch.error_message = None
+    if not resume:
+        # Reset progress so re-runs report from zero
+        batch.analyzed_assets = 0
+        batch.skipped_assets = 0
+        # Bursts are reconciled with the new scores once the run completes
+        db.query(AssetQualityScore).filter(AssetQualityScore.import_batch_id == batch_id).delete()
+        db.query(BatchShard).filter(BatchShard.import_batch_id == batch_id).delete()
+        db.query(BatchTriageStats).filter(BatchTriageStats.import_batch_id == batch_id).delete()
+    db.commit()
+
+    background_tasks.add_task(run_batch_analysis, batch_id, session_factory, resume=resume)
+
+    return build_analysis_status(batch)
+
+
 @app.get("/batches/{batch_id}/status", response_model=AnalysisStatus)
 def get_batch_status(
     batch_id: UUID,
@@ -288,17 +1300,7 @@ def get_batch_status(
             detail=f"Import batch {batch_id} not found"
         )
 
-    # Calculate progress percentage
-    progress_percent = (batch.analyzed_assets / batch.total_assets * 100) if batch.total_assets > 0 else 0
-
-    return AnalysisStatus(
-        status=batch.status,
-        progress_percent=progress_percent,
-        eta_seconds=None,
-        total_assets=batch.total_assets,
-        analyzed_assets=batch.analyzed_assets,
-        skipped_assets=batch.skipped_assets
-    )
+    return build_analysis_status(batch)
 
 
 @app.get("/batches/{batch_id}/quality-scores", response_model=list[QualityScoreResponse])
@@ -323,6 +1325,67 @@ def get_quality_scores(
     return scores
 
 
+@app.post("/quality-scores/rescore", response_model=RescoreResponse)
+def rescore_quality_scores(db: Session = Depends(get_db)):
+    """
+    Recompute every stored quality score from its raw features.
+
+    Applies the current QUALITY_BLUR_THRESHOLD and QUALITY_BLUR_WEIGHT to
+    all batches and to the result cache without fetching any image, e.g.
+    after tuning them. The database re-scores all rows in one UPDATE per
+    table. Burst membership doesn't depend on scores, so bursts are not
+    re-detected: one more UPDATE moves best-shot recommendations to the
+    new top scores. Triage totals are then recomputed with grouped
+    queries, which also applies a changed TRIAGE_LOW_QUALITY_THRESHOLD.
+    The cost is a fixed number of statements however large the library.
+    """
+    scorer = QualityScorer(
+        working_size=settings.ANALYSIS_WORKING_SIZE or None,
+        blur_threshold=settings.QUALITY_BLUR_THRESHOLD,
+        blur_weight=settings.QUALITY_BLUR_WEIGHT
+    )
+    rescored_scores = crud.rescore_quality_results(db, AssetQualityScore, scorer.score_features_sql)
+    rescored_cache_entries = crud.rescore_quality_results(db, QualityResultCache, scorer.score_features_sql)
+    refresh_recommendations(db)
+    refresh_all_triage_stats(db, settings.TRIAGE_LOW_QUALITY_THRESHOLD)
+    db.commit()
+    logger.info(f"Re-scored {rescored_scores} quality scores and {rescored_cache_entries} cached results")
+
+    return RescoreResponse(rescored_scores=rescored_scores, rescored_cache_entries=rescored_cache_entries)
+
+
+@app.post("/reanalysis", response_model=ReanalysisStatus, status_code=status.HTTP_202_ACCEPTED)
+def start_reanalysis(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    session_factory: Callable[[], Session] = Depends(get_session_factory)
+):
+    """
+    Start re-analyzing quality scores produced by an older analyzer version.
+
+    Only stale scores are reprocessed, at a throttled rate, so an analyzer
+    upgrade rolls out incrementally instead of as a full-library recompute.
+    The job is claimed in the database, so only one service instance runs
+    it; one whose instance died can be started again.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=settings.ANALYSIS_STALE_AFTER_SECONDS)
+    if not crud.claim_reanalysis_job(db, current_analyzer_version(), stale_before):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Re-analysis is already running"
+        )
+
+    background_tasks.add_task(run_reanalysis, session_factory)
+
+    return build_reanalysis_status(crud.get_reanalysis_job(db))
+
+
+@app.get("/reanalysis", response_model=ReanalysisStatus)
+def get_reanalysis_status(db: Session = Depends(get_db)):
+    """Get progress of the re-analysis job"""
+    return build_reanalysis_status(crud.get_reanalysis_job(db))
+
+
 @app.get("/batches/{batch_id}/bursts", response_model=list[BurstSequenceResponse])
 def get_bursts(
     batch_id: UUID,
@@ -337,9 +1400,56 @@ def get_bursts(
             detail=f"Import batch {batch_id} not found"
         )
 
-    # Query burst sequences
-    bursts = db.query(BurstSequence).filter(
-        BurstSequence.import_batch_id == batch_id
-    ).all()
+    # Query burst sequences, including bursts of earlier batches this batch continued
+    batch_bursts = db.query(BurstTimelineEntry.burst_sequence_id).filter(
+        BurstTimelineEntry.import_batch_id == batch_id
+    )
+    bursts = db.query(BurstSequence).filter(or_(
+        BurstSequence.import_batch_id == batch_id,
+        BurstSequence.id.in_(batch_bursts)
+    )).all()
 
     return bursts
+
+
+@app.get("/triage/{batch_id}", response_model=TriageDashboard)
+def get_triage_dashboard(
+    batch_id: UUID,
+    db: Session = Depends(get_db)
+):
+    """
+    Get the triage dashboard for a batch.
+
+    Reads totals kept up to date as results are written, so the cost does
+    not grow with the batch. Savings are the file sizes Immich reported
+    with the batch's metadata. Categories with nothing to review are
+    omitted; while the batch is being analyzed the totals cover the assets
+    analyzed so far, and burst sequences appear once it completes.
+    """
+    # Verify batch exists
+    batch = db.query(ImportBatch).filter(ImportBatch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Import batch {batch_id} not found"
+        )
+
+    stats = {
+        row.category_type: row
+        for row in db.query(BatchTriageStats).filter(BatchTriageStats.import_batch_id == batch_id)
+    }
+    categories = [
+        TriageCategory(
+            category_type=category,
+            count=stats[category].count,
+            estimated_savings_bytes=stats[category].estimated_savings_bytes,
+            badge_color=BADGE_COLORS[category]
+        )
+        for category in TRIAGE_CATEGORIES if category in stats and stats[category].count
+    ]
+
+    return TriageDashboard(
+        categories=categories,
+        total_assets=batch.total_assets,
+        analyzed_assets=batch.analyzed_assets
+    )
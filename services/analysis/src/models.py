@@ -1,6 +1,6 @@
 import uuid
 import json
-from sqlalchemy import Column, String, Integer, Float, Boolean, TIMESTAMP, ForeignKey, ARRAY, Text, CheckConstraint, TypeDecorator, func, UniqueConstraint
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, TIMESTAMP, ForeignKey, ARRAY, Text, CheckConstraint, TypeDecorator, func, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
 from sqlalchemy.orm import relationship
 from .database import Base
@@ -82,17 +82,82 @@ class ImportBatch(Base):
     analyzed_assets = Column(Integer, default=0)
     skipped_assets = Column(Integer, default=0)
     error_message = Column(Text, nullable=True)
+    started_at = Column(TIMESTAMP, nullable=True)
+    heartbeat_at = Column(TIMESTAMP, nullable=True)  # Refreshed while a job is running
+    seconds_per_asset = Column(Float, nullable=True)  # Moving average used for ETA
 
     # Relationships
+    shards = relationship("BatchShard", back_populates="batch", cascade="all, delete-orphan")
     quality_scores = relationship("AssetQualityScore", back_populates="batch", cascade="all, delete-orphan")
     burst_sequences = relationship("BurstSequence", back_populates="batch", cascade="all, delete-orphan")
     triage_actions = relationship("TriageAction", back_populates="batch", cascade="all, delete-orphan")
+    triage_stats = relationship("BatchTriageStats", back_populates="batch", cascade="all, delete-orphan")
 
     __table_args__ = (
         CheckConstraint("status IN ('processing', 'complete', 'failed')", name="check_status"),
     )
 
 
+class BatchShard(Base):
+    """Time-ordered slice of a large import batch, analyzed by whichever service instance claims it."""
+    __tablename__ = "batch_shards"
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    import_batch_id = Column(GUID, ForeignKey("import_batches.id", ondelete="CASCADE"), index=True)
+    shard_index = Column(Integer, nullable=False)  # Position in capture-time order
+    asset_ids = Column(StringArray, nullable=False)
+    status = Column(String(20), nullable=False, index=True)
+    analyzed_assets = Column(Integer, default=0)
+    skipped_assets = Column(Integer, default=0)
+    error_message = Column(Text, nullable=True)
+    heartbeat_at = Column(TIMESTAMP, nullable=True)  # Refreshed while an instance analyzes the shard
+
+    # Relationship
+    batch = relationship("ImportBatch", back_populates="shards")
+
+    __table_args__ = (
+        UniqueConstraint("import_batch_id", "shard_index", name="uq_shard_per_batch"),
+        CheckConstraint("status IN ('pending', 'processing', 'complete', 'failed')", name="check_shard_status"),
+    )
+
+
+class BatchTriageStats(Base):
+    """Running totals of one triage dashboard category for an import batch."""
+    __tablename__ = "batch_triage_stats"
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    import_batch_id = Column(GUID, ForeignKey("import_batches.id", ondelete="CASCADE"), index=True)
+    category_type = Column(String(50), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    estimated_savings_bytes = Column(BigInteger, nullable=False, default=0)  # Known file sizes of the category's assets
+
+    # Relationship
+    batch = relationship("ImportBatch", back_populates="triage_stats")
+
+    __table_args__ = (
+        UniqueConstraint("import_batch_id", "category_type", name="uq_triage_category_per_batch"),
+    )
+
+
+class ReanalysisJob(Base):
+    """Progress of the library-wide re-analysis job, shared by every service instance."""
+    __tablename__ = "reanalysis_jobs"
+
+    id = Column(String(20), primary_key=True)  # A single row, keyed by crud.REANALYSIS_JOB_ID
+    status = Column(String(20), nullable=False)
+    analyzer_version = Column(String(64), nullable=True)  # Analyzer the job upgrades scores to
+    stale_assets = Column(Integer, default=0)
+    reanalyzed_assets = Column(Integer, default=0)
+    failed_assets = Column(Integer, default=0)
+    error_message = Column(Text, nullable=True)
+    heartbeat_at = Column(TIMESTAMP, nullable=True)  # Refreshed while an instance runs the job
+    seconds_per_asset = Column(Float, nullable=True)  # Moving average used for ETA
+
+    __table_args__ = (
+        CheckConstraint("status IN ('idle', 'running', 'complete', 'failed')", name="check_reanalysis_status"),
+    )
+
+
 class AssetQualityScore(Base):
     __tablename__ = "asset_quality_scores"
 
@@ -103,6 +168,15 @@ class AssetQualityScore(Base):
     exposure_score = Column(Float, nullable=True)
     overall_quality = Column(Float, nullable=True, index=True)
     is_corrupted = Column(Boolean, default=False)
+    # Raw features the scores are derived from, for re-scoring without the image
+    laplacian_variance = Column(Float, nullable=True)
+    working_long_edge = Column(Integer, nullable=True)
+    mean_brightness = Column(Float, nullable=True)
+    brightness_std = Column(Float, nullable=True)
+    perceptual_hash = Column(BigInteger, nullable=True)  # 64-bit dHash of the scored frame, for burst similarity
+    analyzer_version = Column(String(64), nullable=True, index=True)  # Analyzer that produced the result
+    captured_at = Column(TIMESTAMP, nullable=True)  # Capture time used for burst detection
+    file_size_bytes = Column(BigInteger, nullable=True)  # Size of the original, for triage savings estimates
     analyzed_at = Column(TIMESTAMP, default=func.now())
 
     # Relationship
@@ -116,6 +190,29 @@ class AssetQualityScore(Base):
     )
 
 
+class QualityResultCache(Base):
+    """Quality results by content checksum, shared across import batches."""
+    __tablename__ = "quality_result_cache"
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    checksum = Column(String(255), nullable=False)
+    analyzer_version = Column(String(64), nullable=False)
+    blur_score = Column(Float, nullable=True)
+    exposure_score = Column(Float, nullable=True)
+    overall_quality = Column(Float, nullable=True)
+    is_corrupted = Column(Boolean, default=False)
+    laplacian_variance = Column(Float, nullable=True)
+    working_long_edge = Column(Integer, nullable=True)
+    mean_brightness = Column(Float, nullable=True)
+    brightness_std = Column(Float, nullable=True)
+    perceptual_hash = Column(BigInteger, nullable=True)
+    created_at = Column(TIMESTAMP, default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("checksum", "analyzer_version", name="uq_cache_checksum_version"),
+    )
+
+
 class BurstSequence(Base):
     __tablename__ = "burst_sequences"
 
@@ -129,6 +226,24 @@ class BurstSequence(Base):
     batch = relationship("ImportBatch", back_populates="burst_sequences")
 
 
+class BurstTimelineEntry(Base):
+    """Capture time of an analyzed asset in its owner's library-wide burst index."""
+    __tablename__ = "burst_timeline_entries"
+
+    id = Column(GUID, primary_key=True, default=uuid.uuid4)
+    immich_user_id = Column(String(255), nullable=False)
+    immich_asset_id = Column(String(255), nullable=False)
+    import_batch_id = Column(GUID, ForeignKey("import_batches.id", ondelete="CASCADE"), index=True)  # Batch that last scored the asset
+    captured_at = Column(TIMESTAMP, nullable=False)
+    # Burst the asset belongs to, if any
+    burst_sequence_id = Column(GUID, ForeignKey("burst_sequences.id", ondelete="SET NULL"), nullable=True, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("immich_user_id", "immich_asset_id", name="uq_timeline_asset_per_user"),
+        Index("ix_burst_timeline_entries_user_captured_at", "immich_user_id", "captured_at"),
+    )
+
+
 class TriageAction(Base):
     __tablename__ = "triage_actions"
 
@@ -0,0 +1,67 @@
+import time
+from typing import Callable, Optional
+
+
+class AssetCounts:
+    """Assets a running job has analyzed and skipped, written to its batch or shard at each checkpoint."""
+
+    def __init__(self, analyzed_assets: int = 0, skipped_assets: int = 0):
+        self.analyzed_assets = analyzed_assets
+        self.skipped_assets = skipped_assets
+
+
+class ThroughputTracker:
+    """Tracks per-asset processing time as an exponential moving average."""
+
+    def __init__(self, smoothing: float = 0.3, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            smoothing: Weight of the newest sample (0-1). Higher values react
+                       faster to throughput changes, lower values are steadier.
+            clock: Monotonic time source in seconds
+        """
+        self.smoothing = smoothing
+        self.seconds_per_asset: Optional[float] = None
+        self._clock = clock
+        self._last_time = clock()
+        self._last_count = 0
+
+    def record(self, completed: int) -> Optional[float]:
+        """
+        Fold assets completed since the previous call into the moving average.
+
+        Args:
+            completed: Total number of assets completed so far
+
+        Returns:
+            Smoothed seconds per asset, or None before the first sample
+        """
+        now = self._clock()
+        delta = completed - self._last_count
+        if delta > 0:
+            sample = (now - self._last_time) / delta
+            if self.seconds_per_asset is None:
+                self.seconds_per_asset = sample
+            else:
+                self.seconds_per_asset = (
+                    self.smoothing * sample + (1 - self.smoothing) * self.seconds_per_asset
+                )
+            self._last_time = now
+            self._last_count = completed
+        return self.seconds_per_asset
+
+
+def estimate_eta_seconds(remaining_assets: int, seconds_per_asset: Optional[float]) -> Optional[int]:
+    """
+    Estimate remaining time for a batch.
+
+    Args:
+        remaining_assets: Assets not yet analyzed or skipped
+        seconds_per_asset: Smoothed per-asset processing time
+
+    Returns:
+        Estimated seconds remaining, or None if throughput is unknown
+    """
+    if seconds_per_asset is None:
+        return None
+    return int(round(max(0, remaining_assets) * seconds_per_asset))
@@ -3,6 +3,7 @@
 from .blur_detector import BlurDetector
 from .corruption_detector import CorruptionDetector
 from .exposure_analyzer import ExposureAnalyzer
-from .scorer import QualityScorer
+from .scorer import ANALYZER_VERSION, QualityScorer
+from .engine import ScoringEngine
 
-__all__ = ["BlurDetector", "CorruptionDetector", "ExposureAnalyzer", "QualityScorer"]
+__all__ = ["ANALYZER_VERSION", "BlurDetector", "CorruptionDetector", "ExposureAnalyzer", "QualityScorer", "ScoringEngine"]
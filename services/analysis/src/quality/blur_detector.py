@@ -1,13 +1,17 @@
 import cv2
 import numpy as np
 from PIL import Image
-from typing import Union
+from sqlalchemy import Float, cast
+from sqlalchemy.sql.elements import ColumnElement
+from typing import Optional, Union
+
+from .sql import least
 
 
 class BlurDetector:
     """Detects blur in images using Laplacian variance method."""
 
-    def __init__(self, threshold: float = 100.0):
+    def __init__(self, threshold: float = 100.0, reference_size: Optional[int] = None):
         """
         Args:
             threshold: Laplacian variance threshold for blur detection.
@@ -15,8 +19,14 @@ class BlurDetector:
                       Default of 100.0 provides good separation between sharp
                       and blurry images (sharp images typically have variance 100-1000+,
                       blurry images have variance 0-100).
+            reference_size: Long edge (pixels) the threshold is calibrated for.
+                      When set, the variance of smaller images is scaled by
+                      long_edge / reference_size. Edge density per pixel grows
+                      roughly linearly as an image is downsampled, so this keeps
+                      scores comparable across renditions of the same photo.
         """
         self.threshold = threshold
+        self.reference_size = reference_size
 
     def calculate_blur_score(self, image: Union[Image.Image, np.ndarray]) -> float:
         """
@@ -61,14 +71,123 @@ class BlurDetector:
         else:
             gray = img_array
 
-        # Calculate Laplacian variance
-        laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-        variance = laplacian.var()
+        return self.score_grayscale(gray)
+
+    def score_grayscale(self, gray: np.ndarray) -> float:
+        """
+        Calculate blur score for an already validated grayscale array.
+
+        Used by the single-decode pipeline, which converts each image to
+        grayscale once and shares the result between all metrics.
+
+        Args:
+            gray: 2D uint8 grayscale array
+
+        Returns:
+            Blur score between 0 (very blurry) and 100 (very sharp)
+        """
+        return float(self.score_from_variance(self.laplacian_variance(gray), max(gray.shape[:2])))
+
+    @staticmethod
+    def laplacian_variance(gray: np.ndarray) -> float:
+        """
+        Calculate the raw Laplacian variance of a grayscale array.
+
+        This is the feature blur scores are derived from; stored alongside
+        the score, it lets scores be recomputed for a new threshold without
+        the image.
+
+        Args:
+            gray: 2D uint8 grayscale array
+
+        Returns:
+            Variance of the 3x3 Laplacian
+        """
+        # The 3x3 Laplacian of 8-bit input is bounded by +/-1020, so int16
+        # output is exact and avoids a float64 buffer the size of the image.
+        # meanStdDev accumulates in place, where ndarray.var() would again
+        # allocate float64 deviations of every pixel.
+        laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+        _, std_dev = cv2.meanStdDev(laplacian)
+        return float(std_dev[0, 0]) ** 2
+
+    def score_grayscale_batch(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Calculate blur scores for a stack of same-size grayscale frames.
+
+        Computes the same 4-neighbour Laplacian as cv2.Laplacian (with its
+        default reflect-101 border) for the whole stack in one vectorized
+        int16 pass.
+
+        Args:
+            frames: 3D uint8 array of shape (count, height, width)
+
+        Returns:
+            1D array of blur scores between 0 and 100
+        """
+        return self.score_from_variance(self.laplacian_variance_batch(frames), max(frames.shape[1:]))
+
+    @staticmethod
+    def laplacian_variance_batch(frames: np.ndarray) -> np.ndarray:
+        """
+        Calculate raw Laplacian variances for a stack of same-size grayscale frames.
+
+        Args:
+            frames: 3D uint8 array of shape (count, height, width)
+
+        Returns:
+            1D array of Laplacian variances
+        """
+        padded = np.pad(frames, ((0, 0), (1, 1), (1, 1)), mode="reflect").astype(np.int16)
+        laplacian = (
+            padded[:, :-2, 1:-1] + padded[:, 2:, 1:-1]
+            + padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:]
+            - 4 * padded[:, 1:-1, 1:-1]
+        )
+
+        pixel_count = frames.shape[1] * frames.shape[2]
+        sums = laplacian.sum(axis=(1, 2), dtype=np.int64)
+        squares = np.square(laplacian, dtype=np.int32).sum(axis=(1, 2), dtype=np.int64)
+        return squares / pixel_count - (sums / pixel_count) ** 2
+
+    def score_from_variance(
+        self,
+        variance: Union[float, np.ndarray],
+        long_edge: Optional[Union[int, np.ndarray]] = None
+    ) -> Union[float, np.ndarray]:
+        """
+        Map Laplacian variance to a blur score.
+
+        Works element-wise on scalars or arrays.
+
+        Args:
+            variance: Laplacian variance
+            long_edge: Long edge (pixels) of the image(s) the variance came from
+
+        Returns:
+            Blur score(s) between 0 (very blurry) and 100 (very sharp)
+        """
+        # Compensate for renditions smaller than the calibration size
+        if self.reference_size and long_edge is not None:
+            variance = variance * np.minimum(1.0, np.asarray(long_edge) / self.reference_size)
 
         # Normalize to 0-100 scale
         # Using linear normalization with clipping to map variance to score
         # Typical sharp images have variance 100-1000+
         # Blurry images have variance 0-100
-        normalized_score = min(100.0, (variance / self.threshold) * 100.0)
+        return np.minimum(100.0, (variance / self.threshold) * 100.0)
 
-        return normalized_score
+    def score_from_variance_sql(self, variance: ColumnElement, long_edge: ColumnElement) -> ColumnElement:
+        """
+        SQL expression computing score_from_variance() from stored features.
+
+        Args:
+            variance: Laplacian variance column
+            long_edge: Working long edge column
+
+        Returns:
+            Blur score expression
+        """
+        if self.reference_size:
+            variance = variance * least(cast(long_edge, Float) / float(self.reference_size), 1.0)
+        return least(variance / self.threshold * 100.0, 100.0)
@@ -1,40 +1,124 @@
 from PIL import Image
 import io
-from typing import Union
+import math
+import mmap
+from typing import BinaryIO, Optional, Union
+
+from .structure import STRUCTURE_CORRUPT, STRUCTURE_UNKNOWN, STRUCTURE_VALID, check_structure
+
+
+class _BufferReader(io.RawIOBase):
+    """Read-only seekable file over a buffer; unlike io.BytesIO it does not copy the buffer."""
+
+    def __init__(self, buffer: memoryview):
+        self._buffer = buffer
+        self._position = 0
+
+    def readinto(self, target) -> int:
+        count = max(0, min(len(target), len(self._buffer) - self._position))
+        target[:count] = self._buffer[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._buffer)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
 
 
 class CorruptionDetector:
     """Detects corrupted or invalid image files."""
 
-    def is_corrupted(self, image_data: Union[bytes, str]) -> bool:
+    def check_structure(self, image_data: Union[bytes, bytearray, memoryview, str, BinaryIO]) -> str:
         """
-        Check if image data is corrupted.
+        Validate container structure (JPEG markers, PNG chunk CRCs, HEIC/MP4
+        boxes) without decoding pixels.
 
         Args:
-            image_data: Image bytes or file path
+            image_data: Image bytes, memoryview, file path, mmap or other
+                        binary file object
 
         Returns:
-            True if corrupted/invalid, False if valid
+            STRUCTURE_VALID, STRUCTURE_CORRUPT, or STRUCTURE_UNKNOWN for
+            unrecognised formats and file objects that cannot be sliced
         """
-        try:
-            if isinstance(image_data, bytes):
-                if len(image_data) == 0:
-                    return True
-                img = Image.open(io.BytesIO(image_data))
-            else:
-                img = Image.open(image_data)
+        if isinstance(image_data, (bytes, bytearray, memoryview, mmap.mmap)):
+            return check_structure(image_data)
+        if isinstance(image_data, str):
+            try:
+                with open(image_data, "rb") as f:
+                    if f.seek(0, io.SEEK_END) == 0:
+                        return STRUCTURE_CORRUPT
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        return check_structure(mapped)
+            except OSError:
+                return STRUCTURE_CORRUPT
+        return STRUCTURE_UNKNOWN
 
-            # Verify by loading the image
-            img.verify()
+    def decode(
+        self, image_data: Union[bytes, bytearray, memoryview, str, BinaryIO], target_size: Optional[int] = None
+    ) -> Optional[Image.Image]:
+        """
+        Fully decode image data, treating any decode failure as corruption.
 
-            # Re-open to actually load pixel data (verify() closes the file)
-            if isinstance(image_data, bytes):
+        A full load() exercises every code path verify() does (truncation,
+        bad chunks, broken entropy data), so one decode both validates the
+        file and yields the pixels for scoring. In-memory data is checked
+        structurally first, so truncated files are rejected before the
+        decoder spends time on them.
+
+        Args:
+            image_data: Image bytes, memoryview (read in place, e.g. shared
+                        memory), file path or seekable binary file object
+            target_size: Optional long edge (pixels) the caller will work at.
+                         JPEGs are then decoded straight to grayscale at the
+                         coarsest DCT scale (1/2, 1/4 or 1/8) that still
+                         covers target_size, which bounds decode memory and
+                         time. Other formats decode at full size.
+
+        Returns:
+            Loaded PIL Image, or None if corrupted/invalid
+        """
+        if not isinstance(image_data, str) and self.check_structure(image_data) == STRUCTURE_CORRUPT:
+            return None
+
+        try:
+            if isinstance(image_data, (bytes, bytearray)):
                 img = Image.open(io.BytesIO(image_data))
+            elif isinstance(image_data, memoryview):
+                img = Image.open(_BufferReader(image_data))
             else:
+                # File path, or a seekable file object such as an mmap
                 img = Image.open(image_data)
 
+            if target_size and max(img.size) > target_size:
+                scale = target_size / max(img.size)
+                img.draft("L", (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+
             img.load()
 
-            return False
+            return img
         except Exception:
+            return None
+
+    def is_corrupted(self, image_data: Union[bytes, bytearray, str], full_decode: bool = False) -> bool:
+        """
+        Check if image data is corrupted.
+
+        The structural check settles most files in microseconds; only
+        formats it does not recognise are decoded.
+
+        Args:
+            image_data: Image bytes or file path
+            full_decode: Also decode structurally valid files, catching
+                         damage inside the compressed image data
+
+        Returns:
+            True if corrupted/invalid, False if valid
+        """
+        structure = self.check_structure(image_data)
+        if structure == STRUCTURE_CORRUPT:
             return True
+        if structure == STRUCTURE_VALID and not full_decode:
+            return False
+        return self.decode(image_data) is None
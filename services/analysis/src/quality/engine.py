@@ -0,0 +1,276 @@
+import asyncio
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import cv2
+
+from .scorer import QualityScorer
+
+# Scorer owned by each pool worker process, created by _init_worker
+_worker_scorer: Optional[QualityScorer] = None
+
+
+def _init_worker(
+    opencv_threads: int,
+    working_size: Optional[int] = None,
+    reduced_decode: bool = True,
+    blur_threshold: float = 100.0,
+    blur_weight: float = QualityScorer.BLUR_WEIGHT
+) -> None:
+    """
+    Configure a freshly started pool worker.
+
+    Args:
+        opencv_threads: OpenCV's internal thread count inside the worker
+        working_size: Long edge images are normalized to before scoring
+        reduced_decode: Decode JPEGs directly near working_size
+        blur_threshold: Laplacian variance that scores 100 for blur
+        blur_weight: Weight of blur in overall_quality
+    """
+    global _worker_scorer
+    # Parallelism comes from the pool itself; letting every worker also
+    # spin up one OpenCV thread per core oversubscribes the CPU
+    cv2.setNumThreads(opencv_threads)
+    _worker_scorer = QualityScorer(
+        working_size=working_size,
+        reduced_decode=reduced_decode,
+        blur_threshold=blur_threshold,
+        blur_weight=blur_weight
+    )
+
+
+def _score_shared(name: str, size: int) -> Dict[str, Optional[float]]:
+    """
+    Score image bytes placed in a shared memory block by the parent.
+
+    The bytes are read in place through a view of the block rather than
+    copied into the worker.
+
+    Args:
+        name: Shared memory block name
+        size: Number of valid bytes in the block
+
+    Returns:
+        Dict with blur_score, exposure_score, overall_quality, is_corrupted
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # Released before close(), which fails while views are exported
+        with shm.buf[:size] as image_data:
+            return _worker_scorer.analyze_image_bytes(image_data)
+    finally:
+        shm.close()
+
+
+def _score_many(name: str, sizes: Sequence[int]) -> List[Dict[str, Optional[float]]]:
+    """
+    Score several images packed back to back in a shared memory block.
+
+    Args:
+        name: Shared memory block name
+        sizes: Byte length of each image, in packing order
+
+    Returns:
+        One result dict per image, in packing order
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    views = []
+    try:
+        offset = 0
+        for size in sizes:
+            views.append(shm.buf[offset:offset + size])
+            offset += size
+        return _worker_scorer.analyze_images_bytes(views)
+    finally:
+        # Released before close(), which fails while views are exported
+        for view in views:
+            view.release()
+        shm.close()
+
+
+def _score_file(path: str) -> Dict[str, Optional[float]]:
+    """
+    Score an image file by memory-mapping it.
+
+    Used for downloads spilled to disk: the page cache backs the mapping,
+    so the worker never holds its own copy of the file.
+
+    Args:
+        path: Image file path
+
+    Returns:
+        Dict with blur_score, exposure_score, overall_quality, is_corrupted
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _worker_scorer.analyze_image_bytes(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _worker_scorer.analyze_image_bytes(mapped)
+
+
+class ScoringEngine:
+    """Scores images in a pool of worker processes."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        opencv_threads: int = 1,
+        working_size: Optional[int] = None,
+        reduced_decode: bool = True,
+        blur_threshold: float = 100.0,
+        blur_weight: float = QualityScorer.BLUR_WEIGHT,
+        batch_size: int = 1,
+        batch_wait: float = 0.0
+    ):
+        """
+        Args:
+            max_workers: Number of scoring processes. Defaults to one per CPU core.
+            opencv_threads: OpenCV thread count inside each worker
+            working_size: Long edge images are normalized to before scoring
+            reduced_decode: Decode JPEGs directly near working_size
+            blur_threshold: Laplacian variance that scores 100 for blur
+            blur_weight: Weight of blur in overall_quality
+            batch_size: Most images score_batched() hands to a worker at once
+            batch_wait: Seconds score_batched() waits for a batch to fill
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.opencv_threads = opencv_threads
+        self.working_size = working_size
+        self.reduced_decode = reduced_decode
+        self.blur_threshold = blur_threshold
+        self.blur_weight = blur_weight
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: List[Tuple[Union[bytes, bytearray], asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Workers start lazily so importing the service never forks
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(
+                    self.opencv_threads, self.working_size, self.reduced_decode,
+                    self.blur_threshold, self.blur_weight
+                )
+            )
+        return self._executor
+
+    async def score(self, image_data: Union[bytes, bytearray, str]) -> Dict[str, Optional[float]]:
+        """
+        Score image bytes in a worker process.
+
+        The bytes are handed over through shared memory rather than being
+        pickled through the pool's pipe, so large originals cost one memcpy
+        instead of a serialize/copy/deserialize round trip. Files are
+        memory-mapped by the worker instead.
+
+        Args:
+            image_data: Image file bytes, or the path of an image file
+
+        Returns:
+            Dict with blur_score, exposure_score, overall_quality, is_corrupted
+        """
+        loop = asyncio.get_running_loop()
+        if isinstance(image_data, str):
+            return await loop.run_in_executor(self._get_executor(), _score_file, image_data)
+
+        size = len(image_data)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, size))
+        try:
+            shm.buf[:size] = image_data
+            return await loop.run_in_executor(self._get_executor(), _score_shared, shm.name, size)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def score_many(self, images: Sequence[Union[bytes, bytearray]]) -> List[Dict[str, Optional[float]]]:
+        """
+        Score several images in one worker call.
+
+        The images are packed into a single shared memory block and scored
+        by QualityScorer.analyze_images_bytes(), which stacks same-size
+        frames into vectorized passes.
+
+        Args:
+            images: Image file bytes
+
+        Returns:
+            One result dict per image, in input order
+        """
+        sizes = [len(image_data) for image_data in images]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(sizes)))
+        try:
+            offset = 0
+            for image_data, size in zip(images, sizes):
+                shm.buf[offset:offset + size] = image_data
+                offset += size
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), _score_many, shm.name, sizes)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    async def score_batched(self, image_data: Union[bytes, bytearray, str]) -> Dict[str, Optional[float]]:
+        """
+        Score image bytes together with other concurrent callers.
+
+        Requests are collected until batch_size of them are pending or
+        batch_wait seconds have passed, then scored with one score_many()
+        call. Meant for small renditions, where the per-image cost of a
+        worker round trip outweighs the scoring itself. Paths, and engines
+        with a batch_size of 1, go straight to score().
+
+        Args:
+            image_data: Image file bytes, or the path of an image file
+
+        Returns:
+            Dict with blur_score, exposure_score, overall_quality, is_corrupted
+        """
+        if isinstance(image_data, str) or self.batch_size <= 1:
+            return await self.score(image_data)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image_data, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.batch_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        pending, self._pending = self._pending, []
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(self._score_pending(pending))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _score_pending(self, pending: List[Tuple[Union[bytes, bytearray], asyncio.Future]]) -> None:
+        try:
+            results = await self.score_many([image_data for image_data, _ in pending])
+        except Exception as e:
+            results = [e] * len(pending)
+        for (_, future), result in zip(pending, results):
+            # Callers may have been cancelled while the batch was scored
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def shutdown(self) -> None:
+        """Stop the worker processes. The pool restarts on the next score()."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -0,0 +1,79 @@
+import struct
+from typing import Optional
+
+JPEG_SOI = b"\xff\xd8"
+EXIF_HEADER = b"Exif\x00\x00"
+TIFF_HEADERS = (b"II*\x00", b"MM\x00*")
+
+# IFD1 tags locating the embedded JPEG thumbnail
+TAG_THUMBNAIL_OFFSET = 0x0201
+TAG_THUMBNAIL_LENGTH = 0x0202
+
+
+def _find_tiff(data: bytes) -> Optional[bytes]:
+    """Return the TIFF structure of a JPEG's Exif segment, or of a TIFF-based file itself."""
+    if data[:4] in TIFF_HEADERS:
+        return data
+    if data[:2] != JPEG_SOI:
+        return None
+
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        # Start of scan: no metadata segments follow
+        if marker == 0xDA:
+            return None
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        segment = data[position + 4:position + 2 + length]
+        if marker == 0xE1 and segment.startswith(EXIF_HEADER):
+            return segment[len(EXIF_HEADER):]
+        position += 2 + length
+    return None
+
+
+def extract_exif_thumbnail(data: bytes) -> Optional[bytes]:
+    """
+    Extract the JPEG thumbnail embedded in an image's Exif metadata.
+
+    Cameras store a ~160x120 preview in IFD1 near the start of the file, so
+    the first few KB of an original (e.g. from an HTTP Range request)
+    usually contain it.
+
+    Args:
+        data: Leading bytes of a JPEG or TIFF-based (e.g. DNG) file
+
+    Returns:
+        Thumbnail JPEG bytes, or None if there is none within data
+    """
+    tiff = _find_tiff(data)
+    if tiff is None or tiff[:4] not in TIFF_HEADERS:
+        return None
+    endian = "<" if tiff[:2] == b"II" else ">"
+
+    try:
+        ifd0 = struct.unpack(endian + "I", tiff[4:8])[0]
+        ifd0_entries = struct.unpack(endian + "H", tiff[ifd0:ifd0 + 2])[0]
+        next_ifd = ifd0 + 2 + ifd0_entries * 12
+        ifd1 = struct.unpack(endian + "I", tiff[next_ifd:next_ifd + 4])[0]
+        if ifd1 == 0:
+            return None
+
+        offset = length = None
+        ifd1_entries = struct.unpack(endian + "H", tiff[ifd1:ifd1 + 2])[0]
+        for index in range(ifd1_entries):
+            entry = ifd1 + 2 + index * 12
+            tag, _, _, value = struct.unpack(endian + "HHII", tiff[entry:entry + 12])
+            if tag == TAG_THUMBNAIL_OFFSET:
+                offset = value
+            elif tag == TAG_THUMBNAIL_LENGTH:
+                length = value
+    except struct.error:
+        # Metadata cut off by the end of data
+        return None
+
+    if offset is None or not length or offset + length > len(tiff):
+        return None
+    thumbnail = tiff[offset:offset + length]
+    return thumbnail if thumbnail.startswith(JPEG_SOI) else None
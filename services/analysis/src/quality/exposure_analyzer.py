@@ -1,7 +1,11 @@
 import cv2
 import numpy as np
 from PIL import Image
-from typing import Union
+from sqlalchemy import func
+from sqlalchemy.sql.elements import ColumnElement
+from typing import Tuple, Union
+
+from .sql import greatest, least
 
 
 class ExposureAnalyzer:
@@ -12,6 +16,7 @@ class ExposureAnalyzer:
     SPREAD_NORMALIZATION = 50.0  # Normalization factor for histogram spread
     BRIGHTNESS_WEIGHT = 0.6  # Weight for brightness score in final calculation
     SPREAD_WEIGHT = 0.4  # Weight for spread score in final calculation
+    LEVELS = np.arange(256, dtype=np.float64)  # Histogram bin intensities
 
     def calculate_exposure_score(self, image: Union[Image.Image, np.ndarray]) -> float:
         """
@@ -59,26 +64,125 @@ class ExposureAnalyzer:
         else:
             gray = img_array
 
+        return self.score_grayscale(gray)
+
+    def score_grayscale(self, gray: np.ndarray) -> float:
+        """
+        Calculate exposure score for an already validated grayscale array.
+
+        Used by the single-decode pipeline, which converts each image to
+        grayscale once and shares the result between all metrics.
+
+        Args:
+            gray: 2D uint8 grayscale array
+
+        Returns:
+            Exposure score between 0 (very poor) and 100 (excellent)
+        """
+        return float(self.score_from_moments(*self.brightness_moments(gray)))
+
+    def brightness_moments(self, gray: np.ndarray) -> Tuple[float, float]:
+        """
+        Calculate the raw brightness mean and spread exposure scores are derived from.
+
+        Args:
+            gray: 2D uint8 grayscale array
+
+        Returns:
+            (mean brightness, standard deviation of brightness)
+        """
         # Calculate histogram
         hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
         hist = hist.flatten() / hist.sum()  # Normalize
 
         # Calculate mean brightness
-        mean_brightness = np.average(np.arange(256), weights=hist)
+        mean_brightness = float(hist @ self.LEVELS)
 
         # Calculate histogram spread (standard deviation)
-        std_dev = np.sqrt(np.average((np.arange(256) - mean_brightness)**2, weights=hist))
+        std_dev = float(np.sqrt(hist @ (self.LEVELS - mean_brightness) ** 2))
+
+        return mean_brightness, std_dev
+
+    def score_grayscale_batch(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Calculate exposure scores for a stack of same-size grayscale frames.
+
+        The histogram mean and standard deviation equal the pixel mean and
+        standard deviation, so the whole stack is reduced in two integer
+        passes instead of one histogram per frame.
+
+        Args:
+            frames: 3D uint8 array of shape (count, height, width)
+
+        Returns:
+            1D array of exposure scores between 0 and 100
+        """
+        return self.score_from_moments(*self.brightness_moments_batch(frames))
+
+    @staticmethod
+    def brightness_moments_batch(frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate brightness means and spreads for a stack of same-size grayscale frames.
+
+        Args:
+            frames: 3D uint8 array of shape (count, height, width)
+
+        Returns:
+            (1D array of mean brightness, 1D array of brightness standard deviation)
+        """
+        pixel_count = frames.shape[1] * frames.shape[2]
+        sums = frames.sum(axis=(1, 2), dtype=np.int64)
+        squares = np.square(frames, dtype=np.uint32).sum(axis=(1, 2), dtype=np.int64)
+
+        mean_brightness = sums / pixel_count
+        variance = np.maximum(squares / pixel_count - mean_brightness ** 2, 0.0)
+
+        return mean_brightness, np.sqrt(variance)
+
+    def score_from_moments(
+        self,
+        mean_brightness: Union[float, np.ndarray],
+        std_dev: Union[float, np.ndarray]
+    ) -> Union[float, np.ndarray]:
+        """
+        Map brightness mean and spread to an exposure score.
+
+        Works element-wise on scalars or arrays.
 
+        Args:
+            mean_brightness: Mean grayscale intensity (0-255)
+            std_dev: Standard deviation of grayscale intensity
+
+        Returns:
+            Exposure score(s) between 0 (very poor) and 100 (excellent)
+        """
         # Score based on mean brightness (penalty for too dark or too bright)
         # Ideal mean is around IDEAL_BRIGHTNESS, with some tolerance
-        brightness_penalty = abs(mean_brightness - self.IDEAL_BRIGHTNESS) / self.IDEAL_BRIGHTNESS
-        brightness_score = max(0, 1.0 - brightness_penalty)
+        brightness_penalty = np.abs(mean_brightness - self.IDEAL_BRIGHTNESS) / self.IDEAL_BRIGHTNESS
+        brightness_score = np.maximum(0.0, 1.0 - brightness_penalty)
 
         # Score based on histogram spread (good images have reasonable spread)
         # Too narrow = flat/dull, too wide = potentially overexposed highlights + dark shadows
-        spread_score = min(1.0, std_dev / self.SPREAD_NORMALIZATION)  # Normalize to 0-1
+        spread_score = np.minimum(1.0, std_dev / self.SPREAD_NORMALIZATION)  # Normalize to 0-1
 
         # Combine scores (weighted average)
         final_score = (brightness_score * self.BRIGHTNESS_WEIGHT + spread_score * self.SPREAD_WEIGHT) * 100.0
 
-        return float(max(0.0, min(100.0, final_score)))
+        return np.clip(final_score, 0.0, 100.0)
+
+    def score_from_moments_sql(self, mean_brightness: ColumnElement, std_dev: ColumnElement) -> ColumnElement:
+        """
+        SQL expression computing score_from_moments() from stored features.
+
+        Args:
+            mean_brightness: Mean grayscale intensity column
+            std_dev: Grayscale standard deviation column
+
+        Returns:
+            Exposure score expression
+        """
+        brightness_penalty = func.abs(mean_brightness - self.IDEAL_BRIGHTNESS) / float(self.IDEAL_BRIGHTNESS)
+        brightness_score = greatest(1.0 - brightness_penalty, 0.0)
+        spread_score = least(std_dev / self.SPREAD_NORMALIZATION, 1.0)
+        final_score = (brightness_score * self.BRIGHTNESS_WEIGHT + spread_score * self.SPREAD_WEIGHT) * 100.0
+        return greatest(least(final_score, 100.0), 0.0)
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+
+# Hash is HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 8
+
+
+def dhash(gray: np.ndarray) -> int:
+    """
+    Compute a 64-bit difference hash (dHash) of a grayscale image.
+
+    The image is area-averaged down to 9x8 pixels and each bit records
+    whether a pixel is brighter than its left neighbour. Frames of the same
+    scene differ in a few bits; unrelated photos in about half of them.
+
+    Args:
+        gray: 2D uint8 grayscale array, e.g. the working-resolution frame
+              already decoded for scoring
+
+    Returns:
+        The 64 hash bits as a signed 64-bit integer, so it fits a BIGINT
+        column
+    """
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int(np.packbits(bits).view(">i8")[0])
+
+
+def hamming_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Count differing bits between hashes, element-wise.
+
+    Args:
+        a: int64 hashes
+        b: int64 hashes, broadcastable against a
+
+    Returns:
+        Number of differing bits (0-64) per pair
+    """
+    diff = np.bitwise_xor(np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64))
+    return np.unpackbits(np.ascontiguousarray(diff)[..., np.newaxis].view(np.uint8), axis=-1).sum(axis=-1)
@@ -1,61 +1,311 @@
+import numpy as np
 from PIL import Image
-import io
-from typing import Dict, Union, Optional
+from sqlalchemy.sql.elements import ColumnElement
+from typing import BinaryIO, Dict, List, Sequence, Union, Optional
 from .blur_detector import BlurDetector
 from .exposure_analyzer import ExposureAnalyzer
 from .corruption_detector import CorruptionDetector
+from .perceptual_hash import dhash
+
+# Bump whenever a change to decoding or metrics alters the features produced;
+# scores stored under other versions are then picked up by re-analysis
+ANALYZER_VERSION = "2"
+
+# Result reported for images that cannot be decoded
+CORRUPTED_RESULT: Dict[str, Optional[float]] = {
+    'blur_score': None,
+    'exposure_score': None,
+    'overall_quality': 0.0,
+    'is_corrupted': True
+}
 
 
 class QualityScorer:
     """Combines blur, exposure, and corruption detection into overall quality score."""
 
-    def __init__(self):
-        self.blur_detector = BlurDetector()
+    # Weights of the component scores in overall_quality
+    BLUR_WEIGHT = 0.6
+    EXPOSURE_WEIGHT = 0.4
+
+    def __init__(
+        self,
+        working_size: Optional[int] = None,
+        reduced_decode: bool = True,
+        blur_threshold: float = 100.0,
+        blur_weight: float = BLUR_WEIGHT
+    ):
+        """
+        Args:
+            working_size: Long edge (pixels) images are normalized to before
+                          scoring. Larger images are downscaled and smaller ones
+                          are compensated for, so originals, previews and
+                          thumbnails of the same photo score alike. None scores
+                          images at their native resolution.
+            reduced_decode: Decode JPEG bytes directly near working_size using
+                          DCT-domain scaling instead of decoding full resolution
+                          and downscaling afterwards
+            blur_threshold: Laplacian variance that scores 100 for blur
+            blur_weight: Weight of blur in overall_quality (0-1); exposure
+                          gets the rest
+
+        Raises:
+            ValueError: If blur_weight is outside 0-1
+        """
+        if not 0.0 <= blur_weight <= 1.0:
+            raise ValueError(f"blur_weight must be between 0 and 1, got {blur_weight}")
+        self.working_size = working_size
+        self.reduced_decode = reduced_decode
+        self.blur_weight = blur_weight
+        self.exposure_weight = 1.0 - blur_weight
+        self.blur_detector = BlurDetector(threshold=blur_threshold, reference_size=working_size)
         self.exposure_analyzer = ExposureAnalyzer()
         self.corruption_detector = CorruptionDetector()
 
-    def analyze_image(self, image: Image.Image) -> Dict[str, Optional[float]]:
+    def _to_working_resolution(self, image: Image.Image) -> Image.Image:
+        """Downscale image so its long edge is at most working_size."""
+        if self.working_size and max(image.size) > self.working_size:
+            image = image.copy()
+            image.thumbnail((self.working_size, self.working_size), Image.Resampling.BOX)
+        return image
+
+    @staticmethod
+    def _to_grayscale(image: Image.Image) -> np.ndarray:
+        """Convert any PIL mode to the single 8-bit grayscale array shared by all metrics."""
+        if image.mode != "L":
+            image = image.convert("L")
+        return np.asarray(image)
+
+    def score_features(
+        self,
+        laplacian_variance: Union[float, Sequence[float]],
+        working_long_edge: Union[int, Sequence[int]],
+        mean_brightness: Union[float, Sequence[float]],
+        brightness_std: Union[float, Sequence[float]]
+    ) -> Dict[str, np.ndarray]:
         """
-        Analyze image quality.
+        Derive quality scores from raw image features.
+
+        Works element-wise on scalars or sequences, so stored features can be
+        re-scored in bulk after a threshold or weight change without
+        fetching or decoding any image.
 
         Args:
-            image: PIL Image
+            laplacian_variance: Laplacian variance at the working resolution
+            working_long_edge: Long edge (pixels) the features were computed at
+            mean_brightness: Mean grayscale intensity (0-255)
+            brightness_std: Standard deviation of grayscale intensity
 
         Returns:
-            Dict with blur_score, exposure_score, overall_quality, is_corrupted
+            Dict with blur_score, exposure_score and overall_quality
+        """
+        blur_score = self.blur_detector.score_from_variance(np.asarray(laplacian_variance), np.asarray(working_long_edge))
+        exposure_score = self.exposure_analyzer.score_from_moments(np.asarray(mean_brightness), np.asarray(brightness_std))
+        return {
+            'blur_score': blur_score,
+            'exposure_score': exposure_score,
+            'overall_quality': blur_score * self.blur_weight + exposure_score * self.exposure_weight
+        }
+
+    def score_features_sql(
+        self,
+        laplacian_variance: ColumnElement,
+        working_long_edge: ColumnElement,
+        mean_brightness: ColumnElement,
+        brightness_std: ColumnElement
+    ) -> Dict[str, ColumnElement]:
         """
-        blur_score = self.blur_detector.calculate_blur_score(image)
-        exposure_score = self.exposure_analyzer.calculate_exposure_score(image)
+        SQL counterpart of score_features() over stored feature columns.
 
-        # Overall quality: weighted average (blur 60%, exposure 40%)
-        overall_quality = blur_score * 0.6 + exposure_score * 0.4
+        Lets the database re-score every row in one set-based UPDATE
+        instead of shipping features and scores back and forth.
 
+        Args:
+            laplacian_variance: Laplacian variance column
+            working_long_edge: Working long edge column
+            mean_brightness: Mean grayscale intensity column
+            brightness_std: Grayscale standard deviation column
+
+        Returns:
+            Dict with blur_score, exposure_score and overall_quality expressions
+        """
+        blur_score = self.blur_detector.score_from_variance_sql(laplacian_variance, working_long_edge)
+        exposure_score = self.exposure_analyzer.score_from_moments_sql(mean_brightness, brightness_std)
         return {
             'blur_score': blur_score,
             'exposure_score': exposure_score,
-            'overall_quality': overall_quality,
-            'is_corrupted': False
+            'overall_quality': blur_score * self.blur_weight + exposure_score * self.exposure_weight
         }
 
-    def analyze_image_bytes(self, image_data: bytes) -> Dict[str, Optional[float]]:
+    def analyze_grayscale(self, gray: np.ndarray) -> Dict[str, Optional[float]]:
+        """
+        Analyze image quality from a working-resolution grayscale array.
+
+        Args:
+            gray: 2D uint8 grayscale array
+
+        Returns:
+            Dict with blur_score, exposure_score, overall_quality, is_corrupted,
+            the raw features they were derived from and the frame's
+            perceptual_hash
+        """
+        features = {
+            'laplacian_variance': self.blur_detector.laplacian_variance(gray),
+            'working_long_edge': max(gray.shape[:2])
+        }
+        features['mean_brightness'], features['brightness_std'] = self.exposure_analyzer.brightness_moments(gray)
+        scores = self.score_features(**features)
+
+        return {
+            'blur_score': float(scores['blur_score']),
+            'exposure_score': float(scores['exposure_score']),
+            'overall_quality': float(scores['overall_quality']),
+            'is_corrupted': False,
+            **features,
+            'perceptual_hash': dhash(gray)
+        }
+
+    def analyze_batch(self, frames: Union[np.ndarray, List[np.ndarray]]) -> List[Dict[str, Optional[float]]]:
+        """
+        Analyze a stack of same-size working-resolution grayscale frames.
+
+        Blur and exposure are computed for the whole stack in vectorized
+        passes, which removes per-image Python overhead for thumbnail-sized
+        inputs. Results match analyze_grayscale() on each frame.
+
+        Args:
+            frames: 3D uint8 array of shape (count, height, width), or a list
+                    of equally sized 2D uint8 arrays
+
+        Returns:
+            One result dict per frame, in input order
+
+        Raises:
+            ValueError: If frames are not same-size 8-bit grayscale
+        """
+        if len(frames) == 0:
+            return []
+
+        stack = np.asarray(frames)
+        if stack.ndim != 3 or stack.dtype != np.uint8:
+            raise ValueError(
+                f"Frames must be same-size 2D uint8 arrays, got shape {stack.shape} and dtype {stack.dtype}"
+            )
+
+        long_edge = max(stack.shape[1:])
+        variances = self.blur_detector.laplacian_variance_batch(stack)
+        means, stds = self.exposure_analyzer.brightness_moments_batch(stack)
+        scores = self.score_features(variances, long_edge, means, stds)
+
+        return [
+            {
+                'blur_score': float(blur_score),
+                'exposure_score': float(exposure_score),
+                'overall_quality': float(overall_quality),
+                'is_corrupted': False,
+                'laplacian_variance': float(variance),
+                'working_long_edge': long_edge,
+                'mean_brightness': float(mean),
+                'brightness_std': float(std),
+                'perceptual_hash': dhash(frame)
+            }
+            for blur_score, exposure_score, overall_quality, variance, mean, std, frame in zip(
+                scores['blur_score'], scores['exposure_score'], scores['overall_quality'], variances, means, stds, stack
+            )
+        ]
+
+    @staticmethod
+    def needs_full_analysis(prescreen: Dict[str, Optional[float]], threshold: float, band: float) -> bool:
+        """
+        Decide whether a pre-screen result is conclusive.
+
+        In cascade mode a tiny rendition is scored first. Only photos that
+        are clearly bad keep that result: downscaling hides blur, so a
+        sharp-looking thumbnail proves nothing about the original, while a
+        thumbnail that already looks blurred or badly exposed does. Photos
+        scoring above threshold - band, or whose pre-screen could not be
+        decoded, are escalated to a full-size analysis.
+
+        Args:
+            prescreen: Result of scoring the tiny rendition
+            threshold: overall_quality separating keep from discard
+            band: Margin below threshold a pre-screen must score to be final
+
+        Returns:
+            True if the asset needs the full analysis
+        """
+        if prescreen['is_corrupted']:
+            return True
+        return prescreen['overall_quality'] >= threshold - band
+
+    def analyze_image(self, image: Image.Image) -> Dict[str, Optional[float]]:
+        """
+        Analyze image quality.
+
+        Args:
+            image: PIL Image
+
+        Returns:
+            Dict with blur_score, exposure_score, overall_quality, is_corrupted
+        """
+        image = self._to_working_resolution(image)
+        return self.analyze_grayscale(self._to_grayscale(image))
+
+    def analyze_image_bytes(self, image_data: Union[bytes, memoryview, BinaryIO]) -> Dict[str, Optional[float]]:
         """
         Analyze image quality from bytes.
 
+        The bytes are decoded exactly once: the decode that proves the file
+        is not corrupted also provides the pixels for every metric. With
+        reduced_decode, peak memory per image is bounded by working_size
+        rather than by the camera's megapixels.
+
         Args:
-            image_data: Image file bytes
+            image_data: Image file bytes, a memoryview of them, or a
+                        seekable binary file object such as an mmap of the file
 
         Returns:
             Dict with blur_score, exposure_score, overall_quality, is_corrupted
         """
-        # Check for corruption first
-        if self.corruption_detector.is_corrupted(image_data):
-            return {
-                'blur_score': None,
-                'exposure_score': None,
-                'overall_quality': 0.0,
-                'is_corrupted': True
-            }
+        target_size = self.working_size if self.reduced_decode else None
+        image = self.corruption_detector.decode(image_data, target_size=target_size)
+        if image is None:
+            return dict(CORRUPTED_RESULT)
 
-        # Load and analyze
-        image = Image.open(io.BytesIO(image_data))
         return self.analyze_image(image)
+
+    def analyze_images_bytes(
+        self,
+        images: Sequence[Union[bytes, memoryview, BinaryIO]]
+    ) -> List[Dict[str, Optional[float]]]:
+        """
+        Analyze several images from bytes in vectorized passes.
+
+        Each image is decoded to its working-resolution grayscale frame, and
+        frames of the same size are stacked and scored by analyze_batch().
+        Small renditions such as thumbnails mostly share a handful of sizes,
+        so this mainly saves per-image overhead when pre-screening.
+
+        Args:
+            images: Image file bytes, memoryviews of them or seekable binary
+                    file objects
+
+        Returns:
+            One result dict per image, in input order, matching
+            analyze_image_bytes() on each
+        """
+        target_size = self.working_size if self.reduced_decode else None
+        results: List[Optional[Dict[str, Optional[float]]]] = [None] * len(images)
+        frames_by_shape: Dict[tuple, List[int]] = {}
+        frames: Dict[int, np.ndarray] = {}
+        for index, image_data in enumerate(images):
+            image = self.corruption_detector.decode(image_data, target_size=target_size)
+            if image is None:
+                results[index] = dict(CORRUPTED_RESULT)
+                continue
+            frames[index] = self._to_grayscale(self._to_working_resolution(image))
+            frames_by_shape.setdefault(frames[index].shape, []).append(index)
+
+        for indexes in frames_by_shape.values():
+            for index, result in zip(indexes, self.analyze_batch([frames[index] for index in indexes])):
+                results[index] = result
+        return results
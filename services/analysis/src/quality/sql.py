@@ -0,0 +1,27 @@
+"""SQL counterparts of the numpy clamps used by the score formulas."""
+from sqlalchemy import Float
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+
+
+class least(GenericFunction):
+    """Element-wise minimum, like np.minimum: LEAST() in PostgreSQL."""
+    type = Float()
+    inherit_cache = True
+
+
+class greatest(GenericFunction):
+    """Element-wise maximum, like np.maximum: GREATEST() in PostgreSQL."""
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(least, "sqlite")
+def _sqlite_least(element, compiler, **kw):
+    # SQLite's multi-argument min() is a scalar function
+    return f"min({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(greatest, "sqlite")
+def _sqlite_greatest(element, compiler, **kw):
+    return f"max({compiler.process(element.clauses, **kw)})"
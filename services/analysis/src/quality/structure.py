@@ -0,0 +1,170 @@
+import re
+import struct
+import zlib
+from typing import Optional
+
+# Outcomes of a structural check
+STRUCTURE_VALID = "valid"
+STRUCTURE_CORRUPT = "corrupt"
+STRUCTURE_UNKNOWN = "unknown"
+
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# The empty IEND chunk every complete PNG ends with
+PNG_IEND_CHUNK = struct.pack(">I4sI", 0, b"IEND", zlib.crc32(b"IEND"))
+
+# JPEG markers without a length field: TEM and RST0-7
+STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+JPEG_SOS = 0xDA
+# Regex search works on any buffer (bytes, mmap, memoryview) without copying
+JPEG_EOI_PATTERN = re.compile(re.escape(JPEG_EOI))
+
+
+def _undecided_jpeg(data, position: int) -> str:
+    """Verdict for a JPEG whose marker walk lost track at position: only a missing EOI is conclusive."""
+    return STRUCTURE_CORRUPT if JPEG_EOI_PATTERN.search(data, position) is None else STRUCTURE_UNKNOWN
+
+
+def check_jpeg(data) -> str:
+    """
+    Walk a JPEG's marker segments up to the first scan and look for its end.
+
+    Entropy-coded data escapes 0xFF bytes, so an EOI marker after the first
+    scan reliably marks the end of the image; files cut off mid-scan have
+    none. Bytes after EOI (maker trailers, multi-picture data) are allowed.
+    Only truncation is reported as corrupt: decoders skip stray bytes
+    between segments, so a walk that loses track of the markers leaves the
+    verdict to the decoder unless the file has no EOI at all.
+    """
+    position = len(JPEG_SOI)
+    while True:
+        # Skip fill bytes between segments
+        while data[position:position + 2] == b"\xff\xff":
+            position += 1
+        if position + 2 > len(data):
+            return STRUCTURE_CORRUPT
+        if data[position] != 0xFF:
+            return _undecided_jpeg(data, position)
+        marker = data[position + 1]
+        if marker in STANDALONE_MARKERS:
+            position += 2
+            continue
+        if position + 4 > len(data):
+            return STRUCTURE_CORRUPT
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        if length < 2:
+            return _undecided_jpeg(data, position)
+        if position + 2 + length > len(data):
+            return STRUCTURE_CORRUPT
+        position += 2 + length
+        if marker == JPEG_SOS:
+            break
+
+    if JPEG_EOI_PATTERN.search(data, position) is None:
+        return STRUCTURE_CORRUPT
+    return STRUCTURE_VALID
+
+
+def check_png(data) -> str:
+    """Verify a PNG's chunk lengths, that IHDR comes first and IEND last, and every chunk CRC."""
+    chunks = []
+    position = len(PNG_SIGNATURE)
+    while True:
+        if position + 12 > len(data):
+            return STRUCTURE_CORRUPT
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        end = position + 12 + length
+        if end > len(data):
+            return STRUCTURE_CORRUPT
+        chunks.append((position, length))
+        position = end
+        if chunk_type == b"IEND":
+            break
+
+    if data[len(PNG_SIGNATURE) + 4:len(PNG_SIGNATURE) + 8] != b"IHDR":
+        return STRUCTURE_CORRUPT
+    # CRCs last, so truncation is caught without reading the pixel data
+    for position, length in chunks:
+        expected = struct.unpack(">I", data[position + 8 + length:position + 12 + length])[0]
+        if zlib.crc32(data[position + 4:position + 8 + length]) != expected:
+            return STRUCTURE_CORRUPT
+    return STRUCTURE_VALID
+
+
+def check_isobmff(data) -> str:
+    """Walk the top-level boxes of an ISO base media file (HEIC, AVIF, MP4, MOV)."""
+    position = 0
+    while position < len(data):
+        if position + 8 > len(data):
+            return STRUCTURE_CORRUPT
+        size = struct.unpack(">I", data[position:position + 4])[0]
+        if size == 1:
+            if position + 16 > len(data):
+                return STRUCTURE_CORRUPT
+            size = struct.unpack(">Q", data[position + 8:position + 16])[0]
+            header = 16
+        elif size == 0:
+            # Box extends to the end of the file
+            size = len(data) - position
+            header = 8
+        else:
+            header = 8
+        if size < header or position + size > len(data):
+            return STRUCTURE_CORRUPT
+        position += size
+    return STRUCTURE_VALID
+
+
+def check_structure(data) -> str:
+    """
+    Validate an image container's structure directly on its bytes.
+
+    Catches truncated uploads, the most common corruption, without
+    decoding any pixels. A valid structure does not prove the compressed
+    image data decodes.
+
+    Args:
+        data: Image bytes, or any sliceable buffer such as an mmap
+
+    Returns:
+        STRUCTURE_CORRUPT for a damaged JPEG, PNG or ISO-BMFF (HEIC, AVIF,
+        MP4) container, STRUCTURE_VALID if its structure checks out, or
+        STRUCTURE_UNKNOWN for other formats
+    """
+    if len(data) == 0:
+        return STRUCTURE_CORRUPT
+    if data[:2] == JPEG_SOI:
+        return check_jpeg(data)
+    if data[:8] == PNG_SIGNATURE:
+        return check_png(data)
+    if data[4:8] == b"ftyp":
+        return check_isobmff(data)
+    return STRUCTURE_UNKNOWN
+
+
+def check_tail(tail, mime_type: Optional[str]) -> str:
+    """
+    Look for a file's end marker in its last bytes.
+
+    Truncation, the most common corruption, removes the end marker, so it
+    can be caught from a ranged read of a few kilobytes instead of the
+    whole file. A JPEG tail without EOI may also just carry a trailer
+    longer than the tail, so CORRUPT means "check the whole file".
+
+    Args:
+        tail: Trailing bytes of the file
+        mime_type: MIME type of the file
+
+    Returns:
+        STRUCTURE_VALID if the tail of a JPEG contains EOI or that of a
+        PNG ends with IEND, STRUCTURE_CORRUPT if not, or STRUCTURE_UNKNOWN
+        for other formats
+    """
+    if len(tail) == 0:
+        return STRUCTURE_CORRUPT
+    if mime_type == "image/jpeg":
+        return STRUCTURE_VALID if JPEG_EOI_PATTERN.search(tail) is not None else STRUCTURE_CORRUPT
+    if mime_type == "image/png":
+        return STRUCTURE_VALID if tail[-len(PNG_IEND_CHUNK):] == PNG_IEND_CHUNK else STRUCTURE_CORRUPT
+    return STRUCTURE_UNKNOWN
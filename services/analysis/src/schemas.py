@@ -29,6 +29,17 @@ class AnalysisStatus(BaseModel):
         from_attributes = True
 
 
+class ReanalysisStatus(BaseModel):
+    status: Literal["idle", "running", "complete", "failed"]
+    analyzer_version: Optional[str] = None
+    stale_assets: int = 0
+    reanalyzed_assets: int = 0
+    failed_assets: int = 0
+    progress_percent: float = 0.0
+    eta_seconds: Optional[int] = None
+    error_message: Optional[str] = None
+
+
 class QualityScoreResponse(BaseModel):
     immich_asset_id: str
     blur_score: Optional[float]
@@ -40,6 +51,11 @@ class QualityScoreResponse(BaseModel):
         from_attributes = True
 
 
+class RescoreResponse(BaseModel):
+    rescored_scores: int
+    rescored_cache_entries: int
+
+
 class BurstSequenceResponse(BaseModel):
     immich_asset_ids: List[str]
     recommended_asset_id: Optional[str]
@@ -0,0 +1,119 @@
+"""Per-batch triage dashboard totals, kept current as results are written."""
+from typing import Any, Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from . import crud
+from .models import AssetQualityScore, BurstSequence, BurstTimelineEntry
+
+CORRUPTED = "corrupted"
+LOW_QUALITY = "low_quality"
+BURST_SEQUENCES = "burst_sequences"
+
+# Dashboard order and badges: green is safe to auto-fix, yellow a quick
+# review, orange needs a closer look
+TRIAGE_CATEGORIES = (CORRUPTED, LOW_QUALITY, BURST_SEQUENCES)
+BADGE_COLORS = {CORRUPTED: "green", BURST_SEQUENCES: "yellow", LOW_QUALITY: "orange"}
+
+
+def quality_category(score: Dict[str, Any], low_quality_threshold: float) -> Optional[str]:
+    """The quality category of a score row, if any."""
+    if score.get('is_corrupted'):
+        return CORRUPTED
+    if score.get('overall_quality') is not None and score['overall_quality'] < low_quality_threshold:
+        return LOW_QUALITY
+    return None
+
+
+def quality_stats(scores: Iterable[Dict[str, Any]], low_quality_threshold: float) -> Dict[str, Tuple[int, int]]:
+    """
+    Count new score rows into the quality categories.
+
+    Args:
+        scores: AssetQualityScore column values, one dict per asset
+        low_quality_threshold: overall_quality below which a photo is low
+                               quality
+
+    Returns:
+        (count, known file size total) by category
+    """
+    stats = {}
+    for score in scores:
+        category = quality_category(score, low_quality_threshold)
+        if category is not None:
+            count, savings = stats.get(category, (0, 0))
+            stats[category] = (count + 1, savings + (score.get('file_size_bytes') or 0))
+    return stats
+
+
+def _triage_totals(
+    db: Session,
+    low_quality_threshold: float,
+    batch_id: Optional[UUID] = None
+) -> Dict[UUID, Dict[str, Tuple[int, int]]]:
+    """Triage totals by batch, from one grouped query per category."""
+    totals = (func.count(AssetQualityScore.id), func.coalesce(func.sum(AssetQualityScore.file_size_bytes), 0))
+    scores = db.query(AssetQualityScore.import_batch_id, *totals).group_by(AssetQualityScore.import_batch_id)
+    burst_members = db.query(
+        BurstTimelineEntry.import_batch_id, func.count(BurstTimelineEntry.id), totals[1]
+    ).join(
+        BurstSequence, BurstSequence.id == BurstTimelineEntry.burst_sequence_id
+    ).outerjoin(AssetQualityScore, and_(
+        AssetQualityScore.immich_asset_id == BurstTimelineEntry.immich_asset_id,
+        AssetQualityScore.import_batch_id == BurstTimelineEntry.import_batch_id
+    )).filter(
+        # Every shot but the recommended one can go
+        BurstTimelineEntry.immich_asset_id != BurstSequence.recommended_asset_id
+    ).group_by(BurstTimelineEntry.import_batch_id)
+    if batch_id is not None:
+        scores = scores.filter(AssetQualityScore.import_batch_id == batch_id)
+        burst_members = burst_members.filter(BurstTimelineEntry.import_batch_id == batch_id)
+
+    queries = {
+        CORRUPTED: scores.filter(AssetQualityScore.is_corrupted.is_(True)),
+        LOW_QUALITY: scores.filter(
+            AssetQualityScore.is_corrupted.isnot(True),
+            AssetQualityScore.overall_quality < low_quality_threshold
+        ),
+        BURST_SEQUENCES: burst_members
+    }
+    stats: Dict[UUID, Dict[str, Tuple[int, int]]] = {}
+    for category, query in queries.items():
+        for row_batch_id, count, savings in query.all():
+            stats.setdefault(row_batch_id, {})[category] = (count, int(savings))
+    return stats
+
+
+def refresh_triage_stats(db: Session, batch_id: UUID, low_quality_threshold: float) -> None:
+    """
+    Recompute a batch's triage totals from its scores and bursts.
+
+    Used where results change in place rather than being added: when
+    bursts are re-detected, which decides the burst category and may move
+    a burst's best shot. Costs one pass over the batch's rows, so the
+    dashboard itself only reads the totals.
+
+    Args:
+        db: Database session
+        batch_id: Import batch
+        low_quality_threshold: overall_quality below which a photo is low
+                               quality
+    """
+    crud.replace_triage_stats(db, batch_id, _triage_totals(db, low_quality_threshold, batch_id).get(batch_id, {}))
+
+
+def refresh_all_triage_stats(db: Session, low_quality_threshold: float) -> None:
+    """
+    Recompute the triage totals of every batch, e.g. after re-scoring.
+
+    Runs a fixed number of grouped statements however many batches there
+    are, instead of one refresh per batch.
+
+    Args:
+        db: Database session
+        low_quality_threshold: overall_quality below which a photo is low
+                               quality
+    """
+    crud.replace_all_triage_stats(db, _triage_totals(db, low_quality_threshold))
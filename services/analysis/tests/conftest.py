@@ -4,8 +4,9 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
-from src.database import Base, get_db
+from src.database import Base, get_db, get_session_factory
 from src.main import app
+from src.immich import CircuitBreaker
 # Import models to ensure they are registered with Base before creating tables
 from src import models  # noqa: F401
 
@@ -27,6 +28,15 @@ def setup_test_db():
     Base.metadata.drop_all(bind=test_engine)
 
 
+@pytest.fixture(scope="function", autouse=True)
+def immich_breaker():
+    """Give each test a closed circuit breaker and retries without backoff delays"""
+    breaker = CircuitBreaker()
+    with patch("src.immich.breaker", breaker):
+        with patch("src.immich.settings.IMMICH_RETRY_BASE_DELAY", 0.0):
+            yield breaker
+
+
 @pytest.fixture(scope="function")
 def db_session(setup_test_db):
     """Get a database session for testing"""
@@ -52,6 +62,7 @@ def client(setup_test_db):
     # Mock the lifespan to prevent it from trying to connect to production DB
     with patch("src.main.Base.metadata.create_all"):
         app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
         with TestClient(app) as test_client:
             yield test_client
         app.dependency_overrides.clear()
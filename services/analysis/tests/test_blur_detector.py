@@ -1,3 +1,6 @@
+import tracemalloc
+
+import cv2
 import pytest
 import numpy as np
 from PIL import Image
@@ -85,3 +88,76 @@ def test_blur_detector_with_invalid_channels(blur_detector):
     invalid_image = np.random.randint(0, 255, (100, 100, 2), dtype=np.uint8)
     with pytest.raises(ValueError, match="Color images must have 3 or 4 channels"):
         blur_detector.calculate_blur_score(invalid_image)
+
+
+def _sharp_scene(long_edge):
+    """Hard-edged rectangles, the content the blur threshold is calibrated on"""
+    rng = np.random.default_rng(0)
+    img = np.full((long_edge * 2 // 3, long_edge), 100, dtype=np.uint8)
+    for _ in range(300):
+        x, y = rng.integers(0, long_edge, 2)
+        w, h = rng.integers(long_edge // 50, long_edge // 5, 2)
+        cv2.rectangle(img, (int(x), int(y)), (int(x + w), int(y + h)), int(rng.integers(0, 255)), -1)
+    return img
+
+
+def test_reference_size_compensates_smaller_renditions():
+    """Downsampled renditions of a sharp photo score close to the reference"""
+    scene = _sharp_scene(1440)
+    thumbnail = cv2.resize(scene, (360, 240), interpolation=cv2.INTER_AREA)
+
+    raw = BlurDetector(threshold=1000.0)
+    calibrated = BlurDetector(threshold=1000.0, reference_size=1440)
+
+    reference_score = calibrated.calculate_blur_score(scene)
+    raw_gap = abs(raw.calculate_blur_score(thumbnail) - reference_score)
+    calibrated_gap = abs(calibrated.calculate_blur_score(thumbnail) - reference_score)
+
+    assert calibrated_gap < raw_gap
+    assert calibrated_gap < 0.5 * reference_score
+
+
+def test_reference_size_does_not_boost_larger_images():
+    scene = _sharp_scene(1440)
+    assert (
+        BlurDetector(threshold=1000.0, reference_size=720).calculate_blur_score(scene)
+        == BlurDetector(threshold=1000.0).calculate_blur_score(scene)
+    )
+
+
+def test_batch_scores_match_single_image_scores():
+    frames = np.random.randint(0, 256, (6, 40, 60), dtype=np.uint8)
+    frames[3] = 128  # Flat frame
+    detector = BlurDetector(threshold=5000.0)
+
+    batch_scores = detector.score_grayscale_batch(frames)
+
+    assert batch_scores.shape == (6,)
+    for frame, score in zip(frames, batch_scores):
+        assert score == pytest.approx(detector.score_grayscale(frame))
+
+
+def test_batch_scores_apply_reference_size():
+    frames = np.random.randint(0, 256, (2, 50, 100), dtype=np.uint8)
+    detector = BlurDetector(threshold=1e6, reference_size=200)
+
+    assert np.allclose(
+        detector.score_grayscale_batch(frames),
+        BlurDetector(threshold=1e6).score_grayscale_batch(frames) * 0.5
+    )
+
+
+def test_laplacian_variance_avoids_float64_buffers():
+    gray = np.random.randint(0, 255, (1080, 1440), dtype=np.uint8)
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S).astype(np.float64)
+
+    tracemalloc.start()
+    try:
+        variance = BlurDetector.laplacian_variance(gray)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert variance == pytest.approx(laplacian.var())
+    # The int16 Laplacian itself, but no float64 copy of it
+    assert peak < 3 * gray.size
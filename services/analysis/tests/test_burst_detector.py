@@ -1,5 +1,6 @@
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import numpy as np
 from src.burst.detector import BurstDetector
 
 
@@ -95,3 +96,60 @@ def test_single_photo_not_burst(burst_detector):
 def test_empty_photos_list(burst_detector):
     bursts = burst_detector.detect_bursts([])
     assert len(bursts) == 0
+
+
+def test_detect_burst_ranges(burst_detector):
+    # Unsorted epoch seconds: a burst of 3, a lone photo, a burst of 2
+    timestamps = np.array([1001.0, 5000.0, 1000.0, 9000.5, 1002.5, 9000.0])
+    ranges = burst_detector.detect_burst_ranges(timestamps)
+
+    assert ranges.starts.tolist() == [0, 4]
+    assert ranges.stops.tolist() == [3, 6]
+    assert [burst.tolist() for burst in ranges.indices()] == [[2, 0, 4], [5, 3]]
+
+
+def test_detect_burst_ranges_keeps_input_order_for_equal_times(burst_detector):
+    ranges = burst_detector.detect_burst_ranges(np.array([10.0, 10.0, 10.0]))
+
+    assert [burst.tolist() for burst in ranges.indices()] == [[0, 1, 2]]
+
+
+def test_detect_burst_ranges_empty(burst_detector):
+    ranges = burst_detector.detect_burst_ranges(np.array([]))
+
+    assert ranges.indices() == []
+
+
+def test_detect_bursts_with_timezone_aware_timestamps(burst_detector, burst_sequence_photos):
+    photos = [{**photo, 'timestamp': photo['timestamp'].replace(tzinfo=timezone.utc)} for photo in burst_sequence_photos]
+
+    assert burst_detector.detect_bursts(photos) == [photos]
+
+
+def test_detect_burst_ranges_splits_on_hash_distance():
+    detector = BurstDetector(interval_seconds=2.0, max_hash_distance=10)
+    timestamps = np.array([0.0, 0.5, 1.0, 1.5])
+    # Two phones shooting at once: similar frames 0, 1 and dissimilar 2, 3
+    hashes = np.array([0, 0b1, -1, -1 << 1], dtype=np.int64)
+
+    ranges = detector.detect_burst_ranges(timestamps, hashes)
+
+    assert [burst.tolist() for burst in ranges.indices()] == [[0, 1], [2, 3]]
+
+
+def test_detect_burst_ranges_ignores_hashes_by_default(burst_detector):
+    ranges = burst_detector.detect_burst_ranges(np.array([0.0, 0.5]), np.array([0, -1], dtype=np.int64))
+
+    assert len(ranges.starts) == 1
+
+
+def test_detect_bursts_never_splits_on_unknown_hash(burst_sequence_photos):
+    detector = BurstDetector(interval_seconds=2.0, max_hash_distance=10)
+    hashes = [0, -1, None, 0, 0]
+    photos = [dict(photo, perceptual_hash=value) for photo, value in zip(burst_sequence_photos, hashes)]
+
+    bursts = detector.detect_bursts(photos)
+
+    assert [[photo['id'] for photo in burst] for burst in bursts] == [
+        ['photo-1', 'photo-2', 'photo-3', 'photo-4']
+    ]
@@ -0,0 +1,242 @@
+"""Tests for the incremental burst index."""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from src import models
+from src.burst.detector import BurstDetector
+from src.burst.scorer import BurstScorer
+from src.burst_index import _load_region, refresh_recommendations, update_burst_index
+
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+REACH = np.timedelta64(2, "s")
+
+
+@pytest.fixture
+def detector():
+    return BurstDetector(interval_seconds=2.0)
+
+
+def _batch(db_session, user_id="user-123"):
+    batch = models.ImportBatch(
+        immich_user_id=user_id,
+        asset_ids=[],
+        status="complete",
+        total_assets=0,
+        analyzed_assets=0,
+        skipped_assets=0
+    )
+    db_session.add(batch)
+    db_session.commit()
+    return batch.id
+
+
+def _score(db_session, batch_id, captures):
+    """Add quality scores from {asset_id: (seconds after BASE_TIME, overall_quality)}."""
+    for asset_id, (seconds, quality) in captures.items():
+        db_session.add(models.AssetQualityScore(
+            immich_asset_id=asset_id, import_batch_id=batch_id, overall_quality=quality,
+            captured_at=BASE_TIME + timedelta(seconds=seconds)
+        ))
+    db_session.commit()
+
+
+def _index(db_session, batch_id, detector):
+    update_burst_index(db_session, batch_id, detector, BurstScorer())
+    db_session.commit()
+
+
+def _bursts(db_session):
+    return sorted(
+        (sorted(burst.immich_asset_ids), burst.recommended_asset_id, burst.import_batch_id)
+        for burst in db_session.query(models.BurstSequence)
+    )
+
+
+def test_burst_straddling_batches_extends_existing_burst(db_session, detector):
+    first, second = _batch(db_session), _batch(db_session)
+    _score(db_session, first, {"a": (0, 50.0), "b": (1, 60.0), "lone": (100, 50.0)})
+    _index(db_session, first, detector)
+    burst_id = db_session.query(models.BurstSequence.id).scalar()
+
+    _score(db_session, second, {"c": (2.5, 90.0), "d": (3, 10.0)})
+    _index(db_session, second, detector)
+
+    assert _bursts(db_session) == [(["a", "b", "c", "d"], "c", first)]
+    assert db_session.query(models.BurstSequence.id).scalar() == burst_id
+    entries = db_session.query(models.BurstTimelineEntry).filter_by(burst_sequence_id=burst_id).count()
+    assert entries == 4
+
+
+def test_open_tail_becomes_burst_with_next_batch(db_session, detector):
+    first, second = _batch(db_session), _batch(db_session)
+    _score(db_session, first, {"a": (0, 50.0)})
+    _index(db_session, first, detector)
+    assert _bursts(db_session) == []
+
+    _score(db_session, second, {"b": (1.5, 40.0)})
+    _index(db_session, second, detector)
+
+    assert _bursts(db_session) == [(["a", "b"], "a", second)]
+
+
+def test_batch_bridging_two_bursts_merges_them(db_session, detector):
+    first, second = _batch(db_session), _batch(db_session)
+    _score(db_session, first, {"a": (0, 10.0), "b": (1, 20.0), "c": (10, 30.0), "d": (11, 40.0)})
+    _index(db_session, first, detector)
+    assert len(_bursts(db_session)) == 2
+
+    _score(db_session, second, {"e": (3, 50.0), "f": (5, 50.0), "g": (7, 50.0), "h": (9, 50.0)})
+    _index(db_session, second, detector)
+
+    assert _bursts(db_session) == [(["a", "b", "c", "d", "e", "f", "g", "h"], "e", first)]
+    assert db_session.query(models.BurstTimelineEntry).filter(
+        models.BurstTimelineEntry.burst_sequence_id.is_(None)
+    ).count() == 0
+
+
+def test_users_have_separate_timelines(db_session, detector):
+    first, second = _batch(db_session, "user-1"), _batch(db_session, "user-2")
+    _score(db_session, first, {"a": (0, 50.0)})
+    _score(db_session, second, {"b": (1, 50.0)})
+    _index(db_session, first, detector)
+    _index(db_session, second, detector)
+
+    assert _bursts(db_session) == []
+
+
+def test_reindexing_batch_drops_assets_no_longer_scored(db_session, detector):
+    first, second = _batch(db_session), _batch(db_session)
+    _score(db_session, first, {"a": (0, 50.0), "b": (1, 60.0)})
+    _score(db_session, second, {"c": (2, 70.0), "d": (50, 10.0), "e": (51, 20.0)})
+    _index(db_session, first, detector)
+    _index(db_session, second, detector)
+    assert len(_bursts(db_session)) == 2
+
+    # Re-analysis from scratch of the second batch scored only d
+    db_session.query(models.AssetQualityScore).filter(
+        models.AssetQualityScore.immich_asset_id.in_(["c", "e"])
+    ).delete(synchronize_session=False)
+    db_session.commit()
+    _index(db_session, second, detector)
+
+    assert _bursts(db_session) == [(["a", "b"], "b", first)]
+    assert sorted(entry.immich_asset_id for entry in db_session.query(models.BurstTimelineEntry)) == ["a", "b", "d"]
+
+
+def test_reindexing_batch_without_scores_removes_its_bursts(db_session, detector):
+    batch = _batch(db_session)
+    _score(db_session, batch, {"a": (0, 50.0), "b": (1, 60.0)})
+    _index(db_session, batch, detector)
+
+    db_session.query(models.AssetQualityScore).delete()
+    db_session.commit()
+    with patch("src.crud.LOOKUP_CHUNK_SIZE", 1):
+        _index(db_session, batch, detector)
+
+    assert _bursts(db_session) == []
+    assert db_session.query(models.BurstTimelineEntry).count() == 0
+
+
+def test_reindexing_refreshes_recommendation(db_session, detector):
+    batch = _batch(db_session)
+    _score(db_session, batch, {"a": (0, 50.0), "b": (1, 60.0)})
+    _index(db_session, batch, detector)
+
+    db_session.query(models.AssetQualityScore).filter_by(immich_asset_id="a").update({'overall_quality': 90.0})
+    db_session.commit()
+    _index(db_session, batch, detector)
+
+    assert _bursts(db_session) == [(["a", "b"], "a", batch)]
+
+
+def test_refresh_recommendations_matches_reindexing(db_session, detector):
+    """The set-based refresh picks the same best shots as re-detecting the bursts"""
+    first, second = _batch(db_session), _batch(db_session)
+    _score(db_session, first, {"a": (0, 50.0), "b": (1, 60.0), "c": (10, 30.0), "d": (11, 30.0)})
+    _score(db_session, second, {"e": (2, 40.0), "f": (12, 20.0)})
+    _index(db_session, first, detector)
+    _index(db_session, second, detector)
+    # The burst spanning both batches moves to the other batch's shot; the
+    # other one ties, which goes to the earliest shot
+    db_session.query(models.AssetQualityScore).filter_by(immich_asset_id="e").update({'overall_quality': 95.0})
+    db_session.query(models.AssetQualityScore).filter_by(immich_asset_id="f").update({'overall_quality': 30.0})
+    db_session.commit()
+
+    assert refresh_recommendations(db_session) == 2
+    db_session.commit()
+    refreshed = _bursts(db_session)
+    _index(db_session, first, detector)
+    _index(db_session, second, detector)
+
+    assert refreshed == _bursts(db_session) == [(["a", "b", "e"], "e", first), (["c", "d", "f"], "c", first)]
+
+
+def test_refresh_recommendations_treats_missing_scores_as_zero(db_session, detector):
+    batch = _batch(db_session)
+    _score(db_session, batch, {"a": (0, None), "b": (1, 0.0)})
+    _index(db_session, batch, detector)
+    burst = db_session.query(models.BurstSequence).one()
+    burst.recommended_asset_id = "b"
+    db_session.commit()
+
+    refresh_recommendations(db_session)
+    db_session.commit()
+
+    assert _bursts(db_session) == [(["a", "b"], "a", batch)]
+
+
+def test_bursts_from_before_indexing_are_replaced(db_session, detector):
+    batch = _batch(db_session)
+    db_session.add(models.BurstSequence(import_batch_id=batch, immich_asset_ids=["old-1", "old-2"]))
+    db_session.commit()
+    _score(db_session, batch, {"a": (0, 50.0), "b": (1, 60.0)})
+
+    _index(db_session, batch, detector)
+
+    assert _bursts(db_session) == [(["a", "b"], "b", batch)]
+
+
+def test_load_region_grows_across_short_runs_and_whole_bursts(db_session):
+    batch = _batch(db_session)
+    # A long burst reaching far from the seed, then a run too short to be a burst
+    _score(db_session, batch, {f"burst-{i}": (i * 1.5, 50.0) for i in range(20)})
+    _score(db_session, batch, {"short-1": (-2, 50.0), "short-2": (-4, 50.0), "far": (-10, 50.0)})
+    _index(db_session, batch, BurstDetector(interval_seconds=2.0, min_burst_size=4))
+
+    seeds = np.array([BASE_TIME - timedelta(seconds=6)], dtype="datetime64[us]")
+    region = _load_region(db_session, "user-123", seeds, REACH)
+
+    assert "far" not in {row.immich_asset_id for row in region.values()}
+    assert len(region) == 22
+
+
+def test_load_region_chunks_windows(db_session, detector):
+    batch = _batch(db_session)
+    _score(db_session, batch, {f"asset-{i}": (i * 10, 50.0) for i in range(5)})
+    _index(db_session, batch, detector)
+
+    seeds = np.array([BASE_TIME + timedelta(seconds=i * 10) for i in range(5)], dtype="datetime64[us]")
+    with patch("src.burst_index.WINDOW_CHUNK_SIZE", 2):
+        region = _load_region(db_session, "user-123", seeds, REACH)
+
+    assert len(region) == 5
+
+
+def test_hash_distance_splits_bursts_across_batches(db_session):
+    detector = BurstDetector(interval_seconds=2.0, max_hash_distance=10)
+    first, second = _batch(db_session), _batch(db_session)
+    _score(db_session, first, {"a": (0, 50.0), "b": (1, 60.0)})
+    _score(db_session, second, {"c": (1.5, 70.0), "d": (2, 80.0)})
+    db_session.query(models.AssetQualityScore).update({'perceptual_hash': 0})
+    db_session.query(models.AssetQualityScore).filter(
+        models.AssetQualityScore.immich_asset_id.in_(["c", "d"])
+    ).update({'perceptual_hash': -1}, synchronize_session=False)
+    db_session.commit()
+
+    _index(db_session, first, detector)
+    _index(db_session, second, detector)
+
+    assert _bursts(db_session) == [(["a", "b"], "b", first), (["c", "d"], "d", second)]
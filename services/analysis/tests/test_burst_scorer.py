@@ -1,5 +1,7 @@
 import pytest
+import numpy as np
 from src.burst.scorer import BurstScorer
+from src.burst.detector import BurstRanges
 
 
 @pytest.fixture
@@ -50,3 +52,11 @@ def test_empty_burst_returns_none(burst_scorer):
     best_id = burst_scorer.recommend_best_shot([])
 
     assert best_id is None
+
+
+def test_recommend_best_positions(burst_scorer):
+    quality_scores = np.array([45.0, 85.0, 60.0, 70.0, 70.0])
+    ranges = BurstRanges(order=np.array([2, 0, 1, 4, 3]), starts=np.array([0, 3]), stops=np.array([3, 5]))
+
+    # Ties go to the earlier shot in capture order
+    assert burst_scorer.recommend_best_positions(quality_scores, ranges).tolist() == [1, 4]
@@ -1,4 +1,6 @@
 import os
+import pytest
+from pydantic import ValidationError
 from src.config import Settings
 
 
@@ -24,3 +26,54 @@ def test_settings_defaults():
 
     assert settings.API_PORT == 8002
     assert settings.LOG_LEVEL == "INFO"
+    assert settings.IMMICH_ASSET_RENDITION == "original"
+    # Native scoring, which QUALITY_BLUR_THRESHOLD is calibrated for
+    assert settings.ANALYSIS_WORKING_SIZE == 0
+
+
+def test_settings_rejects_unknown_rendition():
+    os.environ["IMMICH_ASSET_RENDITION"] = "fullsize"
+
+    try:
+        with pytest.raises(ValidationError):
+            Settings()
+    finally:
+        os.environ.pop("IMMICH_ASSET_RENDITION", None)
+
+
+def test_settings_rejects_unknown_oversize_action():
+    os.environ["IMMICH_OVERSIZE_ACTION"] = "truncate"
+
+    try:
+        with pytest.raises(ValidationError):
+            Settings()
+    finally:
+        os.environ.pop("IMMICH_OVERSIZE_ACTION", None)
+
+
+def test_settings_reject_thumbnail_rendition():
+    """Thumbnails are too small to show blur at the original's scale"""
+    os.environ["IMMICH_ASSET_RENDITION"] = "thumbnail"
+
+    try:
+        with pytest.raises(ValidationError):
+            Settings()
+    finally:
+        os.environ.pop("IMMICH_ASSET_RENDITION", None)
+
+
+@pytest.mark.parametrize("variable,value", [("ANALYSIS_CASCADE", "true"), ("IMMICH_ASSET_RENDITION", "preview")])
+@pytest.mark.parametrize("working_size,valid", [("1440", True), ("1024", True), ("0", False), ("2048", False)])
+def test_settings_preview_scoring_needs_working_size_within_preview(variable, value, working_size, valid):
+    os.environ[variable] = value
+    os.environ["ANALYSIS_WORKING_SIZE"] = working_size
+
+    try:
+        if valid:
+            assert Settings().ANALYSIS_WORKING_SIZE == int(working_size)
+        else:
+            with pytest.raises(ValidationError, match="IMMICH_PREVIEW_SIZE"):
+                Settings()
+    finally:
+        os.environ.pop(variable, None)
+        os.environ.pop("ANALYSIS_WORKING_SIZE", None)
@@ -1,9 +1,13 @@
 import pytest
 from PIL import Image
 import io
+import mmap
+import numpy as np
 import tempfile
 import os
+from unittest.mock import patch
 from src.quality.corruption_detector import CorruptionDetector
+from src.quality.structure import STRUCTURE_UNKNOWN
 
 
 @pytest.fixture
@@ -73,3 +77,118 @@ def test_detect_corrupted_image_file_path(corruption_detector):
         assert is_corrupted is True
     finally:
         os.unlink(tmp_path)
+
+
+def test_decode_returns_loaded_image(corruption_detector, valid_image_bytes):
+    img = corruption_detector.decode(valid_image_bytes)
+
+    assert isinstance(img, Image.Image)
+    assert img.size == (100, 100)
+
+
+def test_decode_returns_none_for_truncated_image(corruption_detector, valid_image_bytes):
+    assert corruption_detector.decode(valid_image_bytes[:len(valid_image_bytes) // 2]) is None
+
+
+def test_decode_opens_image_once(corruption_detector, valid_image_bytes):
+    with patch("src.quality.corruption_detector.Image.open", wraps=Image.open) as mock_open:
+        corruption_detector.is_corrupted(valid_image_bytes, full_decode=True)
+
+    assert mock_open.call_count == 1
+
+
+def test_is_corrupted_skips_decode_for_valid_structure(corruption_detector, valid_image_bytes):
+    with patch("src.quality.corruption_detector.Image.open") as mock_open:
+        assert corruption_detector.is_corrupted(valid_image_bytes) is False
+
+    mock_open.assert_not_called()
+
+
+def test_is_corrupted_rejects_truncation_without_decoding(corruption_detector, valid_image_bytes):
+    with patch("src.quality.corruption_detector.Image.open") as mock_open:
+        assert corruption_detector.is_corrupted(valid_image_bytes[:-10]) is True
+
+    mock_open.assert_not_called()
+
+
+def test_is_corrupted_full_decode_catches_damaged_scan_data(corruption_detector, valid_image_bytes):
+    # Segment lengths intact, but the Huffman table counts are garbage
+    dht = valid_image_bytes.index(b'\xff\xc4')
+    damaged = valid_image_bytes[:dht + 5] + b'\xff' * 16 + valid_image_bytes[dht + 21:]
+
+    assert corruption_detector.is_corrupted(damaged) is False
+    assert corruption_detector.is_corrupted(damaged, full_decode=True) is True
+
+
+def test_detect_empty_file_path(corruption_detector, tmp_path):
+    path = tmp_path / "empty.jpg"
+    path.write_bytes(b'')
+
+    assert corruption_detector.is_corrupted(str(path)) is True
+
+
+def test_detect_missing_file_path(corruption_detector, tmp_path):
+    assert corruption_detector.is_corrupted(str(tmp_path / "missing.jpg")) is True
+
+
+def test_check_structure_of_file_object_is_unknown(corruption_detector, valid_image_bytes):
+    assert corruption_detector.check_structure(io.BytesIO(valid_image_bytes)) == STRUCTURE_UNKNOWN
+
+
+def test_decode_rejects_truncated_mmap(corruption_detector, valid_image_bytes, tmp_path):
+    path = tmp_path / "truncated.jpg"
+    path.write_bytes(valid_image_bytes[:-10])
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        with patch("src.quality.corruption_detector.Image.open") as mock_open:
+            assert corruption_detector.decode(mapped) is None
+
+    mock_open.assert_not_called()
+
+
+@pytest.mark.parametrize("format", ["JPEG", "PNG"])
+def test_decode_memoryview_in_place(corruption_detector, format):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), color='blue').save(buffer, format=format)
+    data = bytearray(buffer.getvalue())
+
+    with memoryview(data) as view:
+        assert corruption_detector.check_structure(view) != STRUCTURE_UNKNOWN
+        img = corruption_detector.decode(view)
+
+    assert img.size == (64, 48)
+    # The view is released, so the buffer can be resized again
+    data.extend(b'\x00')
+
+
+def test_decode_rejects_truncated_memoryview(corruption_detector, valid_image_bytes):
+    with memoryview(valid_image_bytes[:-10]) as view:
+        assert corruption_detector.decode(view) is None
+
+
+@pytest.fixture
+def large_jpeg_bytes():
+    img = np.random.randint(0, 255, (2000, 3000, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_decode_with_target_size_uses_dct_scaling(corruption_detector, large_jpeg_bytes):
+    img = corruption_detector.decode(large_jpeg_bytes, target_size=700)
+
+    # 1/4 scale is the coarsest that still covers a 700px long edge
+    assert img.size == (750, 500)
+    assert img.mode == "L"
+
+
+def test_decode_with_target_size_detects_truncation(corruption_detector, large_jpeg_bytes):
+    truncated = large_jpeg_bytes[:len(large_jpeg_bytes) // 2]
+    assert corruption_detector.decode(truncated, target_size=700) is None
+
+
+def test_decode_with_target_size_keeps_small_images(corruption_detector, valid_image_bytes):
+    img = corruption_detector.decode(valid_image_bytes, target_size=700)
+
+    assert img.size == (100, 100)
+    assert img.mode == "RGB"
@@ -0,0 +1,456 @@
+"""Tests for CRUD operations."""
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from src import models, crud
+from src.quality.scorer import QualityScorer
+
+
+def _result(overall_quality, is_corrupted=False):
+    return {
+        'blur_score': overall_quality,
+        'exposure_score': overall_quality,
+        'overall_quality': overall_quality,
+        'is_corrupted': is_corrupted,
+        'laplacian_variance': overall_quality * 2,
+        'working_long_edge': 1440,
+        'mean_brightness': 128.0,
+        'brightness_std': 50.0,
+        'perceptual_hash': -2 ** 63 + int(overall_quality)
+    }
+
+
+def test_store_and_get_cached_results(db_session):
+    crud.store_cached_results(db_session, "v1", {"sha1-a": _result(72.5)})
+    db_session.commit()
+
+    cached = crud.get_cached_results(db_session, ["sha1-a", "sha1-missing"], "v1")
+
+    assert cached == {"sha1-a": _result(72.5)}
+
+
+def test_get_cached_results_filters_by_version(db_session):
+    crud.store_cached_results(db_session, "v1", {"sha1-a": _result(72.5)})
+    db_session.commit()
+
+    assert crud.get_cached_results(db_session, ["sha1-a"], "v2") == {}
+
+
+def test_store_cached_results_keeps_existing_entry(db_session):
+    crud.store_cached_results(db_session, "v1", {"sha1-a": _result(10.0)})
+    crud.store_cached_results(db_session, "v1", {"sha1-a": _result(90.0)})
+    db_session.commit()
+
+    rows = db_session.query(models.QualityResultCache).all()
+    assert len(rows) == 1
+    assert rows[0].overall_quality == 10.0
+
+
+def test_get_cached_results_chunks_lookups(db_session):
+    crud.store_cached_results(db_session, "v1", {f"sha1-{i}": _result(float(i)) for i in range(5)})
+    db_session.commit()
+
+    with patch("src.crud.LOOKUP_CHUNK_SIZE", 2):
+        cached = crud.get_cached_results(db_session, [f"sha1-{i}" for i in range(5)] * 2, "v1")
+
+    assert sorted(cached) == [f"sha1-{i}" for i in range(5)]
+
+
+def test_get_cached_results_empty(db_session):
+    assert crud.get_cached_results(db_session, [], "v1") == {}
+
+
+def test_insert_uses_postgresql_dialect():
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+
+    statement = crud._insert(db, models.QualityResultCache)
+
+    assert statement.__module__.startswith("sqlalchemy.dialects.postgresql")
+
+
+def _score_row(batch_id, asset_id, overall_quality):
+    return {
+        'immich_asset_id': asset_id,
+        'import_batch_id': batch_id,
+        'overall_quality': overall_quality,
+        'is_corrupted': False,
+        'captured_at': datetime(2025, 1, 1, 12, 0, 0)
+    }
+
+
+def test_upsert_quality_scores_overwrites_existing_rows(db_session):
+    batch = _batch(db_session)
+    crud.upsert_quality_scores(db_session, [_score_row(batch.id, "asset-1", 10.0), _score_row(batch.id, "asset-2", 20.0)])
+    crud.upsert_quality_scores(db_session, [_score_row(batch.id, "asset-1", 90.0)])
+    db_session.commit()
+
+    rows = db_session.query(models.AssetQualityScore).order_by(models.AssetQualityScore.immich_asset_id).all()
+    assert [(row.immich_asset_id, row.overall_quality) for row in rows] == [("asset-1", 90.0), ("asset-2", 20.0)]
+    assert rows[0].captured_at == datetime(2025, 1, 1, 12, 0, 0)
+
+
+def test_upsert_quality_scores_single_executemany(db_session):
+    batch = _batch(db_session)
+    rows = [_score_row(batch.id, f"asset-{i}", float(i)) for i in range(5)]
+
+    with patch.object(db_session, "execute", wraps=db_session.execute) as execute:
+        crud.upsert_quality_scores(db_session, rows)
+
+    execute.assert_called_once()
+    assert db_session.query(models.AssetQualityScore).count() == 5
+
+
+def test_upsert_quality_scores_empty(db_session):
+    with patch.object(db_session, "execute") as execute:
+        crud.upsert_quality_scores(db_session, [])
+    execute.assert_not_called()
+
+
+def test_store_cached_results_bulk(db_session):
+    crud.store_cached_results(db_session, "v1", {"sha1-a": _result(10.0), "sha1-b": _result(20.0)})
+    db_session.commit()
+
+    assert crud.get_cached_results(db_session, ["sha1-a", "sha1-b"], "v1") == {
+        "sha1-a": _result(10.0), "sha1-b": _result(20.0)
+    }
+
+
+def _fake_score_features_sql(laplacian_variance, working_long_edge, mean_brightness, brightness_std):
+    return {
+        'blur_score': laplacian_variance / 10,
+        'exposure_score': mean_brightness / 2,
+        'overall_quality': brightness_std
+    }
+
+
+def test_rescore_quality_results_from_features(db_session):
+    batch = _batch(db_session)
+    rng = np.random.default_rng(0)
+    rows = [
+        dict(_score_row(batch.id, f"asset-{i}", 1.0), laplacian_variance=float(rng.uniform(0, 400)),
+             working_long_edge=int(rng.choice([160, 1440, 4000])), mean_brightness=float(rng.uniform(0, 255)),
+             brightness_std=float(rng.uniform(0, 90)))
+        for i in range(50)
+    ]
+    # Corrupted, and scored before features were stored: both left alone
+    rows.append(dict(_score_row(batch.id, "corrupted", 0.0), laplacian_variance=None,
+                     working_long_edge=None, mean_brightness=None, brightness_std=None))
+    crud.upsert_quality_scores(db_session, rows)
+    db_session.commit()
+    scorer = QualityScorer(working_size=1440, blur_threshold=150.0, blur_weight=0.7)
+
+    with patch.object(db_session, "execute", wraps=db_session.execute) as execute:
+        rescored = crud.rescore_quality_results(db_session, models.AssetQualityScore, scorer.score_features_sql)
+    db_session.commit()
+
+    # One set-based UPDATE, matching the scores computed in Python
+    assert rescored == 50
+    assert execute.call_count == 1
+    expected = scorer.score_features(*([row[feature] for row in rows[:-1]] for feature in crud.QUALITY_FEATURES))
+    scores = {row.immich_asset_id: row for row in db_session.query(models.AssetQualityScore).all()}
+    for column in ('blur_score', 'exposure_score', 'overall_quality'):
+        assert [getattr(scores[row['immich_asset_id']], column) for row in rows[:-1]] == pytest.approx(expected[column])
+    assert (scores["corrupted"].blur_score, scores["corrupted"].overall_quality) == (None, 0.0)
+
+
+def test_rescore_expressions_use_least_and_greatest_on_postgresql():
+    columns = [getattr(models.AssetQualityScore, feature) for feature in crud.QUALITY_FEATURES]
+    scores = QualityScorer(working_size=1440).score_features_sql(*columns)
+
+    sql = str(scores['overall_quality'].compile(dialect=postgresql.dialect()))
+
+    assert "least(" in sql and "greatest(" in sql
+    assert "min(" not in sql and "CASE" not in sql
+
+
+def test_rescore_quality_results_in_cache(db_session):
+    crud.store_cached_results(db_session, "v1", {"sha1-a": _result(10.0), "sha1-b": _result(40.0)})
+    db_session.commit()
+
+    assert crud.rescore_quality_results(db_session, models.QualityResultCache, _fake_score_features_sql) == 2
+    db_session.commit()
+
+    cached = crud.get_cached_results(db_session, ["sha1-a", "sha1-b"], "v1")
+    assert cached["sha1-b"]['blur_score'] == 8.0
+    assert cached["sha1-b"]['laplacian_variance'] == 80.0
+
+
+def test_get_stale_quality_scores_pages_by_key(db_session):
+    batch = _batch(db_session)
+    versions = [None, "v1", "v2", "v1", None]
+    crud.upsert_quality_scores(db_session, [
+        dict(_score_row(batch.id, f"asset-{i}", 50.0), analyzer_version=version)
+        for i, version in enumerate(versions)
+    ])
+    db_session.commit()
+
+    assert crud.count_stale_quality_scores(db_session, "v2") == 4
+
+    first = crud.get_stale_quality_scores(db_session, "v2", limit=3)
+    rest = crud.get_stale_quality_scores(db_session, "v2", after_id=first[-1].id, limit=3)
+    assert len(first) == 3
+    assert len(rest) == 1
+    stale = {row.immich_asset_id for row in first + rest}
+    assert stale == {"asset-0", "asset-1", "asset-3", "asset-4"}
+    assert crud.get_stale_quality_scores(db_session, "v2", after_id=rest[-1].id) == []
+
+
+def test_upsert_quality_scores_postgresql_statement():
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+
+    crud.upsert_quality_scores(db, [_score_row("batch-1", "asset-1", 50.0)])
+
+    statement, rows = db.execute.call_args.args
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert rows[0]['immich_asset_id'] == "asset-1"
+    assert "ON CONFLICT (immich_asset_id, import_batch_id) DO UPDATE" in sql
+    assert "overall_quality = excluded.overall_quality" in sql
+
+
+def _batch(db_session, status="processing", heartbeat_at=None, started=True):
+    batch = models.ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=["asset-1"],
+        status=status,
+        total_assets=1,
+        analyzed_assets=0,
+        skipped_assets=0,
+        started_at=datetime.utcnow() if started else None,
+        heartbeat_at=heartbeat_at
+    )
+    db_session.add(batch)
+    db_session.commit()
+    return batch
+
+
+def test_claim_interrupted_batches_claims_stale_batches_once(db_session):
+    now = datetime.utcnow()
+    stale = _batch(db_session, heartbeat_at=now - timedelta(minutes=10))
+    _batch(db_session, heartbeat_at=now)
+    _batch(db_session, status="complete", heartbeat_at=now - timedelta(minutes=10))
+    _batch(db_session, heartbeat_at=now - timedelta(minutes=10), started=False)
+
+    cutoff = now - timedelta(minutes=2)
+    assert crud.claim_interrupted_batches(db_session, cutoff) == [stale.id]
+    # The claim refreshed the heartbeat, so a second watcher finds nothing
+    assert crud.claim_interrupted_batches(db_session, cutoff) == []
+
+
+def test_claim_interrupted_batches_loses_race(db_session):
+    stale = _batch(db_session, heartbeat_at=datetime.utcnow() - timedelta(minutes=10))
+    original_query = db_session.query
+
+    def query(*entities):
+        result = original_query(*entities)
+        if entities == (models.ImportBatch,):
+            # Another instance claims the batch between the scan and the update
+            original_query(models.ImportBatch).filter_by(id=stale.id).update(
+                {models.ImportBatch.heartbeat_at: datetime.utcnow()}
+            )
+        return result
+
+    with patch.object(db_session, "query", side_effect=query):
+        assert crud.claim_interrupted_batches(db_session, datetime.utcnow() - timedelta(minutes=2)) == []
+
+
+def test_claim_reanalysis_job_once(db_session):
+    now = datetime.utcnow()
+    cutoff = now - timedelta(minutes=2)
+    assert crud.get_reanalysis_job(db_session) is None
+
+    assert crud.claim_reanalysis_job(db_session, "v2", cutoff)
+    # The job is running with a fresh heartbeat, so a second instance loses
+    assert not crud.claim_reanalysis_job(db_session, "v2", cutoff)
+    job = crud.get_reanalysis_job(db_session)
+    assert (job.status, job.analyzer_version) == ("running", "v2")
+
+
+def test_claim_reanalysis_job_after_finish_or_death(db_session):
+    now = datetime.utcnow()
+    assert crud.claim_reanalysis_job(db_session, "v2", now)
+    crud.update_reanalysis_job(db_session, {'status': "failed", 'error_message': "Immich is down", 'failed_assets': 3})
+    db_session.commit()
+
+    assert crud.claim_reanalysis_job(db_session, "v3", now)
+    db_session.expire_all()
+    job = crud.get_reanalysis_job(db_session)
+    assert (job.status, job.analyzer_version, job.failed_assets, job.error_message) == ("running", "v3", 0, None)
+    # The instance running it died
+    assert crud.claim_reanalysis_job(db_session, "v3", datetime.utcnow() + timedelta(minutes=1))
+
+
+def test_upsert_burst_timeline_entries_moves_asset(db_session):
+    first, second = _batch(db_session), _batch(db_session)
+    captured_at = datetime(2025, 1, 1, 12, 0, 0)
+    burst = models.BurstSequence(import_batch_id=first.id, immich_asset_ids=["asset-1"])
+    db_session.add(burst)
+    db_session.commit()
+    crud.upsert_burst_timeline_entries(db_session, [
+        {'immich_user_id': "user-123", 'immich_asset_id': "asset-1", 'import_batch_id': first.id, 'captured_at': captured_at}
+    ])
+    db_session.query(models.BurstTimelineEntry).update({'burst_sequence_id': burst.id})
+
+    crud.upsert_burst_timeline_entries(db_session, [
+        {'immich_user_id': "user-123", 'immich_asset_id': "asset-1", 'import_batch_id': second.id,
+         'captured_at': captured_at + timedelta(seconds=1)}
+    ])
+    crud.upsert_burst_timeline_entries(db_session, [])
+    db_session.commit()
+
+    entry = db_session.query(models.BurstTimelineEntry).one()
+    assert entry.import_batch_id == second.id
+    assert entry.captured_at == captured_at + timedelta(seconds=1)
+    # Burst membership is left to re-detection
+    assert entry.burst_sequence_id == burst.id
+
+
+def test_lock_burst_index_postgresql():
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+
+    crud.lock_burst_index(db, "user-123")
+
+    statement, params = db.execute.call_args.args
+    assert "pg_advisory_xact_lock" in str(statement)
+    assert params == {'user_id': "user-123"}
+
+
+def test_lock_burst_index_sqlite(db_session):
+    with patch.object(db_session, "execute") as mock_execute:
+        crud.lock_burst_index(db_session, "user-123")
+
+    mock_execute.assert_not_called()
+
+
+def _shards(db_session, batch, *statuses):
+    crud.create_batch_shards(db_session, batch.id, [[f"asset-{index}"] for index in range(len(statuses))])
+    shards = db_session.query(models.BatchShard).order_by(models.BatchShard.shard_index).all()
+    for shard, status in zip(shards, statuses):
+        shard.status = status
+    db_session.commit()
+    return shards
+
+
+def test_claim_batch_shard_in_order_once(db_session):
+    batch = _batch(db_session)
+    now = datetime.utcnow()
+    complete, stale, running, pending = _shards(db_session, batch, "complete", "processing", "processing", "pending")
+    stale.heartbeat_at = now - timedelta(minutes=10)
+    running.heartbeat_at = now
+    db_session.commit()
+
+    cutoff = now - timedelta(minutes=2)
+    assert crud.claim_batch_shard(db_session, cutoff) == stale.id
+    assert crud.claim_batch_shard(db_session, cutoff, batch.id) == pending.id
+    assert crud.claim_batch_shard(db_session, cutoff) is None
+    db_session.expire_all()
+    assert pending.status == "processing"
+    assert pending.heartbeat_at is not None
+
+
+def test_claim_batch_shard_skips_other_and_stopped_batches(db_session):
+    failed = _batch(db_session, status="failed")
+    other = _batch(db_session)
+    _shards(db_session, failed, "pending")
+
+    assert crud.claim_batch_shard(db_session, datetime.utcnow()) is None
+    assert crud.claim_batch_shard(db_session, datetime.utcnow(), other.id) is None
+
+
+def test_claim_batch_shard_loses_race(db_session):
+    shard, = _shards(db_session, _batch(db_session), "pending")
+    original_query = db_session.query
+
+    def query(*entities):
+        result = original_query(*entities)
+        if entities == (models.BatchShard,):
+            # Another instance claims the shard between the scan and the update
+            original_query(models.BatchShard).filter_by(id=shard.id).update(
+                {models.BatchShard.status: "processing", models.BatchShard.heartbeat_at: datetime.utcnow()}
+            )
+        return result
+
+    with patch.object(db_session, "query", side_effect=query):
+        assert crud.claim_batch_shard(db_session, datetime.utcnow() - timedelta(minutes=2)) is None
+
+
+def test_retry_failed_shards(db_session):
+    batch = _batch(db_session)
+    failed, complete = _shards(db_session, batch, "failed", "complete")
+
+    crud.retry_failed_shards(db_session, batch.id)
+    db_session.commit()
+
+    db_session.expire_all()
+    assert (failed.status, complete.status) == ("pending", "complete")
+
+
+def test_sync_sharded_batch_progress(db_session):
+    batch = _batch(db_session)
+    first, second = _shards(db_session, batch, "complete", "processing")
+    first.analyzed_assets, first.skipped_assets = 3, 1
+    # Unflushed progress counts too
+    second.analyzed_assets = 2
+
+    crud.sync_sharded_batch_progress(db_session, batch.id)
+    db_session.commit()
+
+    db_session.expire_all()
+    assert (batch.analyzed_assets, batch.skipped_assets) == (5, 1)
+
+
+def test_complete_sharded_batch_waits_for_all_shards(db_session):
+    batch = _batch(db_session)
+    first, second = _shards(db_session, batch, "complete", "processing")
+    first.analyzed_assets = second.analyzed_assets = 1
+
+    assert not crud.complete_sharded_batch(db_session, batch.id)
+    second.status = "complete"
+    assert crud.complete_sharded_batch(db_session, batch.id)
+    # Only one caller completes the batch
+    assert not crud.complete_sharded_batch(db_session, batch.id)
+
+    db_session.expire_all()
+    assert (batch.status, batch.analyzed_assets) == ("complete", 2)
+
+
+def test_get_scored_asset_ids(db_session):
+    batch = _batch(db_session)
+    db_session.add(models.AssetQualityScore(immich_asset_id="asset-1", import_batch_id=batch.id))
+    db_session.commit()
+
+    with patch("src.crud.LOOKUP_CHUNK_SIZE", 1):
+        assert crud.get_scored_asset_ids(db_session, batch.id, ["asset-1", "asset-2"]) == {"asset-1"}
+
+
+def test_add_triage_stats_accumulates(db_session):
+    batch = _batch(db_session)
+
+    crud.add_triage_stats(db_session, batch.id, {"corrupted": (1, 100)})
+    crud.add_triage_stats(db_session, batch.id, {"corrupted": (2, 50), "low_quality": (1, 10)})
+    crud.add_triage_stats(db_session, batch.id, {})
+    db_session.commit()
+
+    rows = db_session.query(models.BatchTriageStats).order_by(models.BatchTriageStats.category_type).all()
+    assert [(row.category_type, row.count, row.estimated_savings_bytes) for row in rows] == [
+        ("corrupted", 3, 150), ("low_quality", 1, 10)
+    ]
+
+
+def test_replace_triage_stats(db_session):
+    batch, other = _batch(db_session), _batch(db_session)
+    crud.add_triage_stats(db_session, batch.id, {"corrupted": (1, 100)})
+    crud.add_triage_stats(db_session, other.id, {"corrupted": (1, 100)})
+
+    crud.replace_triage_stats(db_session, batch.id, {"low_quality": (2, 20)})
+    crud.replace_triage_stats(db_session, other.id, {})
+    db_session.commit()
+
+    rows = db_session.query(models.BatchTriageStats).all()
+    assert [(row.import_batch_id, row.category_type, row.count) for row in rows] == [(batch.id, "low_quality", 2)]
@@ -51,3 +51,9 @@ def test_get_db_closes_on_exception():
             pass
 
         mock_session.close.assert_called_once()
+
+
+def test_get_session_factory_returns_sessionmaker():
+    """Test that background jobs get the configured session factory."""
+    from src.database import get_session_factory
+    assert get_session_factory() is SessionLocal
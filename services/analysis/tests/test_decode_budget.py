@@ -0,0 +1,177 @@
+import asyncio
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.decode_budget import (
+    DECODED_BYTES_PER_PIXEL,
+    WORKING_BYTES_PER_PIXEL,
+    DecodeBudget,
+    estimate_decode_bytes,
+    read_image_header,
+)
+
+
+def test_estimate_small_image_at_native_resolution():
+    assert estimate_decode_bytes(100, 50, working_size=1440) == 5000 * (DECODED_BYTES_PER_PIXEL + WORKING_BYTES_PER_PIXEL)
+    assert estimate_decode_bytes(100, 50) == 5000 * (DECODED_BYTES_PER_PIXEL + WORKING_BYTES_PER_PIXEL)
+
+
+def test_working_bytes_cover_scoring_buffers():
+    gray = np.zeros((1080, 1440), dtype=np.uint8)
+    laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+    rgb_frame_bytes = 4 * gray.size
+
+    assert rgb_frame_bytes + gray.nbytes + laplacian.nbytes == gray.size * WORKING_BYTES_PER_PIXEL
+
+
+def test_estimate_full_decode_then_downscale():
+    estimate = estimate_decode_bytes(4000, 3000, working_size=1000)
+    assert estimate == 4000 * 3000 * DECODED_BYTES_PER_PIXEL + 1000 * 750 * WORKING_BYTES_PER_PIXEL
+
+
+def test_estimate_reduced_jpeg_decode():
+    # 1/4 scale is the coarsest that covers a 1000px long edge
+    estimate = estimate_decode_bytes(4000, 3000, working_size=1000, reduced_jpeg=True)
+    assert estimate == 1000 * 750 + 1000 * 750 * WORKING_BYTES_PER_PIXEL
+
+
+def test_estimate_reduced_jpeg_decode_stops_at_eighth_scale():
+    estimate = estimate_decode_bytes(16000, 8000, working_size=100, reduced_jpeg=True)
+    assert estimate == 2000 * 1000 + 100 * 50 * WORKING_BYTES_PER_PIXEL
+
+
+def test_estimate_grows_with_megapixels():
+    assert estimate_decode_bytes(20000, 5000, working_size=1440) > 3 * estimate_decode_bytes(6000, 4000, working_size=1440)
+
+
+def test_read_image_header(tmp_path):
+    buffer = io.BytesIO()
+    Image.new('RGB', (120, 80)).save(buffer, format='JPEG')
+    path = tmp_path / "image.png"
+    Image.new('RGB', (30, 20)).save(path, format='PNG')
+
+    assert read_image_header(buffer.getvalue()) == (120, 80, True)
+    assert read_image_header(bytearray(buffer.getvalue())) == (120, 80, True)
+    assert read_image_header(str(path)) == (30, 20, False)
+    assert read_image_header(b"not an image") is None
+    with pytest.raises(FileNotFoundError):
+        read_image_header(str(tmp_path / "missing.jpg"))
+
+
+@pytest.mark.asyncio
+async def test_reservations_within_budget_are_immediate():
+    budget = DecodeBudget(100)
+    async with budget.reserve(60):
+        async with budget.reserve(40):
+            assert budget.in_use == 100
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_unlimited_budget_never_waits():
+    budget = DecodeBudget(0)
+    async with budget.reserve(10 ** 12):
+        async with budget.reserve(10 ** 12):
+            assert budget.in_use == 2 * 10 ** 12
+
+
+@pytest.mark.asyncio
+async def test_reservation_waits_for_release():
+    budget = DecodeBudget(100)
+    await budget.acquire(80)
+    waiter = asyncio.ensure_future(budget.acquire(50))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    budget.release(80)
+    await waiter
+    assert budget.in_use == 50
+
+
+@pytest.mark.asyncio
+async def test_oversized_reservation_runs_alone():
+    budget = DecodeBudget(100)
+    await budget.acquire(10)
+    waiter = asyncio.ensure_future(budget.acquire(500))
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    budget.release(10)
+    await waiter
+    assert budget.in_use == 500
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_in_order():
+    budget = DecodeBudget(100)
+    await budget.acquire(100)
+    admitted = []
+
+    async def reserve(name, nbytes):
+        await budget.acquire(nbytes)
+        admitted.append(name)
+
+    large = asyncio.ensure_future(reserve("large", 90))
+    await asyncio.sleep(0)
+    small = asyncio.ensure_future(reserve("small", 10))
+    await asyncio.sleep(0)
+    # The small reservation would fit alongside the large one, but queues behind it
+    assert admitted == []
+
+    budget.release(100)
+    await asyncio.gather(large, small)
+    assert admitted == ["large", "small"]
+    assert budget.in_use == 100
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_is_skipped():
+    budget = DecodeBudget(100)
+    await budget.acquire(100)
+    cancelled = asyncio.ensure_future(budget.acquire(90))
+    await asyncio.sleep(0)
+    waiter = asyncio.ensure_future(budget.acquire(10))
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+    budget.release(100)
+    await waiter
+    assert budget.in_use == 10
+
+
+@pytest.mark.asyncio
+async def test_cancelled_head_waiter_unblocks_the_queue():
+    budget = DecodeBudget(100)
+    await budget.acquire(50)
+    blocked = asyncio.ensure_future(budget.acquire(90))
+    await asyncio.sleep(0)
+    behind = asyncio.ensure_future(budget.acquire(10))
+    await asyncio.sleep(0)
+    assert not behind.done()
+
+    blocked.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await blocked
+    await behind
+    assert budget.in_use == 60
+
+
+@pytest.mark.asyncio
+async def test_waiter_cancelled_after_grant_returns_reservation():
+    budget = DecodeBudget(100)
+    await budget.acquire(100)
+    waiter = asyncio.ensure_future(budget.acquire(40))
+    await asyncio.sleep(0)
+
+    # Granted, then cancelled before it gets to run
+    budget.release(100)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert budget.in_use == 0
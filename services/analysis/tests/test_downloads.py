@@ -0,0 +1,79 @@
+import os
+import httpx
+import pytest
+from src.downloads import DownloadTooLargeError, discard, read_response
+
+
+async def _read(body, declared=True, chunk_size=4, **kwargs):
+    async def stream():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    def handler(request):
+        headers = {"Content-Length": str(len(body))} if declared else {}
+        return httpx.Response(200, headers=headers, content=stream())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        async with client.stream("GET", "http://immich/file") as response:
+            return await read_response(response, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_read_response_in_memory():
+    data = await _read(b"0123456789", spill_threshold=64)
+
+    assert isinstance(data, bytearray)
+    assert data == b"0123456789"
+
+
+@pytest.mark.asyncio
+async def test_read_response_without_content_length():
+    assert await _read(b"0123456789", declared=False) == b"0123456789"
+
+
+@pytest.mark.asyncio
+async def test_read_response_shorter_than_declared():
+    async def stream():
+        yield b"0123"
+
+    def handler(request):
+        return httpx.Response(200, headers={"Content-Length": "10"}, content=stream())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        async with client.stream("GET", "http://immich/file") as response:
+            assert await read_response(response) == b"0123"
+
+
+@pytest.mark.asyncio
+async def test_read_response_spills_large_bodies(tmp_path):
+    path = await _read(b"0123456789", spill_threshold=6, spill_dir=str(tmp_path))
+
+    assert isinstance(path, str)
+    assert os.path.dirname(path) == str(tmp_path)
+    with open(path, "rb") as f:
+        assert f.read() == b"0123456789"
+    discard(path)
+    assert not os.path.exists(path)
+
+
+@pytest.mark.asyncio
+async def test_read_response_rejects_declared_oversize():
+    with pytest.raises(DownloadTooLargeError) as exc_info:
+        await _read(b"0123456789", max_bytes=5)
+
+    assert exc_info.value.size == 10
+    assert exc_info.value.max_bytes == 5
+
+
+@pytest.mark.asyncio
+async def test_read_response_rejects_undeclared_oversize_and_removes_spill(tmp_path):
+    with pytest.raises(DownloadTooLargeError):
+        await _read(b"0123456789", declared=False, max_bytes=9, spill_threshold=2, spill_dir=str(tmp_path))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_discard_ignores_in_memory_and_missing_files(tmp_path):
+    discard(b"bytes")
+    discard(bytearray(b"bytes"))
+    discard(str(tmp_path / "missing.download"))
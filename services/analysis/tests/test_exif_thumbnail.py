@@ -0,0 +1,77 @@
+import io
+import struct
+import pytest
+from PIL import Image
+from src.quality.exif_thumbnail import extract_exif_thumbnail
+
+
+def _jpeg(size=(16, 12)):
+    buffer = io.BytesIO()
+    Image.new("L", size, 128).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _tiff(thumbnail, endian="<", with_ifd1=True):
+    """TIFF structure with an empty IFD0 and an IFD1 pointing at thumbnail."""
+    header = (b"II*\x00" if endian == "<" else b"MM\x00*") + struct.pack(endian + "I", 8)
+    ifd1_offset = 8 + 2 + 4 if with_ifd1 else 0
+    ifd0 = struct.pack(endian + "H", 0) + struct.pack(endian + "I", ifd1_offset)
+    thumbnail_offset = ifd1_offset + 2 + 2 * 12 + 4
+    ifd1 = (
+        struct.pack(endian + "H", 2)
+        + struct.pack(endian + "HHII", 0x0201, 4, 1, thumbnail_offset)
+        + struct.pack(endian + "HHII", 0x0202, 4, 1, len(thumbnail))
+        + struct.pack(endian + "I", 0)
+    )
+    return header + ifd0 + (ifd1 + thumbnail if with_ifd1 else b"")
+
+
+def _jpeg_with_exif(tiff):
+    app1 = b"Exif\x00\x00" + tiff
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    return b"\xff\xd8" + app0 + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + _jpeg((640, 480))[2:]
+
+
+@pytest.mark.parametrize("endian", ["<", ">"])
+def test_extracts_thumbnail_from_jpeg(endian):
+    thumbnail = _jpeg()
+    data = _jpeg_with_exif(_tiff(thumbnail, endian))
+
+    extracted = extract_exif_thumbnail(data)
+
+    assert extracted == thumbnail
+    assert Image.open(io.BytesIO(extracted)).size == (16, 12)
+
+
+def test_extracts_thumbnail_from_tiff_based_raw():
+    thumbnail = _jpeg()
+    assert extract_exif_thumbnail(_tiff(thumbnail)) == thumbnail
+
+
+def test_thumbnail_cut_off_by_range():
+    data = _jpeg_with_exif(_tiff(_jpeg()))
+    assert extract_exif_thumbnail(data[:60]) is None
+    assert extract_exif_thumbnail(data[:30]) is None
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"GIF89a",
+    _jpeg(),
+    _jpeg_with_exif(_tiff(_jpeg(), with_ifd1=False)),
+    _jpeg_with_exif(_tiff(b"not a jpeg")),
+    _jpeg_with_exif(b"XX*\x00"),
+    b"\xff\xd8\x00\x00\x00\x00",
+    b"\xff\xd8\xff\xe0\x00\x04\x00\x00",
+])
+def test_no_thumbnail(data):
+    assert extract_exif_thumbnail(data) is None
+
+
+def test_ifd1_without_thumbnail_tags():
+    tiff = bytearray(_tiff(_jpeg()))
+    # Rename both IFD1 tags
+    tiff = tiff.replace(struct.pack("<H", 0x0201), struct.pack("<H", 0x0100)).replace(
+        struct.pack("<H", 0x0202), struct.pack("<H", 0x0101)
+    )
+    assert extract_exif_thumbnail(bytes(tiff)) is None
@@ -94,3 +94,26 @@ def test_exposure_analyzer_with_invalid_channels(exposure_analyzer):
     invalid_image = np.random.normal(128, 30, (100, 100, 2)).clip(0, 255).astype(np.uint8)
     with pytest.raises(ValueError, match="Color images must have 3 or 4 channels"):
         exposure_analyzer.calculate_exposure_score(invalid_image)
+
+
+def test_batch_scores_match_single_image_scores():
+    analyzer = ExposureAnalyzer()
+    frames = np.random.randint(0, 256, (5, 30, 45), dtype=np.uint8)
+    frames[1] = 20  # Underexposed
+    frames[2] = 250  # Overexposed
+
+    batch_scores = analyzer.score_grayscale_batch(frames)
+
+    assert batch_scores.shape == (5,)
+    for frame, score in zip(frames, batch_scores):
+        assert score == pytest.approx(analyzer.score_grayscale(frame))
+
+
+def test_score_from_moments_scalar_and_array():
+    analyzer = ExposureAnalyzer()
+
+    assert analyzer.score_from_moments(128.0, 50.0) == pytest.approx(100.0)
+    assert np.allclose(
+        analyzer.score_from_moments(np.array([128.0, 0.0]), np.array([50.0, 0.0])),
+        [100.0, 0.0]
+    )
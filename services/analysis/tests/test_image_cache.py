@@ -0,0 +1,108 @@
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from src.image_cache import ImageCache, STALE_TEMP_SECONDS
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageCache(str(tmp_path / "cache"), max_bytes=100)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_get_miss(cache):
+    assert cache.get("asset-1", "sha1-a", "original") is None
+
+
+def test_put_and_get_bytes(cache):
+    cache.put("asset-1", "sha1-a", "original", bytearray(b"image-bytes"))
+
+    assert _read(cache.get("asset-1", "sha1-a", "original")) == b"image-bytes"
+
+
+def test_put_copies_spilled_file(cache, tmp_path):
+    spilled = tmp_path / "image.download"
+    spilled.write_bytes(b"spilled-bytes")
+
+    cache.put("asset-1", "sha1-a", "original", str(spilled))
+
+    assert spilled.exists()
+    assert _read(cache.get("asset-1", "sha1-a", "original")) == b"spilled-bytes"
+
+
+def test_entries_keyed_by_checksum_and_rendition(cache):
+    cache.put("asset-1", "sha1-a", "original", b"original")
+
+    assert cache.get("asset-1", "sha1-b", "original") is None
+    assert cache.get("asset-1", "sha1-a", "preview") is None
+
+
+def test_failed_write_leaves_no_partial_files(cache):
+    with pytest.raises(FileNotFoundError):
+        cache.put("asset-1", "sha1-a", "original", "/nonexistent/image.download")
+
+    assert os.listdir(cache.directory) == []
+
+
+def test_evicts_least_recently_used(cache):
+    for i in range(4):
+        cache.put(f"asset-{i}", "sha1", "original", b"x" * 25)
+        path = cache._path(f"asset-{i}", "sha1", "original")
+        os.utime(path, (1000 + i, 1000 + i))
+    # Reading asset-0 makes it the most recently used entry
+    os.utime(cache.get("asset-0", "sha1", "original"), (2000, 2000))
+
+    cache.put("asset-4", "sha1", "original", b"x" * 25)
+
+    remaining = {f"asset-{i}" for i in range(5) if cache.get(f"asset-{i}", "sha1", "original")}
+    assert remaining == {"asset-0", "asset-3", "asset-4"}
+    assert cache._size == 75
+
+
+def test_size_is_scanned_from_existing_entries(cache):
+    cache.put("asset-1", "sha1", "original", b"x" * 40)
+
+    restarted = ImageCache(cache.directory, max_bytes=100)
+    restarted.put("asset-2", "sha1", "original", b"x" * 40)
+
+    assert restarted._size == 80
+
+
+def test_eviction_removes_stale_temp_files(cache):
+    stale = os.path.join(cache.directory, "orphan.tmp")
+    fresh = os.path.join(cache.directory, "writing.tmp")
+    for path in (stale, fresh):
+        with open(path, "wb") as f:
+            f.write(b"partial")
+    os.utime(stale, (0, 0))
+
+    cache.put("asset-1", "sha1", "original", b"x" * 200)
+
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+
+
+def test_eviction_tolerates_concurrent_removal(cache):
+    cache.put("asset-1", "sha1", "original", b"x" * 60)
+    path = cache._path("asset-1", "sha1", "original")
+
+    with patch("src.image_cache.os.unlink", side_effect=FileNotFoundError):
+        cache.put("asset-2", "sha1", "original", b"x" * 60)
+
+    assert os.path.exists(path)
+
+
+def test_scans_skip_entries_removed_by_other_processes(cache):
+    vanished = MagicMock()
+    vanished.name = "vanished.img"
+    vanished.stat.side_effect = FileNotFoundError
+
+    with patch("src.image_cache.os.scandir", return_value=[vanished]):
+        assert cache._scan_size() == 0
+        cache._evict()
+
+    assert cache._size == 0
@@ -0,0 +1,457 @@
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from src import immich
+from src.immich import (
+    CircuitBreaker, ImmichUnavailableError, backoff_delay, create_immich_client,
+    fetch_asset_metadata, fetch_image_from_immich, fetch_metadata_page, fetch_original_head, fetch_original_tail,
+    is_transient,
+    resolve_local_original, with_retries
+)
+
+
+def _mock_immich_client(handler):
+    return httpx.AsyncClient(base_url="http://immich", transport=httpx.MockTransport(handler))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_fetch_asset_metadata_success():
+    def handler(request):
+        assert request.url.path == "/api/asset/asset-1"
+        return httpx.Response(200, json={"id": "asset-1"})
+
+    async with _mock_immich_client(handler) as client:
+        metadata = await fetch_asset_metadata(client, "asset-1")
+
+    assert metadata == {"id": "asset-1"}
+
+
+@pytest.mark.asyncio
+async def test_fetch_asset_metadata_error():
+    async with _mock_immich_client(lambda request: httpx.Response(404)) as client:
+        with pytest.raises(HTTPException) as exc_info:
+            await fetch_asset_metadata(client, "asset-1")
+
+    assert exc_info.value.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_fetch_image_from_immich_success():
+    def handler(request):
+        assert request.url.path == "/api/asset/file/asset-1"
+        assert request.headers["accept"] == "application/octet-stream"
+        return httpx.Response(200, content=b"image-bytes")
+
+    async with _mock_immich_client(handler) as client:
+        image_bytes = await fetch_image_from_immich(client, "asset-1")
+
+    assert image_bytes == b"image-bytes"
+
+
+@pytest.mark.asyncio
+async def test_fetch_image_from_immich_error():
+    async with _mock_immich_client(lambda request: httpx.Response(500)) as client:
+        with pytest.raises(HTTPException) as exc_info:
+            await fetch_image_from_immich(client, "asset-1")
+
+    assert exc_info.value.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_fetch_image_from_immich_transient_errors_are_outages():
+    """Running out of retries on transient errors stops the batch instead of skipping the asset"""
+    async with _mock_immich_client(lambda request: httpx.Response(503)) as client:
+        with pytest.raises(ImmichUnavailableError):
+            await fetch_image_from_immich(client, "asset-1")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("rendition,path,image_format", [
+    ("preview", "/api/asset/thumbnail/asset-1", "JPEG"),
+    ("thumbnail", "/api/asset/thumbnail/asset-1", "WEBP"),
+])
+async def test_fetch_image_from_immich_renditions(rendition, path, image_format):
+    def handler(request):
+        assert request.url.path == path
+        assert request.url.params["format"] == image_format
+        return httpx.Response(200, content=b"resized")
+
+    async with _mock_immich_client(handler) as client:
+        image_bytes = await fetch_image_from_immich(client, "asset-1", rendition=rendition)
+
+    assert image_bytes == b"resized"
+
+
+@pytest.mark.asyncio
+async def test_fetch_image_from_immich_uses_configured_rendition():
+    def handler(request):
+        assert request.url.path == "/api/asset/thumbnail/asset-1"
+        return httpx.Response(200, content=b"preview")
+
+    with patch("src.immich.settings.IMMICH_ASSET_RENDITION", "preview"):
+        async with _mock_immich_client(handler) as client:
+            assert await fetch_image_from_immich(client, "asset-1") == b"preview"
+
+
+@pytest.mark.asyncio
+async def test_fetch_image_from_immich_routes_oversized_original_to_preview():
+    def handler(request):
+        if request.url.path == "/api/asset/file/asset-1":
+            return httpx.Response(200, content=b"x" * 100)
+        return httpx.Response(200, content=b"preview")
+
+    with patch("src.immich.settings.IMMICH_MAX_DOWNLOAD_BYTES", 50):
+        async with _mock_immich_client(handler) as client:
+            assert await fetch_image_from_immich(client, "asset-1") == b"preview"
+
+
+@pytest.mark.asyncio
+async def test_fetch_image_from_immich_skips_oversized_when_configured():
+    with patch("src.immich.settings.IMMICH_MAX_DOWNLOAD_BYTES", 50):
+        with patch("src.immich.settings.IMMICH_OVERSIZE_ACTION", "skip"):
+            async with _mock_immich_client(lambda request: httpx.Response(200, content=b"x" * 100)) as client:
+                with pytest.raises(HTTPException) as exc_info:
+                    await fetch_image_from_immich(client, "asset-1")
+
+    assert exc_info.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_fetch_metadata_page_follows_pages():
+    requests = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        assert request.url.path == "/api/search/metadata"
+        assert body["ids"] == ["asset-1", "asset-2"]
+        assert body["withExif"] is True
+        if body["page"] == 1:
+            return httpx.Response(200, json={"assets": {"items": [{"id": "asset-1"}], "nextPage": "2"}})
+        return httpx.Response(200, json={"assets": {"items": [{"id": "asset-2"}], "nextPage": None}})
+
+    async with _mock_immich_client(handler) as client:
+        metadata = await fetch_metadata_page(client, ["asset-1", "asset-2"])
+
+    assert metadata == {"asset-1": {"id": "asset-1"}, "asset-2": {"id": "asset-2"}}
+    assert [body["page"] for body in requests] == [1, "2"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_metadata_page_rejects_unfiltered_results():
+    """A server that ignores the ID filter is treated as not supporting bulk search"""
+    def handler(request):
+        return httpx.Response(200, json={"assets": {"items": [{"id": "someone-else"}], "nextPage": "2"}})
+
+    async with _mock_immich_client(handler) as client:
+        with pytest.raises(HTTPException) as exc_info:
+            await fetch_metadata_page(client, ["asset-1"])
+
+    assert exc_info.value.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_fetch_metadata_page_error():
+    async with _mock_immich_client(lambda request: httpx.Response(400)) as client:
+        with pytest.raises(HTTPException):
+            await fetch_metadata_page(client, ["asset-1"])
+
+
+@pytest.mark.asyncio
+async def test_create_immich_client_uses_api_key():
+    with patch("src.immich.settings") as mock_settings:
+        mock_settings.IMMICH_API_URL = "http://immich:2283"
+        mock_settings.IMMICH_API_KEY = "secret"
+        mock_settings.IMMICH_MAX_CONCURRENCY = 4
+        async with create_immich_client() as client:
+            assert client.headers["x-api-key"] == "secret"
+            assert str(client.base_url) == "http://immich:2283"
+
+
+
+@pytest.mark.asyncio
+async def test_fetch_asset_metadata_retries_transient_errors():
+    responses = iter([httpx.Response(503), httpx.Response(502), httpx.Response(200, json={"id": "asset-1"})])
+
+    async with _mock_immich_client(lambda request: next(responses)) as client:
+        assert await fetch_asset_metadata(client, "asset-1") == {"id": "asset-1"}
+
+
+@pytest.mark.asyncio
+async def test_fetch_asset_metadata_does_not_retry_client_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404)
+
+    async with _mock_immich_client(handler) as client:
+        with pytest.raises(HTTPException):
+            await fetch_asset_metadata(client, "asset-1")
+
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_image_from_immich_retries_dropped_connections():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ReadError("connection reset")
+        return httpx.Response(200, content=b"image-bytes")
+
+    async with _mock_immich_client(handler) as client:
+        assert await fetch_image_from_immich(client, "asset-1") == b"image-bytes"
+
+
+@pytest.mark.asyncio
+async def test_fetch_functions_propagate_outages():
+    """Outages surface as ImmichUnavailableError rather than a per-asset HTTPException"""
+    with patch("src.immich.with_retries", side_effect=ImmichUnavailableError("down")):
+        async with _mock_immich_client(lambda request: httpx.Response(200)) as client:
+            with pytest.raises(ImmichUnavailableError):
+                await fetch_asset_metadata(client, "asset-1")
+            with pytest.raises(ImmichUnavailableError):
+                await fetch_metadata_page(client, ["asset-1"])
+            with pytest.raises(ImmichUnavailableError):
+                await fetch_image_from_immich(client, "asset-1")
+
+
+@pytest.mark.parametrize("error,expected", [
+    (httpx.ConnectError("refused"), True),
+    (httpx.ReadTimeout("slow"), True),
+    (httpx.HTTPStatusError("", request=None, response=httpx.Response(503)), True),
+    (httpx.HTTPStatusError("", request=None, response=httpx.Response(429)), True),
+    (httpx.HTTPStatusError("", request=None, response=httpx.Response(404)), False),
+    (httpx.HTTPStatusError("", request=None, response=httpx.Response(500)), False),
+    (ValueError("bad json"), False),
+])
+def test_is_transient(error, expected):
+    assert is_transient(error) is expected
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    with patch("src.immich.settings.IMMICH_RETRY_BASE_DELAY", 1.0):
+        with patch("src.immich.settings.IMMICH_RETRY_MAX_DELAY", 5.0):
+            delays = [backoff_delay(10) for _ in range(50)]
+
+    assert all(0 <= delay <= 5.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+@pytest.mark.asyncio
+async def test_with_retries_gives_up_after_configured_attempts():
+    calls = []
+
+    async def operation():
+        calls.append(1)
+        raise httpx.ConnectError("refused")
+
+    with patch("src.immich.settings.IMMICH_RETRY_ATTEMPTS", 3):
+        with pytest.raises(ImmichUnavailableError):
+            await with_retries(operation)
+
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_with_retries_waits_out_open_breaker():
+    """Failures open the circuit; the next attempt waits for the reset window and succeeds"""
+    failures = iter([httpx.ConnectError("refused"), httpx.ConnectError("refused")])
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.01)
+
+    async def operation():
+        error = next(failures, None)
+        if error:
+            raise error
+        return "ok"
+
+    with patch("src.immich.breaker", breaker):
+        with patch("src.immich.settings.IMMICH_RETRY_ATTEMPTS", 2):
+            with patch("src.immich.asyncio.sleep") as mock_sleep:
+                assert await with_retries(operation) == "ok"
+
+    # Only the failure before the circuit opened backed off (and used up a retry)
+    assert mock_sleep.call_count == 1
+    assert not breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_with_retries_outage_does_not_use_up_retries():
+    """However many probes fail while the circuit is open, the request keeps waiting"""
+    calls = []
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.001, max_pause_seconds=60.0)
+
+    async def operation():
+        calls.append(1)
+        if len(calls) <= 10:
+            raise httpx.ConnectError("refused")
+        return "ok"
+
+    with patch("src.immich.breaker", breaker):
+        with patch("src.immich.settings.IMMICH_RETRY_ATTEMPTS", 2):
+            assert await with_retries(operation) == "ok"
+
+    assert len(calls) == 11
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_pauses_until_probe_succeeds():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10.0, max_pause_seconds=60.0, clock=clock)
+    breaker.record_failure()
+    assert not breaker.is_open
+    breaker.record_failure()
+    assert breaker.is_open
+
+    # Reset window elapsed: exactly one caller is let through to probe
+    clock.now = 10.0
+    await breaker.wait()
+    waiter = asyncio.ensure_future(breaker.wait())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    # The probe succeeds and wakes the waiting caller
+    breaker.record_success()
+    await asyncio.wait_for(waiter, timeout=1.0)
+    assert not breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_gives_up_after_max_pause():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10.0, max_pause_seconds=30.0, clock=clock)
+    breaker.record_failure()
+
+    async def fake_wait_for(awaitable, timeout):
+        awaitable.close()
+        clock.now += timeout
+        # Another caller's probe failed, so the circuit re-opened
+        breaker.record_failure()
+        raise asyncio.TimeoutError()
+
+    with patch("src.immich.asyncio.wait_for", side_effect=fake_wait_for):
+        with pytest.raises(ImmichUnavailableError):
+            await breaker.wait()
+
+    assert clock.now == 30.0
+
+
+@pytest.fixture
+def local_media(tmp_path):
+    (tmp_path / "2025").mkdir()
+    (tmp_path / "2025" / "IMG_0001.jpg").write_bytes(b"x" * 100)
+    with patch("src.immich.settings.LOCAL_MEDIA_ROOT", str(tmp_path)):
+        with patch("src.immich.settings.IMMICH_MEDIA_ROOT", "/data/photos"):
+            yield tmp_path
+
+
+def test_resolve_local_original_maps_mount(local_media):
+    path = resolve_local_original({"originalPath": "/data/photos/2025/IMG_0001.jpg"})
+
+    assert path == str(local_media / "2025" / "IMG_0001.jpg")
+
+
+@pytest.mark.parametrize("original_path", [
+    None,
+    "/usr/src/app/upload/library/IMG_0001.jpg",
+    "/data/photos/../secrets/IMG_0001.jpg",
+    "/data/photos/2025/missing.jpg",
+    "upload/library/IMG_0001.jpg",
+    "2025/IMG_0001.jpg",
+])
+def test_resolve_local_original_falls_back(local_media, original_path):
+    assert resolve_local_original({"originalPath": original_path}) is None
+
+
+def test_resolve_local_original_ignores_relative_media_root(local_media):
+    with patch("src.immich.settings.IMMICH_MEDIA_ROOT", "data/photos"):
+        assert resolve_local_original({"originalPath": "data/photos/2025/IMG_0001.jpg"}) is None
+
+
+def test_resolve_local_original_disabled_without_mount():
+    assert resolve_local_original({"originalPath": "/data/photos/2025/IMG_0001.jpg"}) is None
+
+
+def test_resolve_local_original_leaves_oversized_files_to_http(local_media):
+    with patch("src.immich.settings.IMMICH_MAX_DOWNLOAD_BYTES", 50):
+        assert resolve_local_original({"originalPath": "/data/photos/2025/IMG_0001.jpg"}) is None
+
+
+@pytest.mark.asyncio
+async def test_fetch_original_head_sends_range_request():
+    def handler(request):
+        assert request.url.path == "/api/asset/file/asset-1"
+        assert request.headers["range"] == "bytes=0-3"
+        return httpx.Response(206, content=b"0123")
+
+    async with _mock_immich_client(handler) as client:
+        assert await fetch_original_head(client, "asset-1", 4) == b"0123"
+
+
+@pytest.mark.asyncio
+async def test_fetch_original_head_stops_reading_when_range_is_ignored():
+    async def body():
+        for _ in range(100):
+            yield b"0123456789"
+
+    async with _mock_immich_client(lambda request: httpx.Response(200, content=body())) as client:
+        assert await fetch_original_head(client, "asset-1", 15) == b"012345678901234"
+
+
+@pytest.mark.asyncio
+async def test_fetch_original_head_error():
+    async with _mock_immich_client(lambda request: httpx.Response(404)) as client:
+        with pytest.raises(HTTPException):
+            await fetch_original_head(client, "asset-1", 4)
+
+    with patch("src.immich.with_retries", side_effect=ImmichUnavailableError("down")):
+        async with _mock_immich_client(lambda request: httpx.Response(200)) as client:
+            with pytest.raises(ImmichUnavailableError):
+                await fetch_original_head(client, "asset-1", 4)
+
+
+@pytest.mark.asyncio
+async def test_fetch_original_tail_sends_suffix_range_request():
+    def handler(request):
+        assert request.url.path == "/api/asset/file/asset-1"
+        assert request.headers["range"] == "bytes=-4"
+        return httpx.Response(206, content=b"6789")
+
+    async with _mock_immich_client(handler) as client:
+        assert await fetch_original_tail(client, "asset-1", 4) == b"6789"
+
+
+@pytest.mark.asyncio
+async def test_fetch_original_tail_keeps_end_when_range_is_ignored():
+    async def body():
+        for _ in range(100):
+            yield b"0123456789"
+
+    async with _mock_immich_client(lambda request: httpx.Response(200, content=body())) as client:
+        assert await fetch_original_tail(client, "asset-1", 15) == b"567890123456789"
+
+
+@pytest.mark.asyncio
+async def test_fetch_original_tail_error():
+    async with _mock_immich_client(lambda request: httpx.Response(404)) as client:
+        with pytest.raises(HTTPException):
+            await fetch_original_tail(client, "asset-1", 4)
+
+    with patch("src.immich.with_retries", side_effect=ImmichUnavailableError("down")):
+        async with _mock_immich_client(lambda request: httpx.Response(200)) as client:
+            with pytest.raises(ImmichUnavailableError):
+                await fetch_original_tail(client, "asset-1", 4)
@@ -2,12 +2,40 @@ import pytest
 import io
 from PIL import Image
 from unittest.mock import patch, MagicMock
-from src.main import lifespan, app
-from src.models import ImportBatch, AssetQualityScore, BurstSequence
+import asyncio
+import threading
+import time
+import httpx
+from fastapi import HTTPException
+from src.main import (
+    lifespan, app, parse_capture_time, analyze_asset,
+    fetch_batch_metadata, current_analyzer_version, run_batch_analysis,
+    keep_batch_alive, keep_reanalysis_alive, watch_interrupted_batches, background_jobs,
+    estimate_asset_decode_bytes, run_reanalysis, detect_batch_bursts,
+    plan_shards, run_batch_shard, watch_pending_shards, run_in_session
+)
+from src import crud
+from src.schemas import ReanalysisStatus
+from src.decode_budget import DecodeBudget, estimate_decode_bytes
+from src.immich import CircuitBreaker, ImmichUnavailableError
+from src.image_cache import ImageCache
+from src.quality.scorer import ANALYZER_VERSION
+from src.quality.engine import ScoringEngine
+from tests.conftest import TestingSessionLocal
+from src.models import (
+    ImportBatch, AssetQualityScore, BatchShard, BatchTriageStats, BurstSequence, QualityResultCache, ReanalysisJob
+)
 from sqlalchemy.exc import OperationalError
 from datetime import datetime, timedelta
 
 
+@pytest.fixture(autouse=True)
+def no_bulk_metadata():
+    """Job tests mock per-asset metadata; bulk search behaves like an older Immich without it."""
+    with patch("src.main.fetch_metadata_page", side_effect=HTTPException(status_code=500)) as mock_page:
+        yield mock_page
+
+
 def test_health_endpoint(client):
     response = client.get("/health")
     assert response.status_code == 200
@@ -120,22 +148,26 @@ def test_analyze_batch_success(client, db_session):
     with patch("src.main.fetch_asset_metadata") as mock_metadata:
         with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
             # Mock metadata responses with timestamps for burst detection
-            base_time = "2025-01-01T12:00:00Z"
-            mock_metadata.side_effect = [
-                {"fileCreatedAt": "2025-01-01T12:00:00Z", "id": "asset-1"},
-                {"fileCreatedAt": "2025-01-01T12:00:00.5Z", "id": "asset-2"},
-                {"fileCreatedAt": "2025-01-01T12:00:01Z", "id": "asset-3"}
-            ]
+            metadata = {
+                "asset-1": {"fileCreatedAt": "2025-01-01T12:00:00Z", "id": "asset-1"},
+                "asset-2": {"fileCreatedAt": "2025-01-01T12:00:00.5Z", "id": "asset-2"},
+                "asset-3": {"fileCreatedAt": "2025-01-01T12:00:01Z", "id": "asset-3"}
+            }
+            mock_metadata.side_effect = lambda client, asset_id: metadata[asset_id]
             # Mock image bytes for all assets
             mock_fetch_image.return_value = mock_image_bytes
 
             response = client.post(f"/batches/{batch_id}/analyze")
 
-    assert response.status_code == 200
-    data = response.json()
+    # Analysis is accepted immediately and runs as a background job
+    assert response.status_code == 202
+    assert response.json()["status"] == "processing"
+
+    data = client.get(f"/batches/{batch_id}/status").json()
     assert data["status"] == "complete"
     assert data["total_assets"] == 3
     assert data["analyzed_assets"] == 3
+    assert data["eta_seconds"] is None
 
     # Refresh session to see changes committed by endpoint
     db_session.expire_all()
@@ -147,6 +179,11 @@ def test_analyze_batch_success(client, db_session):
         assert score.overall_quality is not None
         assert score.blur_score is not None
         assert score.exposure_score is not None
+        # Raw features are kept for re-scoring
+        assert score.working_long_edge == 100
+        assert score.perceptual_hash is not None
+        assert score.mean_brightness is not None
+        assert score.analyzer_version == current_analyzer_version()
 
     # Verify burst sequence was created (3 photos within 2 seconds = burst)
     # Note: Since we're using datetime.utcnow() as placeholder timestamps,
@@ -187,8 +224,8 @@ def test_analyze_batch_with_corrupted_image(client, db_session):
 
             response = client.post(f"/batches/{batch_id}/analyze")
 
-    assert response.status_code == 200
-    data = response.json()
+    assert response.status_code == 202
+    data = client.get(f"/batches/{batch_id}/status").json()
     assert data["status"] == "complete"
 
     # Refresh session to see changes committed by endpoint
@@ -201,6 +238,1018 @@ def test_analyze_batch_with_corrupted_image(client, db_session):
     assert score.overall_quality == 0.0
 
 
+def test_analyze_batch_skips_failed_assets(client, db_session):
+    """Test that assets whose fetch fails are counted as skipped"""
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=["asset-ok", "asset-missing"],
+        status="processing",
+        total_assets=2,
+        analyzed_assets=0,
+        skipped_assets=0
+    )
+    db_session.add(batch)
+    db_session.commit()
+    batch_id = batch.id
+
+    img = Image.new('RGB', (50, 50), color='green')
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG')
+
+    def fetch_image(client, asset_id, rendition=None):
+        if asset_id == "asset-missing":
+            raise HTTPException(status_code=500, detail="not found in Immich")
+        return buffer.getvalue()
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z"}
+            mock_fetch_image.side_effect = fetch_image
+
+            response = client.post(f"/batches/{batch_id}/analyze")
+
+    assert response.status_code == 202
+    data = client.get(f"/batches/{batch_id}/status").json()
+    assert data["analyzed_assets"] == 1
+    assert data["skipped_assets"] == 1
+
+    db_session.expire_all()
+    scores = db_session.query(AssetQualityScore).filter_by(import_batch_id=batch_id).all()
+    assert [score.immich_asset_id for score in scores] == ["asset-ok"]
+
+
+def _scoring_engine(results):
+    """Engine double returning results by the bytes/path it is given, recording each call."""
+    engine = MagicMock()
+    engine.scored = []
+
+    async def score(image_data):
+        engine.scored.append(image_data)
+        return results[bytes(image_data) if not isinstance(image_data, str) else image_data]
+
+    engine.score.side_effect = score
+    engine.score_batched.side_effect = score
+    return engine
+
+
+CLEAR = {"blur_score": 95.0, "exposure_score": 90.0, "overall_quality": 93.0, "is_corrupted": False}
+BAD = {"blur_score": 10.0, "exposure_score": 30.0, "overall_quality": 18.0, "is_corrupted": False}
+BORDERLINE = {"blur_score": 50.0, "exposure_score": 50.0, "overall_quality": 50.0, "is_corrupted": False}
+FULL = {"blur_score": 40.0, "exposure_score": 60.0, "overall_quality": 48.0, "is_corrupted": False}
+CORRUPTED = {"blur_score": None, "exposure_score": None, "overall_quality": 0.0, "is_corrupted": True}
+TRUNCATED_JPEG = b"\xff\xd8\xff\xe0\x00\x10JFIF"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prescreen,tail,expected,scored,fetched", [
+    # A thumbnail can't show blur at the original's scale: only clearly bad pre-screens are final
+    (BAD, b"data\xff\xd9", BAD, [b"thumb"], ["thumbnail"]),
+    # Others are scored from the preview; the original is never downloaded
+    (CLEAR, b"data\xff\xd9", FULL, [b"thumb", b"preview"], ["thumbnail", "preview"]),
+    (BORDERLINE, b"data\xff\xd9", FULL, [b"thumb", b"preview"], ["thumbnail", "preview"]),
+    # An original whose tail lacks EOI is fully analyzed, which exposes the damage
+    (BAD, b"data", CORRUPTED, [b"thumb", TRUNCATED_JPEG], ["thumbnail", "original"]),
+    (CLEAR, b"data", CORRUPTED, [b"thumb", TRUNCATED_JPEG], ["thumbnail", "original"]),
+])
+async def test_analyze_asset_cascade(prescreen, tail, expected, scored, fetched):
+    """Clearly bad pre-screens are final; others escalate to the preview"""
+    engine = _scoring_engine({b"thumb": prescreen, b"preview": FULL, TRUNCATED_JPEG: CORRUPTED})
+    renditions = {"thumbnail": b"thumb", "preview": b"preview", "original": TRUNCATED_JPEG}
+
+    async def fetch_image(client, asset_id, rendition=None):
+        return bytearray(renditions[rendition])
+
+    with patch("src.main.settings.ANALYSIS_CASCADE", True):
+        with patch("src.main.fetch_original_tail", return_value=tail) as mock_tail:
+            with patch("src.main.fetch_image_from_immich", side_effect=fetch_image) as mock_fetch:
+                result = await analyze_asset(
+                    MagicMock(), asyncio.Semaphore(1), engine, "asset-1", {"originalMimeType": "image/jpeg"}
+                )
+
+    assert result == expected
+    assert [bytes(image_data) for image_data in engine.scored] == scored
+    assert [call.kwargs["rendition"] for call in mock_fetch.call_args_list] == fetched
+    assert mock_tail.call_args.args[1:] == ("asset-1", 16 * 1024)
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_cascade_escalates_without_prescreen():
+    engine = _scoring_engine({b"preview": FULL})
+
+    async def fetch_image(client, asset_id, rendition=None):
+        if rendition == "thumbnail":
+            raise HTTPException(status_code=500)
+        return bytearray(b"preview")
+
+    with patch("src.main.settings.ANALYSIS_CASCADE", True):
+        with patch("src.main.fetch_original_tail", return_value=b"data"):
+            with patch("src.main.fetch_image_from_immich", side_effect=fetch_image):
+                # Without a MIME type the tail proves nothing either way
+                assert await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1") == FULL
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_cascade_exif_prescreen():
+    """The EXIF thumbnail comes from a ranged read of the original's head"""
+    engine = _scoring_engine({b"exif-thumb": BAD})
+
+    with patch("src.main.settings.ANALYSIS_CASCADE", True):
+        with patch("src.main.settings.CASCADE_PRESCREEN", "exif"):
+            with patch("src.main.fetch_original_head", return_value=b"head") as mock_head:
+                with patch("src.main.fetch_original_tail", return_value=b"\xff\xd9"):
+                    with patch("src.main.extract_exif_thumbnail", return_value=b"exif-thumb") as mock_extract:
+                        with patch("src.main.fetch_image_from_immich") as mock_fetch:
+                            result = await analyze_asset(
+                                MagicMock(), asyncio.Semaphore(1), engine, "asset-1", {"originalMimeType": "image/jpeg"}
+                            )
+
+    assert result == BAD
+    assert mock_head.call_args.args[1:] == ("asset-1", 64 * 1024)
+    mock_extract.assert_called_once_with(b"head")
+    # Neither Immich's thumbnail nor any full-size rendition is needed
+    mock_fetch.assert_not_called()
+    assert engine.scored == [b"exif-thumb"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_cascade_checks_cached_original(tmp_path):
+    """A cached original is checked in full instead of fetching its tail"""
+    cache = ImageCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    cache.put("asset-1", "abc", "original", bytearray(TRUNCATED_JPEG))
+    cached_original = cache.get("asset-1", "abc", "original")
+    engine = _scoring_engine({b"thumb": BAD, cached_original: CORRUPTED})
+
+    with patch("src.main.settings.ANALYSIS_CASCADE", True):
+        with patch("src.main.image_cache", cache):
+            with patch("src.main.fetch_original_tail") as mock_tail:
+                with patch("src.main.fetch_image_from_immich", return_value=bytearray(b"thumb")):
+                    result = await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", {"checksum": "abc"})
+
+    assert result == CORRUPTED
+    mock_tail.assert_not_called()
+    # The damaged original is scored from the cache too
+    assert engine.scored[-1] == cached_original
+
+
+def _counting_transport(renditions, transfers):
+    """Immich serving each asset's renditions, honouring suffix ranges and tallying requests and bytes per asset."""
+    def handler(request):
+        asset_id = request.url.path.rsplit("/", 1)[-1]
+        status_code = 200
+        if request.url.path.startswith("/api/asset/file/"):
+            body = renditions[asset_id]["original"]
+            if request.headers.get("range", "").startswith("bytes=-"):
+                body = body[-int(request.headers["range"][len("bytes=-"):]):]
+                status_code = 206
+        else:
+            body = renditions[asset_id]["thumbnail" if request.url.params["format"] == "WEBP" else "preview"]
+        requests, sent = transfers.get(asset_id, (0, 0))
+        transfers[asset_id] = (requests + 1, sent + len(body))
+        return httpx.Response(status_code, content=body)
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("cascade,expected_requests,max_bytes", [
+    # Every asset's full original
+    (False, {"asset-bad": 1, "asset-good": 1}, {"asset-bad": 6_000_004, "asset-good": 6_000_004}),
+    # Thumbnail and original tail; the preview only for photos that escalate
+    (True, {"asset-bad": 2, "asset-good": 3}, {"asset-bad": 20_000, "asset-good": 320_000}),
+])
+async def test_cascade_transfer_per_asset(cascade, expected_requests, max_bytes):
+    """The cascade never downloads a whole original whose tail is intact"""
+    original = b"\xff\xd8" + bytes(6_000_000) + b"\xff\xd9"
+    renditions = {
+        asset_id: {"thumbnail": thumbnail, "preview": bytes(300_000), "original": original}
+        for asset_id, thumbnail in (("asset-bad", b"thumb-bad"), ("asset-good", b"thumb-good"))
+    }
+    engine = MagicMock()
+
+    async def score(image_data):
+        return {b"thumb-bad": BAD, b"thumb-good": CLEAR}.get(bytes(image_data), FULL)
+
+    engine.score.side_effect = score
+    engine.score_batched.side_effect = score
+    transfers = {}
+
+    with patch("src.main.settings.ANALYSIS_CASCADE", cascade):
+        async with httpx.AsyncClient(base_url="http://immich", transport=_counting_transport(renditions, transfers)) as client:
+            for asset_id in renditions:
+                await analyze_asset(client, asyncio.Semaphore(1), engine, asset_id, {"originalMimeType": "image/jpeg"})
+
+    assert {asset_id: requests for asset_id, (requests, _) in transfers.items()} == expected_requests
+    for asset_id, (_, sent) in transfers.items():
+        assert sent <= max_bytes[asset_id]
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_cascade_exif_prescreen_from_local_original(tmp_path):
+    (tmp_path / "IMG_0001.jpg").write_bytes(b"local-head-and-more")
+    engine = _scoring_engine({b"thumb": BAD})
+    metadata = {"originalPath": "/data/photos/IMG_0001.jpg"}
+
+    with patch("src.main.settings.ANALYSIS_CASCADE", True):
+        with patch("src.main.settings.CASCADE_PRESCREEN", "exif"):
+            with patch("src.main.settings.CASCADE_HEAD_BYTES", 10):
+                with patch("src.main.settings.LOCAL_MEDIA_ROOT", str(tmp_path)):
+                    with patch("src.main.fetch_original_head") as mock_head:
+                        with patch("src.main.extract_exif_thumbnail", return_value=None) as mock_extract:
+                            # No EXIF thumbnail: Immich's thumbnail is used instead
+                            with patch("src.main.fetch_image_from_immich", return_value=bytearray(b"thumb")) as mock_fetch:
+                                result = await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", metadata)
+
+    assert result == BAD
+    # The settled original is checked from disk
+    assert [call.kwargs for call in mock_fetch.call_args_list] == [{"rendition": "thumbnail"}]
+    mock_head.assert_not_called()
+    mock_extract.assert_called_once_with(b"local-head")
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_reads_local_original(tmp_path):
+    """Originals on the shared mount are scored from disk without an HTTP request"""
+    original = tmp_path / "IMG_0001.jpg"
+    original.write_bytes(b"image")
+    engine = MagicMock()
+    scored = []
+
+    async def score(image_data):
+        scored.append(image_data)
+        if len(scored) == 2:
+            raise FileNotFoundError(image_data)
+        return {"is_corrupted": True}
+
+    engine.score.side_effect = score
+    metadata = {"originalPath": "/data/photos/IMG_0001.jpg"}
+    with patch("src.main.settings.LOCAL_MEDIA_ROOT", str(tmp_path)):
+        with patch("src.main.fetch_image_from_immich", return_value=bytearray(b"image")) as mock_fetch:
+            await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", metadata)
+            mock_fetch.assert_not_called()
+            # Deleted between resolving and scoring: downloaded instead
+            await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", metadata)
+            mock_fetch.assert_called_once()
+            # Previews are not on the media mount
+            with patch("src.main.settings.IMMICH_ASSET_RENDITION", "preview"):
+                await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", metadata)
+
+    assert scored[0] == str(original)
+    assert original.exists()
+    assert mock_fetch.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_uses_image_cache(tmp_path):
+    """A miss downloads and caches the image; the next call is served from disk"""
+    cache = ImageCache(str(tmp_path), max_bytes=1024)
+    engine = MagicMock()
+    scored = []
+
+    async def score(image_data):
+        scored.append(image_data)
+        return {"is_corrupted": True}
+
+    engine.score.side_effect = score
+    with patch("src.main.image_cache", cache):
+        with patch("src.main.fetch_image_from_immich", return_value=bytearray(b"image")) as mock_fetch:
+            await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", {"checksum": "sha1-a"})
+            await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", {"checksum": "sha1-a"})
+            # Without a checksum the cache is bypassed
+            await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1")
+
+    assert mock_fetch.call_count == 2
+    assert scored[1] == cache.get("asset-1", "sha1-a", "original")
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_downloads_when_cached_file_was_evicted(tmp_path):
+    cache = ImageCache(str(tmp_path), max_bytes=1024)
+    cache.put("asset-1", "sha1-a", "original", b"image")
+    engine = MagicMock()
+
+    async def score(image_data):
+        if isinstance(image_data, str):
+            raise FileNotFoundError(image_data)
+        return {"is_corrupted": True}
+
+    engine.score.side_effect = score
+    with patch("src.main.image_cache", cache):
+        with patch("src.main.fetch_image_from_immich", return_value=bytearray(b"image")) as mock_fetch:
+            result = await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", {"checksum": "sha1-a"})
+
+    assert result == {"is_corrupted": True}
+    mock_fetch.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_survives_cache_write_failure(tmp_path):
+    cache = MagicMock()
+    cache.get.return_value = None
+    cache.put.side_effect = OSError("disk full")
+    engine = MagicMock()
+
+    async def score(image_data):
+        return {"is_corrupted": True}
+
+    engine.score.side_effect = score
+    with patch("src.main.image_cache", cache):
+        with patch("src.main.fetch_image_from_immich", return_value=bytearray(b"image")):
+            result = await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1", {"checksum": "sha1-a"})
+
+    assert result == {"is_corrupted": True}
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_removes_spilled_download(tmp_path):
+    """Temp files behind spilled downloads are removed once scored"""
+    path = tmp_path / "image.download"
+    path.write_bytes(b"corrupted")
+    engine = MagicMock()
+
+    async def score(image_data):
+        assert image_data == str(path)
+        return {"is_corrupted": True}
+
+    engine.score.side_effect = score
+    with patch("src.main.fetch_image_from_immich", return_value=str(path)):
+        result = await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1")
+
+    assert result == {"is_corrupted": True}
+    assert not path.exists()
+
+
+def test_estimate_asset_decode_bytes_from_metadata():
+    metadata = {
+        "originalMimeType": "image/jpeg",
+        "exifInfo": {"exifImageWidth": 4000, "exifImageHeight": 3000}
+    }
+    with patch("src.main.settings.ANALYSIS_WORKING_SIZE", 1000):
+        assert estimate_asset_decode_bytes(metadata) == estimate_decode_bytes(4000, 3000, 1000, reduced_jpeg=True)
+        assert estimate_asset_decode_bytes({**metadata, "originalMimeType": "image/png"}) == (
+            estimate_decode_bytes(4000, 3000, 1000)
+        )
+        with patch("src.main.settings.IMMICH_ASSET_RENDITION", "preview"):
+            assert estimate_asset_decode_bytes(metadata) is None
+    assert estimate_asset_decode_bytes({"exifInfo": {"exifImageWidth": 4000}}) is None
+    assert estimate_asset_decode_bytes({"exifInfo": None}) is None
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_decode_budget_holds_back_fetches():
+    """Once the budget is reserved, further assets wait before downloading"""
+    metadata = {"exifInfo": {"exifImageWidth": 2000, "exifImageHeight": 2000}}
+    events = []
+
+    async def fetch_image(client, asset_id, rendition=None):
+        events.append(f"fetch {asset_id}")
+        return bytearray(b"image")
+
+    engine = MagicMock()
+
+    async def score(image_data):
+        await asyncio.sleep(0.01)
+        events.append("scored")
+        return {"is_corrupted": True}
+
+    engine.score.side_effect = score
+    budget = DecodeBudget(estimate_asset_decode_bytes(metadata))
+    with patch("src.main.decode_budget", budget):
+        with patch("src.main.fetch_image_from_immich", side_effect=fetch_image):
+            await asyncio.gather(*(
+                analyze_asset(MagicMock(), asyncio.Semaphore(2), engine, f"asset-{i}", metadata)
+                for i in range(2)
+            ))
+
+    assert events == ["fetch asset-0", "scored", "fetch asset-1", "scored"]
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_decode_budget_from_image_header():
+    """Without dimensions in the metadata, the fetched image's header sizes the reservation"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48)).save(buffer, format='PNG')
+    reserved = []
+    budget = DecodeBudget(0)
+    engine = MagicMock()
+
+    async def score(image_data):
+        reserved.append(budget.in_use)
+        return {"is_corrupted": False}
+
+    engine.score.side_effect = score
+    with patch("src.main.decode_budget", budget):
+        with patch("src.main.fetch_image_from_immich", return_value=bytearray(buffer.getvalue())):
+            await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1")
+        with patch("src.main.fetch_image_from_immich", return_value=bytearray(b"not an image")):
+            await analyze_asset(MagicMock(), asyncio.Semaphore(1), engine, "asset-1")
+
+    assert reserved == [estimate_decode_bytes(64, 48, 1440), 0]
+    assert budget.in_use == 0
+
+
+def test_parse_capture_time_prefers_file_created_at():
+    timestamp = parse_capture_time({
+        "fileCreatedAt": "2025-01-01T12:00:00Z",
+        "exifInfo": {"dateTimeOriginal": "2024-01-01T12:00:00Z"}
+    })
+    assert timestamp.year == 2025
+
+
+def test_parse_capture_time_falls_back_to_exif():
+    timestamp = parse_capture_time({"exifInfo": {"dateTimeOriginal": "2024-06-01T08:30:00Z"}})
+    assert timestamp.year == 2024
+
+
+def test_parse_capture_time_without_timestamp():
+    before = datetime.utcnow()
+    timestamp = parse_capture_time({})
+    assert timestamp >= before
+
+
+@pytest.mark.asyncio
+async def test_analyze_asset_respects_concurrency_limit():
+    """No more than the semaphore's worth of assets should be in flight"""
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fetch_image(client, asset_id, rendition=None):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return b"corrupted"
+
+    semaphore = asyncio.Semaphore(2)
+    engine = ScoringEngine(max_workers=2)
+    try:
+        with patch("src.main.fetch_image_from_immich", side_effect=fetch_image):
+            results = await asyncio.gather(*(
+                analyze_asset(MagicMock(), semaphore, engine, f"asset-{i}")
+                for i in range(6)
+            ))
+    finally:
+        engine.shutdown()
+
+    assert max_in_flight == 2
+    assert len(results) == 6
+    assert all(result['is_corrupted'] for result in results)
+
+
+@pytest.mark.asyncio
+async def test_fetch_batch_metadata_omits_failures():
+    async def fetch_metadata(client, asset_id):
+        if asset_id == "asset-2":
+            raise HTTPException(status_code=500, detail="boom")
+        return {"id": asset_id}
+
+    with patch("src.main.fetch_asset_metadata", side_effect=fetch_metadata):
+        metadata = await fetch_batch_metadata(MagicMock(), asyncio.Semaphore(2), ["asset-1", "asset-2", "asset-3"])
+
+    assert metadata == {"asset-1": {"id": "asset-1"}, "asset-3": {"id": "asset-3"}}
+
+
+@pytest.mark.asyncio
+async def test_fetch_batch_metadata_uses_bulk_pages(no_bulk_metadata):
+    """Pages cover most assets; only the ones they miss are fetched individually"""
+    async def fetch_page(client, asset_ids):
+        if "asset-5" in asset_ids:
+            raise HTTPException(status_code=500)
+        return {asset_id: {"id": asset_id} for asset_id in asset_ids if asset_id != "asset-2"}
+
+    async def fetch_metadata(client, asset_id):
+        return {"id": asset_id, "single": True}
+
+    no_bulk_metadata.side_effect = fetch_page
+    with patch("src.main.settings.IMMICH_METADATA_PAGE_SIZE", 2):
+        with patch("src.main.fetch_asset_metadata", side_effect=fetch_metadata) as mock_metadata:
+            metadata = await fetch_batch_metadata(MagicMock(), asyncio.Semaphore(2), [f"asset-{i}" for i in range(1, 6)])
+
+    assert [call.args[1] for call in no_bulk_metadata.call_args_list] == [["asset-1", "asset-2"], ["asset-3", "asset-4"], ["asset-5"]]
+    assert sorted(call.args[1] for call in mock_metadata.call_args_list) == ["asset-2", "asset-5"]
+    assert sorted(metadata) == [f"asset-{i}" for i in range(1, 6)]
+    assert metadata["asset-1"] == {"id": "asset-1"}
+
+
+@pytest.mark.asyncio
+async def test_fetch_batch_metadata_bulk_disabled(no_bulk_metadata):
+    with patch("src.main.settings.IMMICH_METADATA_PAGE_SIZE", 0):
+        with patch("src.main.fetch_asset_metadata", return_value={"id": "asset-1"}):
+            metadata = await fetch_batch_metadata(MagicMock(), asyncio.Semaphore(2), ["asset-1"])
+
+    no_bulk_metadata.assert_not_called()
+    assert metadata == {"asset-1": {"id": "asset-1"}}
+
+
+def test_current_analyzer_version_reflects_settings():
+    with patch("src.main.settings.IMMICH_ASSET_RENDITION", "original"):
+        original_version = current_analyzer_version()
+    with patch("src.main.settings.IMMICH_ASSET_RENDITION", "preview"):
+        preview_version = current_analyzer_version()
+
+    assert original_version.startswith(ANALYZER_VERSION)
+    assert original_version != preview_version
+
+
+def test_current_analyzer_version_reflects_cascade():
+    plain_version = current_analyzer_version()
+    with patch("src.main.settings.ANALYSIS_CASCADE", True):
+        cascade_version = current_analyzer_version()
+        with patch("src.main.settings.CASCADE_BAND", 5.0):
+            narrow_version = current_analyzer_version()
+
+    assert cascade_version.startswith(plain_version)
+    assert len({plain_version, cascade_version, narrow_version}) == 3
+    assert len(cascade_version) <= 64
+
+
+def test_analyze_batch_flushes_progress(client, db_session):
+    """Progress is committed while the job runs, not only at the end"""
+    asset_ids = [f"asset-{i}" for i in range(5)]
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=asset_ids,
+        status="processing",
+        total_assets=5,
+        analyzed_assets=0,
+        skipped_assets=0
+    )
+    db_session.add(batch)
+    db_session.commit()
+    batch_id = batch.id
+
+    observed = []
+    original_commit = TestingSessionLocal.class_.commit
+
+    def recording_commit(session):
+        original_commit(session)
+        # What a status request would read after each commit
+        row = session.query(
+            ImportBatch.status, ImportBatch.analyzed_assets, ImportBatch.seconds_per_asset
+        ).filter(ImportBatch.id == batch_id).one()
+        session.rollback()
+        if not observed or observed[-1] != tuple(row):
+            observed.append(tuple(row))
+
+    with patch("src.main.settings.ANALYSIS_PROGRESS_INTERVAL", 2):
+        with patch.object(TestingSessionLocal.class_, "commit", recording_commit):
+            with patch("src.main.fetch_asset_metadata") as mock_metadata:
+                with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+                    mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z"}
+                    mock_fetch_image.return_value = b"corrupted"
+                    response = client.post(f"/batches/{batch_id}/analyze")
+
+    assert response.status_code == 202
+    in_progress = [entry for entry in observed if entry[0] == "processing" and entry[1] > 0]
+    # Every second asset, then the remainder before bursts are detected
+    assert [entry[1] for entry in in_progress] == [2, 4, 5]
+    assert all(entry[2] is not None for entry in in_progress)
+    assert observed[-1][:2] == ("complete", 5)
+
+
+def test_analyze_batch_already_running(client, db_session):
+    """A batch whose job has started cannot be started again"""
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=["asset-1"],
+        status="processing",
+        total_assets=1,
+        analyzed_assets=0,
+        skipped_assets=0,
+        started_at=datetime.utcnow(),
+        heartbeat_at=datetime.utcnow()
+    )
+    db_session.add(batch)
+    db_session.commit()
+
+    response = client.post(f"/batches/{batch.id}/analyze")
+
+    assert response.status_code == 409
+    assert "already" in response.json()["detail"]
+
+
+def test_analyze_batch_rerun_replaces_results(client, db_session):
+    """Re-analyzing a completed batch replaces its previous results"""
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=["asset-1"],
+        status="complete",
+        total_assets=1,
+        analyzed_assets=1,
+        skipped_assets=0
+    )
+    db_session.add(batch)
+    db_session.commit()
+    batch_id = batch.id
+    db_session.add(AssetQualityScore(immich_asset_id="asset-1", import_batch_id=batch_id, overall_quality=10.0))
+    db_session.add(BurstSequence(import_batch_id=batch_id, immich_asset_ids=["asset-1"]))
+    db_session.commit()
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z"}
+            mock_fetch_image.return_value = b"corrupted"
+            response = client.post(f"/batches/{batch_id}/analyze")
+
+    assert response.status_code == 202
+    db_session.expire_all()
+    scores = db_session.query(AssetQualityScore).filter_by(import_batch_id=batch_id).all()
+    assert len(scores) == 1
+    assert scores[0].is_corrupted is True
+    assert db_session.query(BurstSequence).filter_by(import_batch_id=batch_id).count() == 0
+
+
+def test_analyze_batch_job_failure_marks_batch_failed(client, db_session):
+    """An unexpected error in the job marks the batch as failed"""
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=["asset-1"],
+        status="processing",
+        total_assets=1,
+        analyzed_assets=0,
+        skipped_assets=0
+    )
+    db_session.add(batch)
+    db_session.commit()
+    batch_id = batch.id
+
+    with patch("src.main.create_immich_client", side_effect=RuntimeError("pool exhausted")):
+        response = client.post(f"/batches/{batch_id}/analyze")
+
+    assert response.status_code == 202
+    db_session.expire_all()
+    failed = db_session.query(ImportBatch).filter_by(id=batch_id).first()
+    assert failed.status == "failed"
+    assert failed.error_message == "pool exhausted"
+
+
+def test_analyze_batch_restarts_stale_batch(client, db_session):
+    """A processing batch whose heartbeat went stale can be started again"""
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=["asset-1"],
+        status="processing",
+        total_assets=1,
+        analyzed_assets=0,
+        skipped_assets=0,
+        started_at=datetime.utcnow() - timedelta(hours=1),
+        heartbeat_at=datetime.utcnow() - timedelta(hours=1)
+    )
+    db_session.add(batch)
+    db_session.commit()
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z"}
+            mock_fetch_image.return_value = b"corrupted"
+            response = client.post(f"/batches/{batch.id}/analyze")
+
+    assert response.status_code == 202
+
+
+@pytest.mark.asyncio
+async def test_run_batch_analysis_resume_skips_scored_assets(db_session):
+    """Resuming scores only the remaining assets and detects bursts across both runs"""
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=["asset-1", "asset-2", "asset-3"],
+        status="processing",
+        total_assets=3,
+        analyzed_assets=1,
+        skipped_assets=1,
+        started_at=datetime.utcnow()
+    )
+    db_session.add(batch)
+    db_session.commit()
+    batch_id = batch.id
+    db_session.add(AssetQualityScore(
+        immich_asset_id="asset-1",
+        import_batch_id=batch_id,
+        overall_quality=90.0,
+        captured_at=datetime(2025, 1, 1, 12, 0, 0)
+    ))
+    db_session.commit()
+
+    timestamps = {"asset-2": "2025-01-01T12:00:01Z", "asset-3": "2025-01-01T12:00:02Z"}
+
+    async def metadata(client, asset_id):
+        return {"fileCreatedAt": timestamps[asset_id]}
+
+    with patch("src.main.fetch_asset_metadata", side_effect=metadata) as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_fetch_image.return_value = b"corrupted"
+            await run_batch_analysis(batch_id, lambda: TestingSessionLocal(), resume=True)
+
+    assert sorted(call.args[1] for call in mock_metadata.call_args_list) == ["asset-2", "asset-3"]
+    db_session.expire_all()
+    resumed = db_session.query(ImportBatch).filter_by(id=batch_id).first()
+    assert resumed.status == "complete"
+    assert resumed.analyzed_assets == 3
+    assert resumed.skipped_assets == 0
+    bursts = db_session.query(BurstSequence).filter_by(import_batch_id=batch_id).all()
+    assert len(bursts) == 1
+    assert set(bursts[0].immich_asset_ids) == {"asset-1", "asset-2", "asset-3"}
+    assert bursts[0].recommended_asset_id == "asset-1"
+
+
+def test_analyze_batch_persists_capture_time(client, db_session):
+    """Capture times are stored with each score as naive UTC"""
+    batch_id = _create_batch(db_session, ["asset-1"])
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T14:00:00+02:00"}
+            mock_fetch_image.return_value = b"corrupted"
+            client.post(f"/batches/{batch_id}/analyze")
+
+    db_session.expire_all()
+    score = db_session.query(AssetQualityScore).filter_by(import_batch_id=batch_id).first()
+    assert score.captured_at == datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_keep_batch_alive_refreshes_heartbeat(db_session):
+    """The keep-alive loop stamps and commits the heartbeat each interval"""
+    batch_id = _create_batch(db_session, ["asset-1"])
+
+    with patch("src.main.asyncio.sleep", side_effect=[None, asyncio.CancelledError()]):
+        with pytest.raises(asyncio.CancelledError):
+            await keep_batch_alive(TestingSessionLocal, batch_id)
+
+    db_session.expire_all()
+    assert db_session.get(ImportBatch, batch_id).heartbeat_at is not None
+
+
+@pytest.mark.asyncio
+async def test_keep_batch_alive_refreshes_shard_heartbeat(db_session):
+    """A shard's heartbeat is refreshed along with its batch's"""
+    batch_id = _create_batch(db_session, ["asset-1"])
+    shard = BatchShard(import_batch_id=batch_id, shard_index=0, asset_ids=["asset-1"], status="processing")
+    db_session.add(shard)
+    db_session.commit()
+
+    with patch("src.main.asyncio.sleep", side_effect=[None, asyncio.CancelledError()]):
+        with pytest.raises(asyncio.CancelledError):
+            await keep_batch_alive(TestingSessionLocal, batch_id, shard.id)
+
+    db_session.expire_all()
+    assert shard.heartbeat_at == db_session.get(ImportBatch, batch_id).heartbeat_at is not None
+
+
+@pytest.mark.asyncio
+async def test_keep_reanalysis_alive_refreshes_heartbeat(db_session):
+    db_session.add(ReanalysisJob(id=crud.REANALYSIS_JOB_ID, status="running", heartbeat_at=datetime(2025, 1, 1)))
+    db_session.commit()
+
+    with patch("src.main.asyncio.sleep", side_effect=[None, asyncio.CancelledError()]):
+        with pytest.raises(asyncio.CancelledError):
+            await keep_reanalysis_alive(TestingSessionLocal)
+
+    db_session.expire_all()
+    assert crud.get_reanalysis_job(db_session).heartbeat_at > datetime(2025, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_run_in_session_works_off_the_event_loop():
+    """Database work runs in a worker thread, in a session that is committed and closed"""
+    session = MagicMock()
+    loop_thread = threading.get_ident()
+
+    result = await run_in_session(lambda: session, lambda db: (db, threading.get_ident()))
+
+    assert result[0] is session
+    assert result[1] != loop_thread
+    session.commit.assert_called_once()
+    session.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_run_in_session_rolls_back_failed_work():
+    """Work that raises is rolled back and the error surfaces to the caller"""
+    session = MagicMock()
+
+    def work(db):
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await run_in_session(lambda: session, work)
+
+    session.commit.assert_not_called()
+    session.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_watch_interrupted_batches_resumes_claimed_batches():
+    """The watchdog resumes every batch it claims"""
+    session = MagicMock()
+    factory = MagicMock(return_value=session)
+
+    with patch("src.main.asyncio.sleep", side_effect=[None, asyncio.CancelledError()]):
+        with patch("src.main.crud.claim_interrupted_batches", return_value=["batch-1"]):
+            with patch("src.main.run_batch_analysis") as mock_run:
+                with pytest.raises(asyncio.CancelledError):
+                    await watch_interrupted_batches(factory)
+                await asyncio.gather(*background_jobs)
+
+    mock_run.assert_called_once_with("batch-1", factory, resume=True)
+    session.close.assert_called_once()
+    assert not background_jobs
+
+
+@pytest.mark.asyncio
+async def test_watch_interrupted_batches_survives_database_errors():
+    """A failed claim is logged and retried on the next tick"""
+    session = MagicMock()
+
+    with patch("src.main.asyncio.sleep", side_effect=[None, asyncio.CancelledError()]):
+        with patch("src.main.crud.claim_interrupted_batches", side_effect=OperationalError("down", None, None)):
+            with patch("src.main.run_batch_analysis") as mock_run:
+                with pytest.raises(asyncio.CancelledError):
+                    await watch_interrupted_batches(MagicMock(return_value=session))
+
+    mock_run.assert_not_called()
+    session.close.assert_called_once()
+
+
+def _create_batch(db_session, asset_ids, user_id="user-123"):
+    batch = ImportBatch(
+        immich_user_id=user_id,
+        asset_ids=asset_ids,
+        status="processing",
+        total_assets=len(asset_ids),
+        analyzed_assets=0,
+        skipped_assets=0
+    )
+    db_session.add(batch)
+    db_session.commit()
+    return batch.id
+
+
+def test_analyze_batch_stops_on_immich_outage_and_resumes(client, db_session):
+    """An outage fails the batch without skipping assets; resuming keeps earlier scores"""
+    batch_id = _create_batch(db_session, ["asset-1", "asset-2"])
+
+    engine = _scoring_engine({b"corrupted": {"overall_quality": 0.0, "is_corrupted": True}})
+    scored = asyncio.Event()
+    score = engine.score.side_effect
+
+    async def score_and_signal(image_data):
+        result = await score(image_data)
+        scored.set()
+        return result
+
+    async def fetch_image(client, asset_id, rendition=None):
+        if asset_id == "asset-2":
+            # Fail only once asset-1 is scored, however slow start-up is
+            await scored.wait()
+            raise ImmichUnavailableError("Immich unavailable")
+        return b"corrupted"
+
+    engine.score.side_effect = score_and_signal
+    with patch("src.main.scoring_engine", engine):
+        with patch("src.main.fetch_asset_metadata") as mock_metadata:
+            with patch("src.main.fetch_image_from_immich", side_effect=fetch_image):
+                mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z"}
+                client.post(f"/batches/{batch_id}/analyze")
+
+    db_session.expire_all()
+    batch = db_session.query(ImportBatch).filter_by(id=batch_id).first()
+    assert batch.status == "failed"
+    assert "resume=true" in batch.error_message
+    assert batch.skipped_assets == 0
+    assert [s.immich_asset_id for s in db_session.query(AssetQualityScore).filter_by(import_batch_id=batch_id)] == ["asset-1"]
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z"}
+            mock_fetch_image.return_value = b"corrupted"
+            response = client.post(f"/batches/{batch_id}/analyze?resume=true")
+
+    assert response.status_code == 202
+    assert [call.args[1] for call in mock_fetch_image.call_args_list] == ["asset-2"]
+    db_session.expire_all()
+    batch = db_session.query(ImportBatch).filter_by(id=batch_id).first()
+    assert batch.status == "complete"
+    assert batch.analyzed_assets == 2
+    assert batch.error_message is None
+
+
+def _outage_transport(outage_seconds):
+    """Immich whose downloads fail with refused connections for outage_seconds after the first one."""
+    outage_started = []
+
+    def handler(request):
+        if not request.url.path.startswith("/api/asset/file/"):
+            return httpx.Response(200, json={"fileCreatedAt": "2025-01-01T12:00:00Z"})
+        now = time.monotonic()
+        outage_started[:] = outage_started or [now]
+        if now - outage_started[0] < outage_seconds:
+            raise httpx.ConnectError("Connection refused")
+        return httpx.Response(200, content=b"corrupted")
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.parametrize("outage_seconds,max_pause_seconds,expected_status,expected_analyzed", [
+    # Shorter than the longest pause: the batch waits and every asset is analyzed
+    (0.6, 5.0, "complete", 40),
+    # Longer: the batch stops, resumably, without skipping anything
+    (60.0, 0.6, "failed", 0),
+])
+def test_analyze_batch_pauses_through_immich_outage(
+    client, db_session, outage_seconds, max_pause_seconds, expected_status, expected_analyzed
+):
+    """An outage longer than the retry budget pauses the batch instead of skipping assets"""
+    batch_id = _create_batch(db_session, [f"asset-{i}" for i in range(40)])
+    breaker = CircuitBreaker(failure_threshold=5, reset_seconds=0.02, max_pause_seconds=max_pause_seconds)
+    transport = _outage_transport(outage_seconds)
+
+    with patch("src.immich.breaker", breaker):
+        with patch("src.main.settings.IMMICH_MAX_CONCURRENCY", 16):
+            with patch("src.main.create_immich_client", lambda: httpx.AsyncClient(base_url="http://immich", transport=transport)):
+                client.post(f"/batches/{batch_id}/analyze")
+
+    db_session.expire_all()
+    batch = db_session.query(ImportBatch).filter_by(id=batch_id).first()
+    assert batch.status == expected_status
+    assert batch.skipped_assets == 0
+    assert db_session.query(AssetQualityScore).filter_by(import_batch_id=batch_id).count() == batch.analyzed_assets
+    assert batch.analyzed_assets >= expected_analyzed
+    if expected_status == "failed":
+        assert "resume=true" in batch.error_message
+
+
+def test_analyze_batch_reuses_cached_results_across_batches(client, db_session):
+    """Assets already scored in another batch are not downloaded again"""
+    first_batch_id = _create_batch(db_session, ["asset-1"])
+    second_batch_id = _create_batch(db_session, ["asset-1-reimport"])
+
+    img = Image.new('RGB', (64, 64), color='blue')
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG')
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z", "checksum": "sha1-abc"}
+            mock_fetch_image.return_value = buffer.getvalue()
+
+            client.post(f"/batches/{first_batch_id}/analyze")
+            assert mock_fetch_image.call_count == 1
+
+            client.post(f"/batches/{second_batch_id}/analyze")
+            assert mock_fetch_image.call_count == 1  # Served from cache
+
+    db_session.expire_all()
+    first = db_session.query(AssetQualityScore).filter_by(import_batch_id=first_batch_id).one()
+    second = db_session.query(AssetQualityScore).filter_by(import_batch_id=second_batch_id).one()
+    assert second.immich_asset_id == "asset-1-reimport"
+    assert second.overall_quality == first.overall_quality
+    assert second.blur_score == first.blur_score
+    assert db_session.query(QualityResultCache).count() == 1
+
+    status_data = client.get(f"/batches/{second_batch_id}/status").json()
+    assert status_data["analyzed_assets"] == 1
+
+
+def test_analyze_batch_cache_ignores_other_analyzer_versions(client, db_session):
+    batch_id = _create_batch(db_session, ["asset-1"])
+    db_session.add(QualityResultCache(
+        checksum="sha1-abc", analyzer_version="0/original/1440/reduced", overall_quality=99.0
+    ))
+    db_session.commit()
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_metadata.return_value = {"fileCreatedAt": "2025-01-01T12:00:00Z", "checksum": "sha1-abc"}
+            mock_fetch_image.return_value = b"corrupted"
+            client.post(f"/batches/{batch_id}/analyze")
+
+    assert mock_fetch_image.call_count == 1
+    db_session.expire_all()
+    score = db_session.query(AssetQualityScore).filter_by(import_batch_id=batch_id).one()
+    assert score.is_corrupted is True
+
+
+def test_analyze_batch_skips_assets_without_metadata(client, db_session):
+    batch_id = _create_batch(db_session, ["asset-1", "asset-gone"])
+
+    def fetch_metadata(client, asset_id):
+        if asset_id == "asset-gone":
+            raise HTTPException(status_code=500, detail="not found")
+        return {"fileCreatedAt": "2025-01-01T12:00:00Z"}
+
+    with patch("src.main.fetch_asset_metadata", side_effect=fetch_metadata):
+        with patch("src.main.fetch_image_from_immich") as mock_fetch_image:
+            mock_fetch_image.return_value = b"corrupted"
+            client.post(f"/batches/{batch_id}/analyze")
+
+    mock_fetch_image.assert_called_once()
+    data = client.get(f"/batches/{batch_id}/status").json()
+    assert data["analyzed_assets"] == 1
+    assert data["skipped_assets"] == 1
+
+
 def test_get_batch_status_not_found(client):
     """Test getting status for non-existent batch returns 404"""
     batch_id = "00000000-0000-0000-0000-000000000000"
@@ -232,6 +1281,27 @@ def test_get_batch_status_processing(client, db_session):
     assert data["analyzed_assets"] == 2
     assert data["skipped_assets"] == 1
     assert data["progress_percent"] == 40.0  # 2/5 * 100
+    assert data["eta_seconds"] is None  # No throughput measured yet
+
+
+def test_get_batch_status_eta(client, db_session):
+    """ETA is derived from the smoothed per-asset throughput"""
+    batch = ImportBatch(
+        immich_user_id="user-123",
+        asset_ids=[f"asset-{i}" for i in range(10)],
+        status="processing",
+        total_assets=10,
+        analyzed_assets=3,
+        skipped_assets=1,
+        started_at=datetime.utcnow(),
+        seconds_per_asset=1.5
+    )
+    db_session.add(batch)
+    db_session.commit()
+
+    data = client.get(f"/batches/{batch.id}/status").json()
+
+    assert data["eta_seconds"] == 9  # 6 remaining * 1.5s
 
 
 def test_get_batch_status_complete(client, db_session):
@@ -353,6 +1423,261 @@ def test_get_quality_scores_success(client, db_session):
     assert data[2]["exposure_score"] is None
 
 
+def test_rescore_quality_scores(client, db_session):
+    """Stored scores are recomputed from their features with the current settings"""
+    batch_id = _create_batch(db_session, ["asset-1", "asset-2"])
+    features = {'laplacian_variance': 50.0, 'working_long_edge': 1440, 'mean_brightness': 128.0, 'brightness_std': 50.0}
+    db_session.add(AssetQualityScore(
+        immich_asset_id="asset-1", import_batch_id=batch_id,
+        blur_score=50.0, exposure_score=100.0, overall_quality=70.0, **features
+    ))
+    db_session.add(AssetQualityScore(
+        immich_asset_id="asset-2", import_batch_id=batch_id, overall_quality=0.0, is_corrupted=True
+    ))
+    db_session.add(QualityResultCache(
+        checksum="sha1-a", analyzer_version="v1",
+        blur_score=50.0, exposure_score=100.0, overall_quality=70.0, **features
+    ))
+    db_session.commit()
+
+    with patch("src.main.settings.QUALITY_BLUR_THRESHOLD", 200.0):
+        with patch("src.main.settings.QUALITY_BLUR_WEIGHT", 0.5):
+            response = client.post("/quality-scores/rescore")
+
+    assert response.status_code == 200
+    assert response.json() == {"rescored_scores": 1, "rescored_cache_entries": 1}
+    db_session.expire_all()
+    score = db_session.query(AssetQualityScore).filter_by(immich_asset_id="asset-1").one()
+    assert (score.blur_score, score.exposure_score, score.overall_quality) == (25.0, 100.0, 62.5)
+    assert db_session.query(QualityResultCache).one().overall_quality == 62.5
+
+
+def test_rescore_quality_scores_refreshes_triage(client, db_session):
+    """Re-scoring moves photos across the low-quality threshold on the dashboard"""
+    batch_id = _create_batch(db_session, ["asset-1"])
+    db_session.add(AssetQualityScore(
+        immich_asset_id="asset-1", import_batch_id=batch_id, overall_quality=70.0, file_size_bytes=1000,
+        laplacian_variance=50.0, working_long_edge=1440, mean_brightness=128.0, brightness_std=50.0
+    ))
+    db_session.commit()
+    assert client.get(f"/triage/{batch_id}").json()["categories"] == []
+
+    with patch("src.main.settings.TRIAGE_LOW_QUALITY_THRESHOLD", 75.0):
+        client.post("/quality-scores/rescore")
+
+    assert client.get(f"/triage/{batch_id}").json()["categories"] == [
+        {"category_type": "low_quality", "count": 1, "estimated_savings_bytes": 1000, "badge_color": "orange"}
+    ]
+
+
+def test_rescore_quality_scores_refreshes_burst_recommendations(client, db_session):
+    """The best shot of a burst follows the re-computed scores"""
+    batch_id = _create_batch(db_session, ["asset-1", "asset-2"])
+    for asset_id, overall_quality, variance, second in [("asset-1", 90.0, 10.0, 0), ("asset-2", 10.0, 200.0, 1)]:
+        db_session.add(AssetQualityScore(
+            immich_asset_id=asset_id, import_batch_id=batch_id, overall_quality=overall_quality,
+            captured_at=datetime(2025, 1, 1, 12, 0, second), laplacian_variance=variance,
+            working_long_edge=1440, mean_brightness=128.0, brightness_std=50.0
+        ))
+    db_session.commit()
+    detect_batch_bursts(db_session, batch_id)
+    db_session.commit()
+    assert db_session.query(BurstSequence).one().recommended_asset_id == "asset-1"
+
+    with patch("src.main.update_burst_index") as mock_index:
+        client.post("/quality-scores/rescore")
+
+    db_session.expire_all()
+    assert db_session.query(BurstSequence).one().recommended_asset_id == "asset-2"
+    # Burst membership doesn't depend on scores; only recommendations are updated
+    mock_index.assert_not_called()
+
+
+def _jpeg_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, 100), color=color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def _seed_versioned_scores(db_session):
+    """Two batches, already burst-indexed, with scores from the current, an older and no recorded analyzer version"""
+    batch_a = _create_batch(db_session, ["asset-1", "asset-2", "asset-3"])
+    batch_b = _create_batch(db_session, ["asset-4"])
+    captured_at = datetime(2025, 1, 1, 12, 0, 0)
+    for batch_id, asset_id, version in [
+        (batch_a, "asset-1", None),
+        (batch_a, "asset-2", current_analyzer_version()),
+        (batch_a, "asset-3", "0/original/1440/reduced"),
+        (batch_b, "asset-4", "0/original/1440/reduced"),
+    ]:
+        db_session.add(AssetQualityScore(
+            immich_asset_id=asset_id, import_batch_id=batch_id, overall_quality=1.0,
+            analyzer_version=version, captured_at=captured_at
+        ))
+    db_session.commit()
+    for batch_id in (batch_a, batch_b):
+        detect_batch_bursts(db_session, batch_id)
+    db_session.commit()
+    return batch_a, batch_b
+
+
+def test_reanalysis_updates_only_stale_scores(client, db_session):
+    """Stale scores are re-analyzed; duplicates come from the cache and unavailable assets are counted"""
+    batch_a, batch_b = _seed_versioned_scores(db_session)
+    metadata = {
+        "asset-1": {"id": "asset-1", "checksum": "sha1-same"},
+        "asset-4": {"id": "asset-4", "checksum": "sha1-same"},
+    }
+
+    async def fetch_metadata(client, asset_id):
+        if asset_id not in metadata:
+            raise HTTPException(status_code=404, detail="Asset not found")
+        return metadata[asset_id]
+
+    with patch("src.main.settings.REANALYSIS_ASSETS_PER_SECOND", 0.0):
+        with patch("src.main.settings.ANALYSIS_PROGRESS_INTERVAL", 2):
+            with patch("src.main.fetch_asset_metadata", side_effect=fetch_metadata):
+                with patch("src.main.fetch_image_from_immich", return_value=_jpeg_bytes()) as mock_fetch:
+                    response = client.post("/reanalysis")
+    status_response = client.get("/reanalysis")
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "running"
+    data = status_response.json()
+    assert data["status"] == "complete"
+    assert data["analyzer_version"] == current_analyzer_version()
+    assert data["stale_assets"] == 3
+    assert data["reanalyzed_assets"] == 2
+    assert data["failed_assets"] == 1
+    assert data["progress_percent"] == 100.0
+    assert data["eta_seconds"] is None
+    # asset-4 has the same content as asset-1
+    mock_fetch.assert_called_once()
+
+    db_session.expire_all()
+    scores = {score.immich_asset_id: score for score in db_session.query(AssetQualityScore).all()}
+    assert scores["asset-1"].analyzer_version == current_analyzer_version()
+    assert scores["asset-1"].overall_quality == scores["asset-4"].overall_quality != 1.0
+    assert scores["asset-1"].captured_at == datetime(2025, 1, 1, 12, 0, 0)
+    assert scores["asset-2"].overall_quality == 1.0
+    assert scores["asset-3"].analyzer_version == "0/original/1440/reduced"
+    # Bursts of the affected batch are re-detected from the new scores
+    bursts = db_session.query(BurstSequence).filter_by(import_batch_id=batch_a).all()
+    assert len(bursts) == 1
+    assert bursts[0].recommended_asset_id == "asset-1"
+
+
+def test_reanalysis_idle_before_first_run(client):
+    assert client.get("/reanalysis").json() == ReanalysisStatus(status="idle").model_dump()
+
+
+def test_reanalysis_already_running(client, db_session):
+    """A job running on any instance, with a fresh heartbeat, cannot be started again"""
+    db_session.add(ReanalysisJob(id=crud.REANALYSIS_JOB_ID, status="running", heartbeat_at=datetime.utcnow()))
+    db_session.commit()
+
+    with patch("src.main.run_reanalysis") as mock_run:
+        response = client.post("/reanalysis")
+
+    assert response.status_code == 409
+    mock_run.assert_not_called()
+
+
+def test_reanalysis_takes_over_dead_job(client, db_session):
+    """A running job whose heartbeat went stale is restarted with fresh progress"""
+    db_session.add(ReanalysisJob(
+        id=crud.REANALYSIS_JOB_ID, status="running", stale_assets=10, reanalyzed_assets=4,
+        heartbeat_at=datetime.utcnow() - timedelta(hours=1)
+    ))
+    db_session.commit()
+
+    with patch("src.main.run_reanalysis") as mock_run:
+        response = client.post("/reanalysis")
+
+    assert response.status_code == 202
+    assert response.json()["reanalyzed_assets"] == 0
+    mock_run.assert_called_once()
+
+
+def test_reanalysis_status_reports_running_progress(client, db_session):
+    db_session.add(ReanalysisJob(
+        id=crud.REANALYSIS_JOB_ID, status="running", analyzer_version="v2", stale_assets=10,
+        reanalyzed_assets=3, failed_assets=1, seconds_per_asset=2.0, heartbeat_at=datetime.utcnow()
+    ))
+    db_session.commit()
+
+    data = client.get("/reanalysis").json()
+
+    assert data["status"] == "running"
+    assert data["progress_percent"] == 40.0
+    assert data["eta_seconds"] == 12
+
+
+def test_reanalysis_stops_on_immich_outage(client, db_session):
+    _seed_versioned_scores(db_session)
+
+    with patch("src.main.settings.REANALYSIS_ASSETS_PER_SECOND", 0.0):
+        with patch("src.main.fetch_asset_metadata", return_value={"id": "asset"}):
+            with patch("src.main.fetch_image_from_immich", side_effect=ImmichUnavailableError("Immich is down")):
+                client.post("/reanalysis")
+    data = client.get("/reanalysis").json()
+
+    assert data["status"] == "failed"
+    assert "Immich is down" in data["error_message"]
+    db_session.expire_all()
+    assert db_session.query(AssetQualityScore).filter_by(analyzer_version=None).count() == 1
+
+
+def test_reanalysis_redetects_bursts_of_committed_chunks(client, db_session):
+    """Chunks committed before an outage already have their bursts re-detected"""
+    _seed_versioned_scores(db_session)
+    fetched = []
+
+    async def fetch_image(client, asset_id, rendition=None):
+        fetched.append(asset_id)
+        if len(fetched) == 3:
+            raise ImmichUnavailableError("Immich is down")
+        return _jpeg_bytes()
+
+    with patch("src.main.settings.REANALYSIS_ASSETS_PER_SECOND", 0.0):
+        with patch("src.main.settings.ANALYSIS_PROGRESS_INTERVAL", 1):
+            with patch("src.main.fetch_asset_metadata", side_effect=lambda client, asset_id: {"id": asset_id}):
+                with patch("src.main.fetch_image_from_immich", side_effect=fetch_image):
+                    with patch("src.main.detect_batch_bursts", wraps=detect_batch_bursts) as mock_detect:
+                        client.post("/reanalysis")
+    assert client.get("/reanalysis").json()["status"] == "failed"
+
+    db_session.expire_all()
+    assert sorted(call.args[2][0] for call in mock_detect.call_args_list) == sorted(fetched[:2])
+    assert db_session.query(BurstSequence).one().recommended_asset_id in fetched[:2]
+
+
+@pytest.mark.asyncio
+async def test_reanalysis_is_throttled(db_session):
+    """Asset starts are spaced to the configured rate"""
+    _seed_versioned_scores(db_session)
+    started = []
+
+    async def fetch_image(client, asset_id, rendition=None):
+        started.append(asyncio.get_running_loop().time())
+        if asset_id == "asset-3":
+            raise HTTPException(status_code=404, detail="Asset not found")
+        return _jpeg_bytes()
+
+    assert crud.claim_reanalysis_job(db_session, current_analyzer_version(), datetime.utcnow())
+    with patch("src.main.settings.REANALYSIS_ASSETS_PER_SECOND", 20.0):
+        with patch("src.main.fetch_asset_metadata", side_effect=lambda client, asset_id: {"id": asset_id}):
+            with patch("src.main.fetch_image_from_immich", side_effect=fetch_image):
+                await run_reanalysis(TestingSessionLocal)
+
+    db_session.expire_all()
+    job = crud.get_reanalysis_job(db_session)
+    assert job.status == "complete"
+    assert (job.reanalyzed_assets, job.failed_assets) == (2, 1)
+    assert len(started) == 3
+    assert started[-1] - started[0] >= 2 / 20.0 * 0.9
+
+
 def test_get_bursts_not_found(client):
     """Test getting bursts for non-existent batch returns 404"""
     batch_id = "00000000-0000-0000-0000-000000000000"
@@ -429,3 +1754,210 @@ def test_get_bursts_success(client, db_session):
     # Check second burst
     assert len(data[1]["immich_asset_ids"]) == 2
     assert data[1]["recommended_asset_id"] == "asset-5"
+
+def test_get_bursts_includes_bursts_continued_from_earlier_batch(client, db_session):
+    """A burst spanning two uploads is listed for both batches"""
+    first = _create_batch(db_session, ["asset-1"])
+    second = _create_batch(db_session, ["asset-2"])
+    captured_at = datetime(2025, 1, 1, 12, 0, 0)
+    for batch_id, asset_id, offset in [(first, "asset-1", 0), (second, "asset-2", 1)]:
+        db_session.add(AssetQualityScore(
+            immich_asset_id=asset_id, import_batch_id=batch_id, overall_quality=50.0,
+            captured_at=captured_at + timedelta(seconds=offset)
+        ))
+        db_session.commit()
+        detect_batch_bursts(db_session, batch_id)
+        db_session.commit()
+
+    for batch_id in (first, second):
+        data = client.get(f"/batches/{batch_id}/bursts").json()
+        assert [burst["immich_asset_ids"] for burst in data] == [["asset-1", "asset-2"]]
+
+
+# Two bursts, the first crossing the boundary between the first two shards of two
+SHARDED_TIMESTAMPS = {
+    "asset-e": "2025-01-01T12:00:30Z",
+    "asset-a": "2025-01-01T12:00:00Z",
+    "asset-c": "2025-01-01T12:00:02Z",
+    "asset-b": "2025-01-01T12:00:01Z",
+    "asset-f": "2025-01-01T12:00:31Z",
+}
+
+
+async def _sharded_metadata(client, asset_id):
+    if asset_id == "asset-x":
+        raise HTTPException(status_code=404)
+    return {"fileCreatedAt": SHARDED_TIMESTAMPS[asset_id], "exifInfo": {"fileSizeInByte": 1000}}
+
+
+def _batch_results(db_session, batch_id):
+    db_session.expire_all()
+    batch = db_session.query(ImportBatch).filter_by(id=batch_id).first()
+    scores = {
+        score.immich_asset_id: (score.overall_quality, score.captured_at)
+        for score in db_session.query(AssetQualityScore).filter_by(import_batch_id=batch_id)
+    }
+    bursts = sorted(sorted(burst.immich_asset_ids) for burst in db_session.query(BurstSequence).filter_by(import_batch_id=batch_id))
+    triage = {
+        row.category_type: (row.count, row.estimated_savings_bytes)
+        for row in db_session.query(BatchTriageStats).filter_by(import_batch_id=batch_id)
+    }
+    return batch.status, batch.analyzed_assets, batch.skipped_assets, scores, bursts, triage
+
+
+def test_plan_shards_orders_by_capture_time():
+    """Shards hold consecutive capture times; assets without metadata go last"""
+    metadata = {asset_id: {"fileCreatedAt": timestamp} for asset_id, timestamp in SHARDED_TIMESTAMPS.items()}
+
+    shards = plan_shards(["asset-x"] + list(SHARDED_TIMESTAMPS), metadata, 2)
+
+    assert shards == [["asset-a", "asset-b"], ["asset-c", "asset-e"], ["asset-f", "asset-x"]]
+
+
+def test_analyze_batch_sharded_matches_serial(client, db_session):
+    """A sharded batch ends with the scores, progress and bursts of a serial run"""
+    asset_ids = list(SHARDED_TIMESTAMPS) + ["asset-x"]
+    serial_id = _create_batch(db_session, asset_ids, user_id="user-serial")
+    sharded_id = _create_batch(db_session, asset_ids, user_id="user-sharded")
+
+    with patch("src.main.fetch_asset_metadata", side_effect=_sharded_metadata):
+        with patch("src.main.fetch_image_from_immich", return_value=b"corrupted"):
+            client.post(f"/batches/{serial_id}/analyze")
+            with patch("src.main.settings.ANALYSIS_SHARD_SIZE", 2):
+                with patch("src.main.settings.ANALYSIS_PROGRESS_INTERVAL", 1):
+                    client.post(f"/batches/{sharded_id}/analyze")
+
+    shards = db_session.query(BatchShard).filter_by(import_batch_id=sharded_id).order_by(BatchShard.shard_index).all()
+    assert [(shard.asset_ids, shard.status) for shard in shards] == [
+        (["asset-a", "asset-b"], "complete"), (["asset-c", "asset-e"], "complete"), (["asset-f", "asset-x"], "complete")
+    ]
+    serial = _batch_results(db_session, serial_id)
+    assert serial[:3] == ("complete", 5, 1)
+    assert serial[4] == [["asset-a", "asset-b", "asset-c"], ["asset-e", "asset-f"]]
+    assert serial[5] == {"corrupted": (5, 5000), "burst_sequences": (3, 3000)}
+    assert _batch_results(db_session, sharded_id) == serial
+
+    # Re-running a sharded batch starts over with fresh shards
+    with patch("src.main.fetch_asset_metadata", side_effect=_sharded_metadata):
+        with patch("src.main.fetch_image_from_immich", return_value=b"corrupted"):
+            with patch("src.main.settings.ANALYSIS_SHARD_SIZE", 3):
+                client.post(f"/batches/{sharded_id}/analyze")
+
+    db_session.expire_all()
+    assert db_session.query(BatchShard).filter_by(import_batch_id=sharded_id).count() == 2
+    assert _batch_results(db_session, sharded_id) == serial
+
+
+def test_sharded_batch_stops_on_immich_outage_and_resumes(client, db_session):
+    """An outage fails the shard and its batch; resuming retries only the failed shard"""
+    batch_id = _create_batch(db_session, list(SHARDED_TIMESTAMPS))
+
+    async def fetch_image(client, asset_id, rendition=None):
+        if asset_id == "asset-c":
+            raise ImmichUnavailableError("Immich unavailable")
+        return b"corrupted"
+
+    with patch("src.main.fetch_asset_metadata", side_effect=_sharded_metadata):
+        with patch("src.main.fetch_image_from_immich", side_effect=fetch_image):
+            with patch("src.main.settings.ANALYSIS_SHARD_SIZE", 2):
+                client.post(f"/batches/{batch_id}/analyze")
+
+    db_session.expire_all()
+    batch = db_session.query(ImportBatch).filter_by(id=batch_id).first()
+    assert batch.status == "failed"
+    assert "resume=true" in batch.error_message
+    shards = db_session.query(BatchShard).filter_by(import_batch_id=batch_id).order_by(BatchShard.shard_index).all()
+    assert [shard.status for shard in shards] == ["complete", "failed", "pending"]
+    assert shards[1].error_message == "Immich unavailable"
+
+    with patch("src.main.fetch_asset_metadata", side_effect=_sharded_metadata) as mock_metadata:
+        with patch("src.main.fetch_image_from_immich", return_value=b"corrupted") as mock_fetch_image:
+            client.post(f"/batches/{batch_id}/analyze?resume=true")
+
+    # Shards resumed without the planning run fetch their own metadata; the complete shard is kept
+    fetched = {call.args[1] for call in mock_metadata.call_args_list}
+    assert {"asset-c", "asset-f"} <= fetched <= {"asset-c", "asset-e", "asset-f"}
+    assert {call.args[1] for call in mock_fetch_image.call_args_list} == fetched
+    status, analyzed, skipped, scores, bursts, triage = _batch_results(db_session, batch_id)
+    assert (status, analyzed, skipped) == ("complete", 5, 0)
+    assert bursts == [["asset-a", "asset-b", "asset-c"], ["asset-e", "asset-f"]]
+
+
+@pytest.mark.asyncio
+async def test_run_batch_analysis_completes_sharded_batch_after_interruption(db_session):
+    """A resumed batch whose shards all completed is completed without analyzing anything"""
+    batch_id = _create_batch(db_session, ["asset-a"])
+    db_session.add(BatchShard(import_batch_id=batch_id, shard_index=0, asset_ids=["asset-a"], status="complete", analyzed_assets=1))
+    db_session.commit()
+
+    with patch("src.main.fetch_asset_metadata") as mock_metadata:
+        await run_batch_analysis(batch_id, lambda: TestingSessionLocal(), resume=True)
+
+    mock_metadata.assert_not_called()
+    assert _batch_results(db_session, batch_id)[:2] == ("complete", 1)
+
+
+@pytest.mark.asyncio
+async def test_run_batch_shard_failure_marks_batch_failed(db_session):
+    """An unexpected error fails the shard and its batch"""
+    batch_id = _create_batch(db_session, ["asset-a"])
+    shard = BatchShard(import_batch_id=batch_id, shard_index=0, asset_ids=["asset-a"], status="processing")
+    db_session.add(shard)
+    db_session.commit()
+
+    with patch("src.main.fetch_asset_metadata", side_effect=_sharded_metadata):
+        with patch("src.main.fetch_image_from_immich", return_value=b"corrupted"):
+            with patch("src.main.detect_batch_bursts", side_effect=RuntimeError("boom")):
+                await run_batch_shard(shard.id, lambda: TestingSessionLocal())
+
+    db_session.expire_all()
+    assert (shard.status, shard.error_message) == ("failed", "boom")
+    assert (shard.batch.status, shard.batch.error_message) == ("failed", "boom")
+
+
+@pytest.mark.asyncio
+async def test_watch_pending_shards_helps_with_any_batch():
+    """Every tick claims and analyzes shards of any batch, surviving errors"""
+    factory = MagicMock()
+
+    with patch("src.main.asyncio.sleep", side_effect=[None, None, asyncio.CancelledError()]):
+        with patch("src.main.run_claimed_shards", side_effect=[OperationalError("down", None, None), None]) as mock_run:
+            with pytest.raises(asyncio.CancelledError):
+                await watch_pending_shards(factory)
+
+    assert [call.args for call in mock_run.call_args_list] == [(factory,), (factory,)]
+
+
+def test_get_triage_dashboard_not_found(client):
+    """Test getting the dashboard for non-existent batch returns 404"""
+    batch_id = "00000000-0000-0000-0000-000000000000"
+    response = client.get(f"/triage/{batch_id}")
+    assert response.status_code == 404
+    assert "not found" in response.json()["detail"].lower()
+
+
+def test_get_triage_dashboard_after_analysis(client, db_session):
+    """Categories are totalled while results are written, with savings from Immich's file sizes"""
+    batch_id = _create_batch(db_session, ["asset-1", "asset-2", "asset-3"])
+    sizes = {"asset-1": 1000, "asset-2": 2000, "asset-3": None}
+
+    async def metadata(client, asset_id):
+        return {"fileCreatedAt": "2025-01-01T12:00:00Z", "exifInfo": {"fileSizeInByte": sizes[asset_id]}}
+
+    with patch("src.main.fetch_asset_metadata", side_effect=metadata):
+        with patch("src.main.fetch_image_from_immich", return_value=b"corrupted"):
+            with patch("src.main.detect_batch_bursts"):
+                client.post(f"/batches/{batch_id}/analyze")
+
+    response = client.get(f"/triage/{batch_id}")
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "categories": [
+            {"category_type": "corrupted", "count": 3, "estimated_savings_bytes": 3000, "badge_color": "green"}
+        ],
+        "total_assets": 3,
+        "analyzed_assets": 3
+    }
+    db_session.expire_all()
+    assert db_session.query(AssetQualityScore).filter_by(immich_asset_id="asset-3").one().file_size_bytes is None
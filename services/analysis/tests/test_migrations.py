@@ -41,6 +41,18 @@ def test_migrations_run_successfully():
         assert "asset_quality_scores" in tables
         assert "burst_sequences" in tables
         assert "triage_actions" in tables
+        assert "quality_result_cache" in tables
+        assert "reanalysis_jobs" in tables
+
+        batch_columns = {c["name"] for c in inspector.get_columns("import_batches")}
+        score_columns = {c["name"] for c in inspector.get_columns("asset_quality_scores")}
+        assert "heartbeat_at" in batch_columns
+        assert "captured_at" in score_columns
+        assert "analyzer_version" in score_columns
+        cache_columns = {c["name"] for c in inspector.get_columns("quality_result_cache")}
+        for feature in ("laplacian_variance", "working_long_edge", "mean_brightness", "brightness_std"):
+            assert feature in score_columns
+            assert feature in cache_columns
 
         engine.dispose()
     finally:
@@ -103,6 +115,7 @@ def test_migrations_upgrade_downgrade():
         assert "asset_quality_scores" not in tables
         assert "burst_sequences" not in tables
         assert "triage_actions" not in tables
+        assert "quality_result_cache" not in tables
 
         engine.dispose()
     finally:
@@ -0,0 +1,37 @@
+import numpy as np
+from PIL import Image
+
+from src.quality.perceptual_hash import dhash, hamming_distances
+
+
+def _scene(seed, size=(240, 320)):
+    """Smooth random scene, so resized renditions keep their structure."""
+    coarse = np.random.default_rng(seed).integers(0, 256, (6, 8), dtype=np.uint8)
+    return np.asarray(Image.fromarray(coarse).resize(size[::-1], Image.Resampling.BICUBIC))
+
+
+def test_dhash_is_stable_across_renditions():
+    original = _scene(1)
+    thumbnail = np.asarray(Image.fromarray(original).resize((80, 60), Image.Resampling.BOX))
+
+    assert hamming_distances(dhash(original), dhash(thumbnail)) <= 4
+
+
+def test_dhash_separates_different_scenes():
+    distance = hamming_distances(dhash(_scene(1)), dhash(_scene(2)))
+
+    assert distance > 16
+
+
+def test_dhash_fits_signed_64_bits():
+    # Every pixel brighter than its left neighbour sets all 64 bits
+    gradient = np.tile(np.arange(0, 252, 28, dtype=np.uint8), (8, 1))
+
+    assert dhash(gradient) == -1
+    assert dhash(np.zeros((8, 9), dtype=np.uint8)) == 0
+
+
+def test_hamming_distances_element_wise():
+    distances = hamming_distances(np.array([0, -1, 0b1011]), np.array([0, 0, 0b0001]))
+
+    assert distances.tolist() == [0, 64, 2]
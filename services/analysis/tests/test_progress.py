@@ -0,0 +1,58 @@
+import pytest
+from src.progress import ThroughputTracker, estimate_eta_seconds
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def test_tracker_starts_without_estimate(clock):
+    tracker = ThroughputTracker(clock=clock)
+    assert tracker.seconds_per_asset is None
+
+
+def test_tracker_first_sample(clock):
+    tracker = ThroughputTracker(clock=clock)
+    clock.now = 10.0
+
+    assert tracker.record(5) == 2.0
+
+
+def test_tracker_smooths_samples(clock):
+    tracker = ThroughputTracker(smoothing=0.5, clock=clock)
+    clock.now = 10.0
+    tracker.record(10)  # 1.0 s/asset
+    clock.now = 40.0
+    result = tracker.record(20)  # 3.0 s/asset
+
+    assert result == pytest.approx(2.0)
+
+
+def test_tracker_ignores_calls_without_progress(clock):
+    tracker = ThroughputTracker(clock=clock)
+    clock.now = 4.0
+    tracker.record(4)
+    clock.now = 100.0
+
+    assert tracker.record(4) == 1.0
+
+
+def test_estimate_eta_seconds():
+    assert estimate_eta_seconds(10, 1.25) == 12
+
+
+def test_estimate_eta_seconds_unknown_throughput():
+    assert estimate_eta_seconds(10, None) is None
+
+
+def test_estimate_eta_seconds_never_negative():
+    assert estimate_eta_seconds(-3, 2.0) == 0
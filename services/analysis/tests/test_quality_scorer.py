@@ -1,5 +1,8 @@
+import io
 import pytest
+from unittest.mock import patch
 import numpy as np
+import cv2
 from PIL import Image
 from src.quality.scorer import QualityScorer
 
@@ -79,3 +82,265 @@ def test_analyze_valid_image_bytes(quality_scorer):
     assert result['blur_score'] is not None
     assert result['exposure_score'] is not None
     assert result['overall_quality'] > 0.0
+
+
+def test_working_size_defaults_to_native_resolution(quality_scorer):
+    assert quality_scorer.working_size is None
+    assert quality_scorer.blur_detector.reference_size is None
+
+
+def test_working_size_downscales_large_images():
+    scorer = QualityScorer(working_size=100)
+    img = Image.fromarray(np.random.randint(0, 255, (300, 400, 3), dtype=np.uint8))
+
+    resized = scorer._to_working_resolution(img)
+
+    assert max(resized.size) == 100
+    assert img.size == (400, 300)  # Caller's image is left untouched
+
+
+def test_working_size_keeps_small_images(high_quality_image):
+    scorer = QualityScorer(working_size=1440)
+    assert scorer._to_working_resolution(high_quality_image) is high_quality_image
+
+
+def test_working_size_makes_renditions_comparable():
+    """An original and its preview-sized rendition score alike"""
+    rng = np.random.default_rng(1)
+    original = np.full((1600, 2400), 90, dtype=np.uint8)
+    for _ in range(400):
+        x, y = rng.integers(0, 2400), rng.integers(0, 1600)
+        original[y:y + 80, x:x + 120] = rng.integers(0, 255)
+    original_image = Image.fromarray(original)
+    preview_image = original_image.resize((1200, 800), Image.Resampling.BOX)
+
+    scorer = QualityScorer(working_size=1200)
+    original_result = scorer.analyze_image(original_image)
+    preview_result = scorer.analyze_image(preview_image)
+
+    assert original_result['blur_score'] == pytest.approx(preview_result['blur_score'], abs=1.0)
+    assert original_result['exposure_score'] == pytest.approx(preview_result['exposure_score'], abs=1.0)
+
+
+def _natural_scene(height, width):
+    """1/f noise, whose power spectrum resembles that of natural photos"""
+    rng = np.random.default_rng(0)
+    radius = np.hypot(np.fft.fftfreq(height)[:, None], np.fft.fftfreq(width)[None, :])
+    radius[0, 0] = 1.0
+    scene = np.real(np.fft.ifft2((rng.normal(size=radius.shape) + 1j * rng.normal(size=radius.shape)) / radius))
+    return cv2.normalize(scene, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+
+@pytest.mark.parametrize("sigma", [2.0, 4.0])
+def test_working_size_makes_renditions_agree_on_blurred_photos(sigma):
+    """An original blurred at its own scale and its preview get the same verdict; its thumbnail does not"""
+    original = cv2.GaussianBlur(_natural_scene(2160, 2880), (0, 0), sigma)
+    preview = cv2.resize(original, (1440, 1080), interpolation=cv2.INTER_AREA)
+    thumbnail = cv2.resize(original, (250, 188), interpolation=cv2.INTER_AREA)
+    scorer = QualityScorer(working_size=1440)
+
+    original_result, preview_result, thumbnail_result = (
+        scorer.analyze_image(Image.fromarray(rendition)) for rendition in (original, preview, thumbnail)
+    )
+
+    assert original_result['blur_score'] < 50.0
+    assert preview_result['blur_score'] == pytest.approx(original_result['blur_score'], abs=2.0)
+    # Downscaling to thumbnail size hides the blur, hence no thumbnail scoring
+    assert thumbnail_result['blur_score'] > original_result['blur_score'] + 30.0
+
+
+def test_analyze_image_bytes_decodes_once(quality_scorer):
+    img = Image.fromarray(np.random.randint(0, 255, (80, 80, 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+
+    with patch("src.quality.corruption_detector.Image.open", wraps=Image.open) as mock_open:
+        result = quality_scorer.analyze_image_bytes(buffer.getvalue())
+
+    assert mock_open.call_count == 1
+    assert result['is_corrupted'] is False
+
+
+def test_analyze_grayscale_shares_array_between_metrics(quality_scorer, high_quality_image):
+    gray = np.asarray(high_quality_image.convert("L"))
+
+    result = quality_scorer.analyze_grayscale(gray)
+
+    assert result['blur_score'] == quality_scorer.blur_detector.score_grayscale(gray)
+    assert result['exposure_score'] == quality_scorer.exposure_analyzer.score_grayscale(gray)
+
+
+def test_analyze_palette_image(quality_scorer, high_quality_image):
+    """Palette images are scored on luminance, not palette indices"""
+    palette_image = high_quality_image.convert("P")
+    result = quality_scorer.analyze_image(palette_image)
+    expected = quality_scorer.analyze_image(palette_image.convert("RGB"))
+
+    assert result['blur_score'] == pytest.approx(expected['blur_score'])
+
+
+def _encoded_scene(width, height):
+    rng = np.random.default_rng(2)
+    img = np.full((height, width, 3), 110, dtype=np.uint8)
+    for _ in range(300):
+        x, y = rng.integers(0, width), rng.integers(0, height)
+        img[y:y + height // 12, x:x + width // 12] = rng.integers(0, 255, 3)
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def test_reduced_decode_matches_full_decode():
+    """Scores from DCT-scaled decoding match decoding at full size"""
+    image_bytes = _encoded_scene(4000, 3000)
+
+    reduced = QualityScorer(working_size=800).analyze_image_bytes(image_bytes)
+    full = QualityScorer(working_size=800, reduced_decode=False).analyze_image_bytes(image_bytes)
+
+    assert reduced['blur_score'] == pytest.approx(full['blur_score'], abs=5.0)
+    assert reduced['exposure_score'] == pytest.approx(full['exposure_score'], abs=1.0)
+
+
+def test_reduced_decode_bounds_decoded_size():
+    image_bytes = _encoded_scene(4000, 3000)
+    scorer = QualityScorer(working_size=800)
+
+    with patch.object(scorer, "analyze_image", wraps=scorer.analyze_image) as mock_analyze:
+        scorer.analyze_image_bytes(image_bytes)
+
+    decoded = mock_analyze.call_args.args[0]
+    assert max(decoded.size) == 1000  # 1/4 DCT scale, not 4000px
+
+
+def test_scores_independent_of_source_resolution():
+    """The same scene encoded at different camera resolutions scores alike"""
+    scorer = QualityScorer(working_size=800)
+    high_res = scorer.analyze_image_bytes(_encoded_scene(4000, 3000))
+    low_res = scorer.analyze_image_bytes(_encoded_scene(1600, 1200))
+
+    assert high_res['blur_score'] == pytest.approx(low_res['blur_score'], abs=10.0)
+
+
+def test_analyze_batch_matches_per_frame_analysis(quality_scorer):
+    frames = np.random.normal(128, 40, (4, 64, 96)).clip(0, 255).astype(np.uint8)
+
+    results = quality_scorer.analyze_batch(frames)
+
+    assert len(results) == 4
+    for frame, result in zip(frames, results):
+        expected = quality_scorer.analyze_grayscale(frame)
+        assert result == pytest.approx(expected)
+
+
+def test_analyze_batch_accepts_list_of_frames(quality_scorer):
+    frames = [np.full((20, 30), value, dtype=np.uint8) for value in (10, 128)]
+
+    results = quality_scorer.analyze_batch(frames)
+
+    assert results[0]['exposure_score'] < results[1]['exposure_score']
+
+
+def test_analyze_batch_empty(quality_scorer):
+    assert quality_scorer.analyze_batch([]) == []
+
+
+def test_analyze_batch_rejects_mixed_sizes(quality_scorer):
+    with pytest.raises(ValueError):
+        quality_scorer.analyze_batch(np.zeros((2, 10, 10, 3), dtype=np.uint8))
+
+
+def test_analyze_batch_rejects_non_uint8(quality_scorer):
+    with pytest.raises(ValueError):
+        quality_scorer.analyze_batch(np.zeros((2, 10, 10), dtype=np.float32))
+
+
+def test_analyze_images_bytes_matches_per_image_analysis(quality_scorer):
+    """Same-size frames share one vectorized pass; results keep input order"""
+    images = [_encoded_scene(160, 120), b'corrupted', _encoded_scene(90, 120), _encoded_scene(160, 120)]
+
+    with patch.object(quality_scorer, "analyze_batch", wraps=quality_scorer.analyze_batch) as mock_batch:
+        results = quality_scorer.analyze_images_bytes(images)
+
+    assert results == [pytest.approx(quality_scorer.analyze_image_bytes(image)) for image in images]
+    assert sorted(len(call.args[0]) for call in mock_batch.call_args_list) == [1, 2]
+
+
+def test_analyze_images_bytes_empty(quality_scorer):
+    assert quality_scorer.analyze_images_bytes([]) == []
+
+
+def test_analyze_grayscale_reports_raw_features(quality_scorer):
+    gray = np.random.normal(128, 40, (64, 96)).clip(0, 255).astype(np.uint8)
+
+    result = quality_scorer.analyze_grayscale(gray)
+
+    assert result['working_long_edge'] == 96
+    assert result['mean_brightness'] == pytest.approx(gray.mean())
+    assert result['brightness_std'] == pytest.approx(gray.std())
+    assert result['laplacian_variance'] > 0
+
+
+def test_score_features_reproduces_analysis():
+    scorer = QualityScorer(working_size=128)
+    frames = np.random.normal(128, 40, (3, 48, 64)).clip(0, 255).astype(np.uint8)
+    results = scorer.analyze_batch(frames)
+
+    scores = scorer.score_features(
+        [result['laplacian_variance'] for result in results],
+        [result['working_long_edge'] for result in results],
+        [result['mean_brightness'] for result in results],
+        [result['brightness_std'] for result in results]
+    )
+
+    assert scores['blur_score'] == pytest.approx([result['blur_score'] for result in results])
+    assert scores['exposure_score'] == pytest.approx([result['exposure_score'] for result in results])
+    assert scores['overall_quality'] == pytest.approx([result['overall_quality'] for result in results])
+
+
+def test_blur_threshold_and_weight_are_configurable(high_quality_image):
+    gray = np.asarray(high_quality_image.convert("L"))
+    default = QualityScorer().analyze_grayscale(gray)
+
+    strict = QualityScorer(blur_threshold=default['laplacian_variance'] * 4).analyze_grayscale(gray)
+    blur_only = QualityScorer(blur_weight=1.0).analyze_grayscale(gray)
+
+    assert strict['blur_score'] == pytest.approx(25.0)
+    assert blur_only['overall_quality'] == pytest.approx(default['blur_score'])
+
+
+def test_blur_weight_must_be_a_fraction():
+    with pytest.raises(ValueError):
+        QualityScorer(blur_weight=1.5)
+
+
+@pytest.mark.parametrize("overall_quality,is_corrupted,expected", [
+    (10.0, False, False),
+    (34.9, False, False),
+    (35.0, False, True),
+    (50.0, False, True),
+    # High pre-screens are escalated: downscaling hides blur
+    (90.0, False, True),
+    (0.0, True, True),
+])
+def test_needs_full_analysis(overall_quality, is_corrupted, expected):
+    prescreen = {'overall_quality': overall_quality, 'is_corrupted': is_corrupted}
+    assert QualityScorer.needs_full_analysis(prescreen, threshold=50.0, band=15.0) is expected
+
+
+def test_analyze_grayscale_reports_perceptual_hash(quality_scorer):
+    gray = np.tile(np.arange(0, 252, 28, dtype=np.uint8), (8, 1))
+
+    assert quality_scorer.analyze_grayscale(gray)['perceptual_hash'] == -1
+
+
+def test_needs_full_analysis_escalates_blur_hidden_by_thumbnail():
+    """Downscaling hides blur: a blurred photo's sharp-looking thumbnail must not settle it"""
+    # Blurred at the original's scale
+    blurred = cv2.GaussianBlur(_natural_scene(1000, 1000), (0, 0), 1.5)
+    scorer = QualityScorer(working_size=1440)
+
+    full = scorer.analyze_grayscale(blurred)
+    thumbnail = scorer.analyze_grayscale(cv2.resize(blurred, (250, 250), interpolation=cv2.INTER_AREA))
+
+    assert full['overall_quality'] < 50.0 < thumbnail['overall_quality']
+    assert QualityScorer.needs_full_analysis(thumbnail, threshold=50.0, band=15.0)
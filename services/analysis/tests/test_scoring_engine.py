@@ -0,0 +1,206 @@
+import asyncio
+import io
+import cv2
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+from unittest.mock import patch
+from PIL import Image
+from src.quality import engine as engine_module
+from src.quality.engine import ScoringEngine, _init_worker, _score_file, _score_many, _score_shared
+from src.quality.scorer import QualityScorer
+
+
+@pytest.fixture
+def scoring_engine():
+    engine = ScoringEngine(max_workers=2)
+    yield engine
+    engine.shutdown()
+
+
+@pytest.fixture
+def jpeg_bytes():
+    img = np.random.normal(128, 30, (120, 160, 3)).clip(0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def test_engine_defaults_to_cpu_count():
+    engine = ScoringEngine()
+    assert engine.max_workers >= 1
+    assert engine.opencv_threads == 1
+
+
+@pytest.mark.asyncio
+async def test_engine_matches_in_process_scoring(scoring_engine, jpeg_bytes):
+    result = await scoring_engine.score(jpeg_bytes)
+    expected = QualityScorer().analyze_image_bytes(jpeg_bytes)
+
+    assert result == pytest.approx(expected)
+
+
+@pytest.mark.asyncio
+async def test_engine_scores_corrupted_bytes(scoring_engine):
+    result = await scoring_engine.score(b'corrupted')
+    assert result['is_corrupted'] is True
+
+
+@pytest.mark.asyncio
+async def test_engine_scores_empty_bytes(scoring_engine):
+    result = await scoring_engine.score(b'')
+    assert result['is_corrupted'] is True
+
+
+@pytest.mark.asyncio
+async def test_engine_restarts_after_shutdown(scoring_engine, jpeg_bytes):
+    await scoring_engine.score(jpeg_bytes)
+    scoring_engine.shutdown()
+    result = await scoring_engine.score(jpeg_bytes)
+
+    assert result['is_corrupted'] is False
+
+
+def test_shutdown_without_pool_is_noop():
+    ScoringEngine(max_workers=1).shutdown()
+
+
+def test_worker_scores_from_shared_memory(jpeg_bytes):
+    """Exercise the worker entry points in-process"""
+    original_threads = cv2.getNumThreads()
+    shm = shared_memory.SharedMemory(create=True, size=len(jpeg_bytes))
+    try:
+        _init_worker(1)
+        assert cv2.getNumThreads() == 1
+        assert isinstance(engine_module._worker_scorer, QualityScorer)
+
+        shm.buf[:len(jpeg_bytes)] = jpeg_bytes
+        analyze = engine_module._worker_scorer.analyze_image_bytes
+        with patch.object(engine_module._worker_scorer, "analyze_image_bytes", wraps=analyze) as mock_analyze:
+            result = _score_shared(shm.name, len(jpeg_bytes))
+
+        assert result['is_corrupted'] is False
+        assert result['overall_quality'] > 0
+        # Scored in place from a view of the block, not a copy
+        assert isinstance(mock_analyze.call_args.args[0], memoryview)
+    finally:
+        shm.close()
+        shm.unlink()
+        cv2.setNumThreads(original_threads)
+
+
+def test_worker_scores_memory_mapped_file(jpeg_bytes, tmp_path):
+    """Spilled downloads are scored from an mmap of the file"""
+    path = tmp_path / "image.download"
+    path.write_bytes(jpeg_bytes)
+    empty = tmp_path / "empty.download"
+    empty.write_bytes(b"")
+    original_threads = cv2.getNumThreads()
+    try:
+        _init_worker(1)
+        assert _score_file(str(path)) == pytest.approx(QualityScorer().analyze_image_bytes(jpeg_bytes))
+        assert _score_file(str(empty))['is_corrupted'] is True
+    finally:
+        cv2.setNumThreads(original_threads)
+
+
+@pytest.mark.asyncio
+async def test_engine_scores_file_path(scoring_engine, jpeg_bytes, tmp_path):
+    path = tmp_path / "image.download"
+    path.write_bytes(jpeg_bytes)
+
+    result = await scoring_engine.score(str(path))
+
+    assert result['is_corrupted'] is False
+
+
+@pytest.mark.asyncio
+async def test_engine_scores_many(scoring_engine, jpeg_bytes):
+    results = await scoring_engine.score_many([jpeg_bytes, b'corrupted', b''])
+
+    assert results[0] == pytest.approx(QualityScorer().analyze_image_bytes(jpeg_bytes))
+    assert [result['is_corrupted'] for result in results] == [False, True, True]
+
+
+def test_worker_scores_many_from_shared_memory(jpeg_bytes):
+    original_threads = cv2.getNumThreads()
+    packed = jpeg_bytes + b'corrupted'
+    shm = shared_memory.SharedMemory(create=True, size=len(packed))
+    try:
+        _init_worker(1)
+        shm.buf[:len(packed)] = packed
+        results = _score_many(shm.name, [len(jpeg_bytes), len(b'corrupted')])
+
+        assert results[0] == pytest.approx(QualityScorer().analyze_image_bytes(jpeg_bytes))
+        assert results[1]['is_corrupted'] is True
+    finally:
+        shm.close()
+        shm.unlink()
+        cv2.setNumThreads(original_threads)
+
+
+def _batching_engine(**kwargs):
+    engine = ScoringEngine(max_workers=1, **kwargs)
+
+    async def score_many(images):
+        return [{'overall_quality': float(len(image_data))} for image_data in images]
+
+    return engine, patch.object(engine, "score_many", side_effect=score_many)
+
+
+@pytest.mark.asyncio
+async def test_score_batched_collects_concurrent_requests():
+    engine, score_many = _batching_engine(batch_size=2, batch_wait=60.0)
+
+    with score_many as mock_score_many:
+        results = await asyncio.gather(*(engine.score_batched(b'x' * size) for size in (1, 2, 3)))
+
+    # A full batch goes at once; the remainder waits for more requests
+    assert [result['overall_quality'] for result in results] == [1.0, 2.0, 3.0]
+    assert [len(call.args[0]) for call in mock_score_many.call_args_list] == [2, 1]
+
+
+@pytest.mark.asyncio
+async def test_score_batched_flushes_partial_batch_after_wait():
+    engine, score_many = _batching_engine(batch_size=8, batch_wait=0.01)
+
+    with score_many as mock_score_many:
+        result = await engine.score_batched(b'xy')
+
+    assert result == {'overall_quality': 2.0}
+    mock_score_many.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_score_batched_bypasses_batching_for_paths_and_single_batches():
+    engine = ScoringEngine(max_workers=1, batch_size=4)
+    unbatched = ScoringEngine(max_workers=1)
+
+    with patch.object(engine, "score", return_value={}) as mock_score:
+        with patch.object(unbatched, "score", return_value={}) as mock_unbatched_score:
+            await engine.score_batched("/tmp/image.download")
+            await unbatched.score_batched(b'image')
+
+    mock_score.assert_called_once_with("/tmp/image.download")
+    mock_unbatched_score.assert_called_once_with(b'image')
+
+
+@pytest.mark.asyncio
+async def test_score_batched_propagates_errors_and_skips_cancelled_callers():
+    engine = ScoringEngine(max_workers=1, batch_size=2, batch_wait=60.0)
+    started = asyncio.Event()
+
+    async def failing_score_many(images):
+        started.set()
+        await asyncio.sleep(0)
+        raise RuntimeError("pool broken")
+
+    with patch.object(engine, "score_many", side_effect=failing_score_many):
+        cancelled = asyncio.ensure_future(engine.score_batched(b'a'))
+        failed = asyncio.ensure_future(engine.score_batched(b'b'))
+        await started.wait()
+        cancelled.cancel()
+
+        with pytest.raises(RuntimeError, match="pool broken"):
+            await failed
+    assert cancelled.cancelled()
@@ -0,0 +1,164 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.quality.structure import (
+    STRUCTURE_CORRUPT,
+    STRUCTURE_UNKNOWN,
+    STRUCTURE_VALID,
+    check_structure,
+    check_tail,
+)
+
+
+def _encode(format: str, **kwargs) -> bytes:
+    img = Image.fromarray(np.random.randint(0, 255, (64, 96, 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    img.save(buffer, format=format, **kwargs)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def jpeg_bytes():
+    return _encode('JPEG')
+
+
+@pytest.fixture
+def png_bytes():
+    return _encode('PNG')
+
+
+def _box(box_type: bytes, payload: bytes = b'') -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+@pytest.fixture
+def heic_bytes():
+    return _box(b'ftyp', b'heic\x00\x00\x00\x00mif1heic') + _box(b'meta', b'\x00' * 32) + _box(b'mdat', b'\x01' * 64)
+
+
+def test_empty_data_is_corrupt():
+    assert check_structure(b'') == STRUCTURE_CORRUPT
+
+
+def test_unrecognised_format_is_unknown():
+    assert check_structure(b'GIF89a' + b'\x00' * 32) == STRUCTURE_UNKNOWN
+
+
+def test_valid_jpeg(jpeg_bytes):
+    assert check_structure(jpeg_bytes) == STRUCTURE_VALID
+
+
+def test_progressive_jpeg(jpeg_bytes):
+    assert check_structure(_encode('JPEG', progressive=True)) == STRUCTURE_VALID
+
+
+def test_jpeg_with_trailer_after_eoi(jpeg_bytes):
+    assert check_structure(jpeg_bytes + b'\x00' * 16 + b'SEFT') == STRUCTURE_VALID
+
+
+@pytest.mark.parametrize("cut", [2, 4, 11, 100, -2])
+def test_truncated_jpeg_is_corrupt(jpeg_bytes, cut):
+    assert check_structure(jpeg_bytes[:cut]) == STRUCTURE_CORRUPT
+
+
+def test_jpeg_with_fill_bytes_and_restart_markers():
+    data = (
+        b'\xff\xd8'
+        + b'\xff\xff\xff\xe0\x00\x04ab'  # fill bytes before APP0
+        + b'\xff\xd0'  # standalone marker
+        + b'\xff\xda\x00\x02' + b'\x12\x34' + b'\xff\xd9'
+    )
+    assert check_structure(data) == STRUCTURE_VALID
+
+
+def test_jpeg_with_padding_between_segments_is_left_to_decoder(jpeg_bytes):
+    # Decoders skip stray bytes between segments, so this file still decodes
+    app0_end = 4 + struct.unpack(">H", jpeg_bytes[4:6])[0]
+    padded = jpeg_bytes[:app0_end] + b'\x00\x00' + jpeg_bytes[app0_end:]
+    Image.open(io.BytesIO(padded)).load()
+    assert check_structure(padded) == STRUCTURE_UNKNOWN
+
+
+@pytest.mark.parametrize("data,expected", [
+    (b'\xff\xd8\x00\xe0\x00\x04ab\xff\xd9', STRUCTURE_UNKNOWN),  # stray bytes instead of a marker
+    (b'\xff\xd8\xff\xe0\x00\x01\xff\xda\x00\x02\xff\xd9', STRUCTURE_UNKNOWN),  # impossible segment length
+    (b'\xff\xd8\x00\xe0\x00\x04ab\x12\x34', STRUCTURE_CORRUPT),  # stray bytes and no EOI
+    (b'\xff\xd8\xff\xe0\x00\x01\x12\x34', STRUCTURE_CORRUPT),  # bad length and no EOI
+])
+def test_jpeg_with_lost_marker_walk(data, expected):
+    assert check_structure(data) == expected
+
+
+def test_valid_png(png_bytes):
+    assert check_structure(png_bytes) == STRUCTURE_VALID
+
+
+@pytest.mark.parametrize("cut", [8, 20, -13, -1])
+def test_truncated_png_is_corrupt(png_bytes, cut):
+    assert check_structure(png_bytes[:cut]) == STRUCTURE_CORRUPT
+
+
+def test_png_with_bad_crc_is_corrupt(png_bytes):
+    damaged = bytearray(png_bytes)
+    damaged[len(damaged) // 2] ^= 0xFF
+    assert check_structure(bytes(damaged)) == STRUCTURE_CORRUPT
+
+
+def test_png_without_leading_ihdr_is_corrupt():
+    iend = struct.pack(">I4s", 0, b'IEND') + struct.pack(">I", zlib.crc32(b'IEND'))
+    assert check_structure(b'\x89PNG\r\n\x1a\n' + iend) == STRUCTURE_CORRUPT
+
+
+def test_valid_heic(heic_bytes):
+    assert check_structure(heic_bytes) == STRUCTURE_VALID
+
+
+def test_heic_with_box_to_end_of_file(heic_bytes):
+    assert check_structure(heic_bytes + struct.pack(">I4s", 0, b'mdat') + b'\x02' * 10) == STRUCTURE_VALID
+
+
+def test_heic_with_large_box_size(heic_bytes):
+    large = struct.pack(">I4sQ", 1, b'mdat', 16 + 4) + b'\x03' * 4
+    assert check_structure(heic_bytes + large) == STRUCTURE_VALID
+
+
+@pytest.mark.parametrize("tail", [
+    b'\x00\x00',  # partial box header
+    struct.pack(">I4s", 1, b'mdat') + b'\x00\x00',  # partial large size
+    struct.pack(">I4s", 100, b'mdat') + b'\x00' * 10,  # box runs past end
+    struct.pack(">I4s", 4, b'free'),  # size smaller than its header
+])
+def test_damaged_heic_is_corrupt(heic_bytes, tail):
+    assert check_structure(heic_bytes + tail) == STRUCTURE_CORRUPT
+
+
+def test_truncated_heic_is_corrupt(heic_bytes):
+    assert check_structure(heic_bytes[:-10]) == STRUCTURE_CORRUPT
+
+
+@pytest.mark.parametrize("mime_type,tail,expected", [
+    ("image/jpeg", b'\x12\x34\xff\xd9', STRUCTURE_VALID),
+    ("image/jpeg", b'\xff\xd9' + b'\x00' * 16 + b'SEFT', STRUCTURE_VALID),  # trailer after EOI
+    ("image/jpeg", b'\x12\x34\xff\x00', STRUCTURE_CORRUPT),
+    ("image/png", b'\x12\x34\xff\x00', STRUCTURE_CORRUPT),
+    ("image/heic", b'\x12\x34\xff\x00', STRUCTURE_UNKNOWN),
+    (None, b'\x12\x34\xff\x00', STRUCTURE_UNKNOWN),
+    ("image/jpeg", b'', STRUCTURE_CORRUPT),
+])
+def test_check_tail(mime_type, tail, expected):
+    assert check_tail(tail, mime_type) == expected
+
+
+def test_check_tail_of_png(png_bytes):
+    assert check_tail(png_bytes[-64:], "image/png") == STRUCTURE_VALID
+    assert check_tail(png_bytes[-64:-1], "image/png") == STRUCTURE_CORRUPT
+
+
+def test_check_tail_of_truncated_jpeg(jpeg_bytes):
+    assert check_tail(jpeg_bytes[-64:], "image/jpeg") == STRUCTURE_VALID
+    assert check_tail(jpeg_bytes[-64:-2], "image/jpeg") == STRUCTURE_CORRUPT
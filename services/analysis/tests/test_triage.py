@@ -0,0 +1,107 @@
+"""Tests for the triage dashboard totals."""
+from datetime import datetime, timedelta
+
+from src import models
+from src.burst.detector import BurstDetector
+from src.burst.scorer import BurstScorer
+from src.burst_index import update_burst_index
+from src.triage import (
+    BURST_SEQUENCES, CORRUPTED, LOW_QUALITY, quality_stats, refresh_all_triage_stats, refresh_triage_stats
+)
+
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def _stats(db_session, batch_id):
+    return {
+        row.category_type: (row.count, row.estimated_savings_bytes)
+        for row in db_session.query(models.BatchTriageStats).filter_by(import_batch_id=batch_id)
+    }
+
+
+def test_quality_stats_counts_categories():
+    scores = [
+        {'is_corrupted': True, 'overall_quality': 0.0, 'file_size_bytes': 100},
+        {'is_corrupted': False, 'overall_quality': 10.0, 'file_size_bytes': 200},
+        {'is_corrupted': False, 'overall_quality': 20.0, 'file_size_bytes': None},
+        {'is_corrupted': False, 'overall_quality': 40.0, 'file_size_bytes': 400},
+        {'is_corrupted': False, 'overall_quality': None, 'file_size_bytes': 500},
+    ]
+
+    assert quality_stats(scores, 40.0) == {CORRUPTED: (1, 100), LOW_QUALITY: (2, 200)}
+
+
+def test_refresh_triage_stats_matches_scores_and_bursts(db_session):
+    batch = models.ImportBatch(
+        immich_user_id="user-123", asset_ids=[], status="complete",
+        total_assets=0, analyzed_assets=0, skipped_assets=0
+    )
+    db_session.add(batch)
+    db_session.commit()
+    captures = {
+        # Burst: best shot, a blurry frame, and one whose size is unknown
+        "best": (0, 90.0, False, 1000),
+        "blurry": (1, 10.0, False, 2000),
+        "unsized": (2, 80.0, False, None),
+        "broken": (100, 0.0, True, 4000),
+        "fine": (200, 70.0, False, 8000),
+    }
+    scores = []
+    for asset_id, (seconds, quality, corrupted, size) in captures.items():
+        score = {
+            'immich_asset_id': asset_id, 'import_batch_id': batch.id, 'overall_quality': quality,
+            'is_corrupted': corrupted, 'file_size_bytes': size, 'captured_at': BASE_TIME + timedelta(seconds=seconds)
+        }
+        scores.append(score)
+        db_session.add(models.AssetQualityScore(**score))
+    # Stale totals are replaced, including categories that no longer apply
+    db_session.add(models.BatchTriageStats(import_batch_id=batch.id, category_type="gone", count=1))
+    db_session.commit()
+    update_burst_index(db_session, batch.id, BurstDetector(interval_seconds=2.0), BurstScorer())
+
+    refresh_triage_stats(db_session, batch.id, 40.0)
+    db_session.commit()
+
+    assert _stats(db_session, batch.id) == {
+        CORRUPTED: (1, 4000),
+        LOW_QUALITY: (1, 2000),
+        BURST_SEQUENCES: (2, 2000),
+    }
+    # Incremental totals of the same rows agree
+    assert quality_stats(scores, 40.0) == {CORRUPTED: (1, 4000), LOW_QUALITY: (1, 2000)}
+
+
+def test_refresh_all_triage_stats_matches_per_batch_refresh(db_session):
+    batches = []
+    for offset in (0, 1000):
+        batch = models.ImportBatch(
+            immich_user_id="user-123", asset_ids=[], status="complete",
+            total_assets=0, analyzed_assets=0, skipped_assets=0
+        )
+        db_session.add(batch)
+        db_session.commit()
+        for asset_id, seconds, quality, corrupted in [
+            ("best", 0, 90.0, False), ("blurry", 1, 10.0, False), ("broken", 100, 0.0, True)
+        ]:
+            db_session.add(models.AssetQualityScore(
+                immich_asset_id=f"{asset_id}-{offset}", import_batch_id=batch.id, overall_quality=quality,
+                is_corrupted=corrupted, file_size_bytes=1000, captured_at=BASE_TIME + timedelta(seconds=offset + seconds)
+            ))
+        db_session.commit()
+        update_burst_index(db_session, batch.id, BurstDetector(interval_seconds=2.0), BurstScorer())
+        batches.append(batch.id)
+    # A batch left without scores loses its stale totals
+    db_session.add(models.BatchTriageStats(import_batch_id=batches[0], category_type="gone", count=1))
+    db_session.commit()
+
+    refresh_all_triage_stats(db_session, 40.0)
+    db_session.commit()
+    refreshed = {batch_id: _stats(db_session, batch_id) for batch_id in batches}
+    for batch_id in batches:
+        refresh_triage_stats(db_session, batch_id, 40.0)
+    db_session.commit()
+
+    expected = {CORRUPTED: (1, 1000), LOW_QUALITY: (1, 1000), BURST_SEQUENCES: (1, 1000)}
+    assert refreshed == {batch_id: _stats(db_session, batch_id) for batch_id in batches} == {
+        batch_id: expected for batch_id in batches
+    }